@@ -3,7 +3,8 @@ from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
 from django.contrib.auth import get_user_model
 from django.utils.html import format_html
 from django.urls import reverse
-from .models import UserProfile, Product, PickupTimeSlot, Order, OrderItem
+from .pagination import LargeTableAdminMixin
+from .models import UserProfile, Product, PickupTimeSlot, Order, OrderItem, OutboxMessage, PaymentEvent, SalesRollup, ProductSalesRollup, DemandForecast
 
 User = get_user_model()
 
@@ -32,8 +33,8 @@ class CustomUserAdmin(BaseUserAdmin):
     date_hierarchy = 'date_joined'
 
 class ProductAdmin(admin.ModelAdmin):
-    list_display = ('name', 'category', 'price', 'is_available', 'created_at')
-    list_filter = ('category', 'is_available')
+    list_display = ('name', 'category', 'price', 'quantity', 'reorder_level', 'low_stock', 'is_available', 'created_at')
+    list_filter = ('category', 'is_available', 'low_stock')
     search_fields = ('name', 'description', 'category')
     list_editable = ('price', 'is_available')
     readonly_fields = ('created_at', 'updated_at')
@@ -47,6 +48,9 @@ class ProductAdmin(admin.ModelAdmin):
         ('Pricing & Availability', {
             'fields': ('price', 'is_available')
         }),
+        ('Stock', {
+            'fields': ('quantity', 'reorder_level')
+        }),
         ('Images', {
             'fields': ('image', 'thumbnail_preview'),
             'classes': ('collapse',)
@@ -100,7 +104,7 @@ class OrderItemInline(admin.TabularInline):
     def has_delete_permission(self, request, obj=None):
         return False
 
-class OrderAdmin(admin.ModelAdmin):
+class OrderAdmin(LargeTableAdminMixin, admin.ModelAdmin):
     list_display = ('id', 'student_info', 'status_badge', 'total_amount', 'pickup_slot', 'created_at', 'order_actions')
     list_filter = ('status', 'created_at', 'pickup_slot__start_time')
     search_fields = ('student__email', 'student__first_name', 'student__last_name', 'pickup_code')
@@ -108,7 +112,6 @@ class OrderAdmin(admin.ModelAdmin):
     readonly_fields = ('created_at', 'updated_at', 'pickup_code', 'total_amount')
     list_select_related = ('student', 'pickup_slot')
     list_per_page = 20
-    date_hierarchy = 'created_at'
     
     def get_queryset(self, request):
         return super().get_queryset(request).select_related('student', 'pickup_slot')
@@ -140,7 +143,7 @@ class OrderAdmin(admin.ModelAdmin):
         )
     order_actions.short_description = 'Actions'
 
-class OrderItemAdmin(admin.ModelAdmin):
+class OrderItemAdmin(LargeTableAdminMixin, admin.ModelAdmin):
     list_display = ('order_link', 'product_name', 'quantity', 'price_at_time_of_order', 'subtotal')
     list_filter = ('order__status',)
     search_fields = ('product__name', 'order__id')
@@ -160,9 +163,61 @@ class OrderItemAdmin(admin.ModelAdmin):
         return f'${obj.quantity * obj.price_at_time_of_order:.2f}'
     subtotal.short_description = 'Subtotal'
 
+class OutboxMessageAdmin(LargeTableAdminMixin, admin.ModelAdmin):
+    list_display = ('id', 'channel', 'recipient', 'subject', 'status', 'attempts', 'available_at', 'sent_at')
+    list_filter = ('status', 'channel', 'created_at')
+    search_fields = ('recipient', 'subject', 'order__id')
+    readonly_fields = ('created_at', 'sent_at', 'last_error')
+    raw_id_fields = ('order',)
+    list_per_page = 50
+
+class PaymentEventAdmin(LargeTableAdminMixin, admin.ModelAdmin):
+    list_display = ('event_id', 'provider', 'event_type', 'status', 'order', 'received_at', 'processed_at')
+    list_filter = ('provider', 'status', 'event_type', 'received_at')
+    search_fields = ('event_id', 'order__id')
+    readonly_fields = ('received_at', 'processed_at', 'error')
+    raw_id_fields = ('order',)
+    list_per_page = 50
+
+class SalesRollupAdmin(admin.ModelAdmin):
+    list_display = ('bucket_start', 'period', 'completed_orders', 'completed_revenue', 'completed_units', 'cancelled_orders', 'cancelled_amount')
+    list_filter = ('period',)
+    date_hierarchy = 'bucket_start'
+    readonly_fields = ('updated_at',)
+    list_per_page = 50
+
+    def has_add_permission(self, request):
+        return False
+
+class ProductSalesRollupAdmin(admin.ModelAdmin):
+    list_display = ('bucket_start', 'product', 'units', 'revenue')
+    list_select_related = ('product',)
+    search_fields = ('product__name',)
+    date_hierarchy = 'bucket_start'
+    readonly_fields = ('updated_at',)
+    list_per_page = 50
+
+    def has_add_permission(self, request):
+        return False
+
+class DemandForecastAdmin(admin.ModelAdmin):
+    list_display = ('product', 'weekday', 'hour', 'expected_units', 'computed_at')
+    list_filter = ('weekday',)
+    list_select_related = ('product',)
+    search_fields = ('product__name',)
+    list_per_page = 50
+
+    def has_add_permission(self, request):
+        return False
+
 # Register models with custom admin classes
 admin.site.register(UserProfile, CustomUserAdmin)
 admin.site.register(Product, ProductAdmin)
 admin.site.register(PickupTimeSlot, PickupTimeSlotAdmin)
 admin.site.register(Order, OrderAdmin)
 admin.site.register(OrderItem, OrderItemAdmin)
+admin.site.register(OutboxMessage, OutboxMessageAdmin)
+admin.site.register(PaymentEvent, PaymentEventAdmin)
+admin.site.register(SalesRollup, SalesRollupAdmin)
+admin.site.register(ProductSalesRollup, ProductSalesRollupAdmin)
+admin.site.register(DemandForecast, DemandForecastAdmin)
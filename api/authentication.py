@@ -0,0 +1,152 @@
+"""API authentication that serves the authenticated user from the cache.
+
+``CachedJWTAuthentication`` and ``CachedTokenAuthentication`` behave like
+their DRF and simplejwt counterparts, but the user's fields (never the
+password hash) and the token key's owner are kept in the cache for
+``AUTH_USER_CACHE_TTL`` seconds, so a request with a warm entry reaches
+the view without an authentication query. Entries are dropped by ``api.signals`` once a change to a user or
+token commits, which covers deactivation and password changes; the TTL
+bounds anything changed with ``QuerySet.update``.
+
+``record_login`` replaces Django's ``update_last_login`` receiver and
+writes ``last_login`` at most once per ``LAST_LOGIN_UPDATE_INTERVAL``;
+simplejwt's own ``UPDATE_LAST_LOGIN`` is off so it doesn't bypass it.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import router, transaction
+from django.utils import timezone
+from django.utils.translation import gettext_lazy as _
+from rest_framework import exceptions
+from rest_framework.authentication import TokenAuthentication
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+
+from .metrics import registry
+
+AUTH_USER_KEY = 'auth-user:{}'
+AUTH_TOKEN_KEY = 'auth-token:{}'
+
+registry.describe('auth_cache_lookups_total', 'Authenticated user lookups, by whether the cache had the user')
+
+
+def _ttl():
+    return getattr(settings, 'AUTH_USER_CACHE_TTL', 60)
+
+
+def _remember(user, **extra):
+    # The user's columns minus the password hash, which has no business in a shared cache
+    fields = {
+        field.attname: getattr(user, field.attname)
+        for field in user._meta.concrete_fields if field.attname != 'password'
+    }
+    cache.set(AUTH_USER_KEY.format(user.pk), {'fields': fields, **extra}, _ttl())
+
+
+def _restore(entry):
+    # Built like a queryset row; the missing password is a deferred field loaded on access
+    model = get_user_model()
+    fields = entry['fields']
+    return model.from_db(router.db_for_read(model), list(fields), list(fields.values()))
+
+
+def cached_user(user_id):
+    """The user with primary key ``user_id``; raises ``DoesNotExist`` like ``get``."""
+    entry = cache.get(AUTH_USER_KEY.format(user_id))
+    registry.inc('auth_cache_lookups_total', result='miss' if entry is None else 'hit')
+    if entry is not None:
+        return _restore(entry)
+    user = get_user_model()._default_manager.get(pk=user_id)
+    _remember(user)
+    return user
+
+
+def _forget(keys):
+    # After commit: deleting earlier would let a concurrent request re-cache the old row for the whole TTL
+    if keys:
+        transaction.on_commit(lambda: cache.delete_many(keys))
+
+
+def forget_user(*user_ids):
+    _forget([AUTH_USER_KEY.format(user_id) for user_id in user_ids])
+
+
+def forget_token(*keys):
+    _forget([AUTH_TOKEN_KEY.format(key) for key in keys])
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """``JWTAuthentication`` with the token's user looked up through the cache.
+
+    A miss is handed to simplejwt, which runs whatever user checks the
+    installed version has, and only the user it accepts is cached, together
+    with the token's password-revocation claim. A hit is served only for
+    tokens carrying that same claim; any other token goes back to simplejwt.
+    """
+
+    def get_user(self, validated_token):
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError as e:
+            raise InvalidToken(_('Token contained no recognizable user identification')) from e
+
+        # Older simplejwt releases have no revocation claim; every token then matches
+        revoke_claim = getattr(api_settings, 'REVOKE_TOKEN_CLAIM', None)
+        revocation = validated_token.get(revoke_claim) if revoke_claim else None
+        entry = cache.get(AUTH_USER_KEY.format(user_id))
+        if entry is not None and 'revocation' in entry and entry['revocation'] == revocation:
+            registry.inc('auth_cache_lookups_total', result='hit')
+            user = _restore(entry)
+            if not user.is_active:
+                raise exceptions.AuthenticationFailed(_('User is inactive'), code='user_inactive')
+            return user
+
+        registry.inc('auth_cache_lookups_total', result='miss')
+        user = super().get_user(validated_token)
+        if api_settings.USER_ID_FIELD == 'id':
+            _remember(user, revocation=revocation)
+        return user
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """``TokenAuthentication`` that caches which user each token key belongs to."""
+
+    def authenticate_credentials(self, key):
+        model = self.get_model()
+        cache_key = AUTH_TOKEN_KEY.format(key)
+        user_id = cache.get(cache_key)
+        if user_id is None:
+            try:
+                token = model.objects.select_related('user').get(key=key)
+            except model.DoesNotExist:
+                raise exceptions.AuthenticationFailed(_('Invalid token.'))
+            registry.inc('auth_cache_lookups_total', result='miss')
+            user = token.user
+            cache.set(cache_key, user.pk, _ttl())
+            _remember(user)
+        else:
+            try:
+                user = cached_user(user_id)
+            except get_user_model().DoesNotExist:
+                raise exceptions.AuthenticationFailed(_('Invalid token.'))
+            token = model(key=key, user=user)
+
+        if not user.is_active:
+            raise exceptions.AuthenticationFailed(_('User inactive or deleted.'))
+        return (user, token)
+
+
+def record_login(sender, user, **kwargs):
+    """``user_logged_in`` receiver: store ``last_login`` unless it was set recently."""
+    now = timezone.now()
+    interval = timedelta(seconds=getattr(settings, 'LAST_LOGIN_UPDATE_INTERVAL', 15 * 60))
+    if user.last_login and now - user.last_login < interval:
+        return
+    # An UPDATE of the one column; saving would also rewrite every other field
+    type(user)._default_manager.filter(pk=user.pk).update(last_login=now)
+    user.last_login = now
+    forget_user(user.pk)
@@ -0,0 +1,29 @@
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api.services.sales_rollups import backfill
+
+
+class Command(BaseCommand):
+    help = 'Rebuilds the monthly, daily and hourly sales rollups from the orders table'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--since', help='First day to rebuild, YYYY-MM-DD (default: the first order)')
+        parser.add_argument('--until', help='Day after the last to rebuild, YYYY-MM-DD (default: no limit)')
+
+    def _day(self, value):
+        if not value:
+            return None
+        try:
+            return datetime.strptime(value, '%Y-%m-%d').date()
+        except ValueError:
+            raise CommandError(f'Invalid date: {value}')
+
+    def handle(self, *args, **options):
+        since, until = self._day(options['since']), self._day(options['until'])
+        if since and until and since >= until:
+            raise CommandError('--since must be before --until')
+
+        rows = backfill(since, until)
+        self.stdout.write(self.style.SUCCESS(f'Wrote {rows} sales rollup rows'))
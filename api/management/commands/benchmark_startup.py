@@ -0,0 +1,86 @@
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+# Loaded on first use by api.utils.provider_clients; never at boot
+LAZY_MODULES = ('stripe', 'razorpay', 'sendgrid', 'twilio')
+
+WSGI_BOOT = (
+    'import time; started = time.perf_counter(); '
+    'import config.wsgi; '
+    'print(time.perf_counter() - started)'
+)
+
+
+def _parse_importtime(stderr):
+    """``{module: (self_us, cumulative_us)}`` and the total from ``-X importtime`` output."""
+    modules, total = {}, 0
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        own, cumulative, name = line[len('import time:'):].split('|')
+        modules[name.strip()] = (int(own), int(cumulative))
+        if not name.startswith('  '):
+            # Top-level imports; nested ones are already in their parent's cumulative time
+            total += int(cumulative)
+    return modules, total
+
+
+class Command(BaseCommand):
+    help = 'Times manage.py check and WSGI worker boot in fresh processes and fails over the startup budget'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--runs', type=int, default=5, help='Fresh processes per measurement (median is reported)')
+        parser.add_argument('--top', type=int, default=10, help='Slowest imports to list')
+
+    def _run(self, *args):
+        env = {**os.environ, 'DJANGO_SETTINGS_MODULE': os.environ.get('DJANGO_SETTINGS_MODULE', 'config.settings')}
+        started = time.perf_counter()
+        result = subprocess.run(
+            [sys.executable, *args], cwd=settings.BASE_DIR, env=env, capture_output=True, text=True
+        )
+        elapsed = time.perf_counter() - started
+        if result.returncode:
+            raise CommandError(f'{" ".join(args)} failed:\n{result.stderr[-2000:]}')
+        return elapsed, result
+
+    def handle(self, *args, **options):
+        runs = max(options['runs'], 1)
+        budgets = settings.STARTUP_BUDGET_MS
+
+        check = [self._run('manage.py', 'check')[0] for _ in range(runs)]
+        wsgi = [float(self._run('-c', WSGI_BOOT)[1].stdout.strip()) for _ in range(runs)]
+        _, traced = self._run('-X', 'importtime', '-c', WSGI_BOOT)
+        modules, import_total = _parse_importtime(traced.stderr)
+
+        measured = {
+            'check': statistics.median(check) * 1000,
+            'wsgi': statistics.median(wsgi) * 1000,
+            'imports': import_total / 1000,
+        }
+        failures = []
+        for name, value in measured.items():
+            budget = budgets.get(name)
+            over = budget is not None and value > budget
+            style = self.style.ERROR if over else self.style.SUCCESS
+            self.stdout.write(style(f'{name:8} {value:8.0f} ms  (budget {budget if budget is not None else "-"} ms)'))
+            if over:
+                failures.append(f'{name} took {value:.0f} ms, budget is {budget} ms')
+
+        eager = sorted({name.split('.')[0] for name in modules} & set(LAZY_MODULES))
+        if eager:
+            failures.append(f'provider SDKs imported at boot: {", ".join(eager)}')
+
+        self.stdout.write('\nSlowest imports during WSGI boot (cumulative):')
+        slowest = sorted(modules.items(), key=lambda item: item[1][1], reverse=True)[:options['top']]
+        for name, (own, cumulative) in slowest:
+            self.stdout.write(f'  {cumulative / 1000:8.1f} ms  {name}')
+
+        if failures:
+            raise CommandError('Startup budget exceeded: ' + '; '.join(failures))
+        self.stdout.write(self.style.SUCCESS('Startup within budget'))
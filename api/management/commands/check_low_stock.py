@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from api.services.stock_alerts import evaluate_all
+
+
+class Command(BaseCommand):
+    help = 'Re-evaluates low-stock flags after bulk stock changes that bypassed model saves'
+
+    def handle(self, *args, **options):
+        result = evaluate_all()
+        self.stdout.write(self.style.SUCCESS(
+            f"{result['alerted']} products newly low on stock, {result['cleared']} back above their reorder level"
+        ))
@@ -0,0 +1,38 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api.services.order_export import FORMATS, export, filter_orders
+
+
+class Command(BaseCommand):
+    help = 'Streams orders with their items to a CSV or JSONL file (or stdout)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--format', dest='output_format', choices=list(FORMATS), default='csv')
+        parser.add_argument('--since', help='First day, YYYY-MM-DD')
+        parser.add_argument('--until', help='Last day (inclusive), YYYY-MM-DD')
+        parser.add_argument('--status', help='Order status, or several separated by commas')
+        parser.add_argument('--slot', help='Pickup time slot id')
+        parser.add_argument('--gzip', action='store_true', help='Compress the output with gzip')
+        parser.add_argument('--output', help='File to write (default: stdout)')
+        parser.add_argument('--chunk-size', type=int, default=1000, help='Orders fetched per query')
+
+    def handle(self, *args, **options):
+        try:
+            orders = filter_orders(options['since'], options['until'], options['status'], options['slot'])
+            chunks = export(orders, options['output_format'], gzip=options['gzip'], chunk_size=options['chunk_size'])
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        target = open(options['output'], 'wb') if options['output'] else sys.stdout.buffer
+        written = 0
+        try:
+            for chunk in chunks:
+                target.write(chunk)
+                written += len(chunk)
+        finally:
+            if options['output']:
+                target.close()
+        if options['output']:
+            self.stdout.write(self.style.SUCCESS(f'Wrote {written} bytes to {options["output"]}'))
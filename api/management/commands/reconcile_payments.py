@@ -0,0 +1,57 @@
+import csv
+from collections import Counter
+from datetime import datetime, time, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from api.services.reconciliation import MISMATCH_KINDS, PAYMENT_SOURCES, reconcile
+
+COLUMNS = [
+    'provider', 'kind', 'order_id', 'payment_status', 'payment_reference',
+    'order_amount', 'provider_reference', 'provider_amount',
+]
+
+class Command(BaseCommand):
+    help = 'Reconciles orders against Stripe/Razorpay payment lists and writes a mismatch report'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--provider', choices=[*PAYMENT_SOURCES, 'all'], default='all')
+        parser.add_argument('--since', help='First day, YYYY-MM-DD (default: 30 days ago)')
+        parser.add_argument('--until', help='Day after the last, YYYY-MM-DD (default: tomorrow, so today is included)')
+        parser.add_argument('--output', help='CSV report path (default: reconciliation-<since>-<until>.csv)')
+        parser.add_argument('--chunk-size', type=int, default=2000, help='Orders fetched per query')
+
+    def _day(self, value, default):
+        if not value:
+            return default
+        try:
+            day = datetime.strptime(value, '%Y-%m-%d').date()
+        except ValueError:
+            raise CommandError(f'Invalid date: {value}')
+        return timezone.make_aware(datetime.combine(day, time.min))
+
+    def handle(self, *args, **options):
+        tomorrow = timezone.make_aware(datetime.combine(timezone.localdate() + timedelta(days=1), time.min))
+        until = self._day(options['until'], tomorrow)
+        since = self._day(options['since'], until - timedelta(days=30))
+        if since >= until:
+            raise CommandError('--since must be before --until')
+
+        providers = list(PAYMENT_SOURCES) if options['provider'] == 'all' else [options['provider']]
+        output = options['output'] or f'reconciliation-{since:%Y%m%d}-{until:%Y%m%d}.csv'
+        counts = Counter()
+
+        with open(output, 'w', newline='') as report:
+            writer = csv.DictWriter(report, fieldnames=COLUMNS)
+            writer.writeheader()
+            for provider in providers:
+                self.stdout.write(f'Reconciling {provider} from {since:%Y-%m-%d} to {until:%Y-%m-%d}...')
+                for row in reconcile(provider, since, until, chunk_size=options['chunk_size']):
+                    writer.writerow(row)
+                    counts[row['kind']] += 1
+
+        for kind, description in MISMATCH_KINDS.items():
+            self.stdout.write(f'  {kind}: {counts[kind]}  ({description})')
+        style = self.style.WARNING if counts else self.style.SUCCESS
+        self.stdout.write(style(f'{sum(counts.values())} mismatches written to {output}'))
@@ -0,0 +1,138 @@
+"""In-process metrics with a Prometheus-style text export.
+
+Summaries keep a streaming histogram over log-scale buckets, so recording
+is O(1), memory stays bounded however many observations arrive, and
+percentiles are accurate to about 5%. Metrics are per worker process;
+scrape every worker (or aggregate in Prometheus) for fleet-wide numbers.
+"""
+import math
+import threading
+
+QUANTILES = (0.5, 0.95, 0.99)
+
+
+class StreamingHistogram:
+    """Log-bucketed histogram answering percentile queries without storing samples."""
+
+    GROWTH = 1.05
+
+    def __init__(self, minimum=1e-4):
+        self.minimum = minimum
+        self.buckets = {}
+        self.count = 0
+        self.total = 0.0
+        self.min = None
+        self.max = None
+
+    def _index(self, value):
+        if value <= self.minimum:
+            return 0
+        return int(math.log(value / self.minimum, self.GROWTH)) + 1
+
+    def record(self, value):
+        index = self._index(value)
+        self.buckets[index] = self.buckets.get(index, 0) + 1
+        self.count += 1
+        self.total += value
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+
+    def percentile(self, q):
+        if not self.count:
+            return 0.0
+        target = q * self.count
+        seen = 0
+        for index in sorted(self.buckets):
+            seen += self.buckets[index]
+            if seen >= target:
+                upper = self.minimum * self.GROWTH ** index
+                return max(self.min, min(upper, self.max))
+        return self.max
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(labels, **extra):
+    pairs = list(labels) + sorted(extra.items())
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{key}="{_escape(value)}"' for key, value in pairs) + '}'
+
+
+class MetricsRegistry:
+    """Thread-safe store of summaries, counters and gauges keyed by name and labels."""
+
+    def __init__(self, prefix='quickpickup'):
+        self.prefix = prefix
+        self._lock = threading.Lock()
+        self._help = {}
+        self._summaries = {}
+        self._counters = {}
+        self._gauges = {}
+
+    def describe(self, name, help_text):
+        self._help[name] = help_text
+
+    def observe(self, name, value, minimum=1e-4, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            histogram = self._summaries.get(key)
+            if histogram is None:
+                histogram = self._summaries[key] = StreamingHistogram(minimum)
+            histogram.record(value)
+
+    def inc(self, name, amount=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    def set_gauge(self, name, value, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._gauges[key] = value
+
+    def summary(self, name, **labels):
+        """Return ``{'count', 'sum', 'p50', 'p95', 'p99'}`` for one summary series."""
+        with self._lock:
+            histogram = self._summaries.get((name, tuple(sorted(labels.items()))))
+            if histogram is None:
+                return None
+            return {
+                'count': histogram.count,
+                'sum': histogram.total,
+                **{f'p{int(q * 100)}': histogram.percentile(q) for q in QUANTILES},
+            }
+
+    def reset(self):
+        with self._lock:
+            self._summaries.clear()
+            self._counters.clear()
+            self._gauges.clear()
+
+    def render(self):
+        """Render every series in the Prometheus text exposition format."""
+        lines = []
+        with self._lock:
+            for kind, series in (('summary', self._summaries), ('counter', self._counters), ('gauge', self._gauges)):
+                by_name = {}
+                for (name, labels), value in series.items():
+                    by_name.setdefault(name, []).append((labels, value))
+                for name in sorted(by_name):
+                    metric = f'{self.prefix}_{name}'
+                    if name in self._help:
+                        lines.append(f'# HELP {metric} {self._help[name]}')
+                    lines.append(f'# TYPE {metric} {kind}')
+                    for labels, value in sorted(by_name[name]):
+                        if kind == 'summary':
+                            for q in QUANTILES:
+                                lines.append(f'{metric}{_labels(labels, quantile=q)} {value.percentile(q):.6g}')
+                            lines.append(f'{metric}_sum{_labels(labels)} {value.total:.6g}')
+                            lines.append(f'{metric}_count{_labels(labels)} {value.count}')
+                        else:
+                            lines.append(f'{metric}{_labels(labels)} {value:.6g}')
+        return '\n'.join(lines) + '\n'
+
+
+registry = MetricsRegistry()
@@ -0,0 +1,83 @@
+import logging
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+
+from .metrics import registry
+
+logger = logging.getLogger('api.requests')
+
+registry.describe('request_duration_seconds', 'Time spent handling a request, by endpoint')
+registry.describe('request_db_queries', 'Database queries run per request, by endpoint')
+registry.describe('request_db_seconds', 'Time spent in the database per request, by endpoint')
+registry.describe('responses_total', 'Responses sent, by endpoint and status class')
+
+
+class _QueryTimer:
+    """``connection.execute_wrapper`` hook counting and timing queries."""
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.count += 1
+            self.seconds += time.perf_counter() - start
+
+
+class RequestMetricsMiddleware:
+    """Record latency, query count and query time for every view.
+
+    Observations go to the in-process ``metrics.registry`` (exported by the
+    staff-only metrics view) and one structured log line per request, at
+    ``METRICS_REQUEST_LOG_LEVEL`` (INFO by default). Requests slower than
+    ``METRICS_SLOW_REQUEST_MS`` are logged as warnings.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.slow_seconds = getattr(settings, 'METRICS_SLOW_REQUEST_MS', 500) / 1000
+        level = getattr(settings, 'METRICS_REQUEST_LOG_LEVEL', 'INFO')
+        self.log_level = logging.getLevelName(level) if isinstance(level, str) else level
+
+    def __call__(self, request):
+        timer = _QueryTimer()
+        start = time.perf_counter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(timer))
+            response = self.get_response(request)
+        duration = time.perf_counter() - start
+
+        match = getattr(request, 'resolver_match', None)
+        endpoint = match.route if match else 'unmatched'
+        if endpoint in getattr(settings, 'METRICS_EXCLUDED_ROUTES', ()):
+            return response
+
+        labels = {'method': request.method, 'endpoint': endpoint}
+        registry.observe('request_duration_seconds', duration, **labels)
+        registry.observe('request_db_queries', timer.count, minimum=1, **labels)
+        registry.observe('request_db_seconds', timer.seconds, **labels)
+        registry.inc('responses_total', status=f'{response.status_code // 100}xx', **labels)
+
+        logger.log(
+            logging.WARNING if duration >= self.slow_seconds else self.log_level,
+            'method=%s endpoint=%s status=%s duration_ms=%.1f queries=%d db_ms=%.1f',
+            request.method, endpoint, response.status_code,
+            duration * 1000, timer.count, timer.seconds * 1000,
+            extra={
+                'endpoint': endpoint,
+                'method': request.method,
+                'status': response.status_code,
+                'duration_ms': duration * 1000,
+                'queries': timer.count,
+                'db_ms': timer.seconds * 1000,
+            },
+        )
+        return response
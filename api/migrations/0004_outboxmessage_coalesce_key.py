@@ -0,0 +1,23 @@
+# Generated by Django 4.2.30 on 2026-10-19 14:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0003_outboxmessage'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='outboxmessage',
+            name='coalesce_key',
+            field=models.CharField(blank=True, db_index=True, max_length=100),
+        ),
+        migrations.AlterField(
+            model_name='outboxmessage',
+            name='status',
+            field=models.CharField(choices=[('pending', 'Pending'), ('sent', 'Sent'), ('failed', 'Failed'), ('suppressed', 'Suppressed')], default='pending', max_length=10),
+        ),
+    ]
@@ -0,0 +1,52 @@
+# Generated by Django 4.2.30 on 2026-10-19 14:22
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0004_outboxmessage_coalesce_key'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='paid_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='payment_reference',
+            field=models.CharField(blank=True, help_text='Provider payment or intent id', max_length=100),
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='payment_status',
+            field=models.CharField(choices=[('unpaid', 'Unpaid'), ('paid', 'Paid'), ('failed', 'Failed')], default='unpaid', max_length=10),
+        ),
+        migrations.CreateModel(
+            name='PaymentEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('provider', models.CharField(choices=[('stripe', 'Stripe'), ('razorpay', 'Razorpay')], max_length=10)),
+                ('event_id', models.CharField(max_length=100)),
+                ('event_type', models.CharField(max_length=100)),
+                ('payload', models.JSONField()),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('processed', 'Processed'), ('ignored', 'Ignored'), ('failed', 'Failed')], default='pending', max_length=10)),
+                ('error', models.TextField(blank=True)),
+                ('received_at', models.DateTimeField(auto_now_add=True)),
+                ('processed_at', models.DateTimeField(blank=True, null=True)),
+                ('order', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='payment_events', to='api.order')),
+            ],
+            options={
+                'ordering': ['received_at'],
+                'indexes': [models.Index(fields=['status', 'received_at'], name='api_payment_status_31657f_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='paymentevent',
+            constraint=models.UniqueConstraint(fields=('provider', 'event_id'), name='unique_payment_event'),
+        ),
+    ]
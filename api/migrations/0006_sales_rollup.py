@@ -0,0 +1,33 @@
+# Generated by Django 4.2.30 on 2026-10-19 14:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0005_payment_events'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SalesRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('period', models.CharField(choices=[('day', 'Day'), ('hour', 'Hour')], max_length=4)),
+                ('bucket_start', models.DateTimeField()),
+                ('completed_orders', models.IntegerField(default=0)),
+                ('completed_revenue', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('cancelled_orders', models.IntegerField(default=0)),
+                ('cancelled_amount', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'ordering': ['period', 'bucket_start'],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='salesrollup',
+            constraint=models.UniqueConstraint(fields=('period', 'bucket_start'), name='unique_sales_rollup_bucket'),
+        ),
+    ]
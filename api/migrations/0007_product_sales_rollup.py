@@ -0,0 +1,38 @@
+# Generated by Django 4.2.30 on 2026-10-19 14:29
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0006_sales_rollup'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='salesrollup',
+            name='completed_units',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.CreateModel(
+            name='ProductSalesRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('bucket_start', models.DateTimeField()),
+                ('units', models.IntegerField(default=0)),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='sales_rollups', to='api.product')),
+            ],
+            options={
+                'ordering': ['bucket_start'],
+                'indexes': [models.Index(fields=['bucket_start'], name='api_product_bucket__52c498_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='productsalesrollup',
+            constraint=models.UniqueConstraint(fields=('product', 'bucket_start'), name='unique_product_sales_rollup_bucket'),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 4.2.30 on 2026-10-19 14:33
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0007_product_sales_rollup'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DemandForecast',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('weekday', models.PositiveSmallIntegerField(help_text='0 is Monday')),
+                ('hour', models.PositiveSmallIntegerField()),
+                ('expected_units', models.FloatField()),
+                ('computed_at', models.DateTimeField()),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='demand_forecasts', to='api.product')),
+            ],
+            options={
+                'ordering': ['product', 'weekday', 'hour'],
+                'indexes': [models.Index(fields=['weekday', 'hour'], name='api_demandf_weekday_d506b6_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='demandforecast',
+            constraint=models.UniqueConstraint(fields=('product', 'weekday', 'hour'), name='unique_demand_forecast'),
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 4.2.30 on 2026-10-19 14:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0008_demand_forecast'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='low_stock',
+            field=models.BooleanField(default=False, editable=False),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='reorder_level',
+            field=models.PositiveIntegerField(default=0, help_text='Alert when stock falls to this level (0 disables)'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(condition=models.Q(('low_stock', True)), fields=['quantity'], name='product_low_stock_idx'),
+        ),
+    ]
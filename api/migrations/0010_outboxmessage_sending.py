@@ -0,0 +1,18 @@
+# Generated by Django 4.2.30 on 2026-10-19 14:47
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0009_product_reorder_level'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='outboxmessage',
+            name='status',
+            field=models.CharField(choices=[('pending', 'Pending'), ('sending', 'Sending'), ('sent', 'Sent'), ('failed', 'Failed'), ('suppressed', 'Suppressed')], default='pending', max_length=10),
+        ),
+    ]
@@ -0,0 +1,52 @@
+# Generated by Django 4.2.30 on 2026-10-19 14:49
+
+from django.db import migrations, models
+from django.db.models import Sum
+from django.db.models.functions import TruncMonth
+from django.utils import timezone
+
+
+def add_month_rows(apps, schema_editor):
+    """Sum the existing day rows into month rows."""
+    SalesRollup = apps.get_model('api', 'SalesRollup')
+    months = SalesRollup.objects.filter(period='day').annotate(
+        month=TruncMonth('bucket_start', tzinfo=timezone.get_current_timezone())
+    ).values('month').annotate(
+        completed_orders=Sum('completed_orders'),
+        completed_revenue=Sum('completed_revenue'),
+        completed_units=Sum('completed_units'),
+        cancelled_orders=Sum('cancelled_orders'),
+        cancelled_amount=Sum('cancelled_amount'),
+    ).order_by('month')
+    SalesRollup.objects.bulk_create([
+        SalesRollup(
+            period='month',
+            bucket_start=month['month'],
+            completed_orders=month['completed_orders'],
+            completed_revenue=month['completed_revenue'],
+            completed_units=month['completed_units'],
+            cancelled_orders=month['cancelled_orders'],
+            cancelled_amount=month['cancelled_amount'],
+        )
+        for month in months
+    ], batch_size=1000)
+
+
+def remove_month_rows(apps, schema_editor):
+    apps.get_model('api', 'SalesRollup').objects.filter(period='month').delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0010_outboxmessage_sending'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='salesrollup',
+            name='period',
+            field=models.CharField(choices=[('month', 'Month'), ('day', 'Day'), ('hour', 'Hour')], max_length=5),
+        ),
+        migrations.RunPython(add_month_rows, remove_month_rows),
+    ]
@@ -77,9 +77,19 @@ class Product(models.Model):
     category = models.CharField(max_length=20, choices=CATEGORY_CHOICES, default='stationery')
     image = models.ImageField(upload_to='products/', blank=True, null=True)
     is_available = models.BooleanField(default=True)
+    quantity = models.PositiveIntegerField(default=10, help_text='Available quantity in stock')
+    reorder_level = models.PositiveIntegerField(default=0, help_text='Alert when stock falls to this level (0 disables)')
+    # Maintained by api.services.stock_alerts whenever quantity or reorder_level changes
+    low_stock = models.BooleanField(default=False, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    class Meta:
+        indexes = [
+            # Only low-stock products are indexed, so the list stays small as the catalogue grows
+            models.Index(fields=['quantity'], name='product_low_stock_idx', condition=models.Q(low_stock=True)),
+        ]
+    
     def __str__(self):
         return self.name
 
@@ -111,12 +121,20 @@ class Order(models.Model):
         ('completed', 'Completed'),
         ('cancelled', 'Cancelled'),
     ]
+    PAYMENT_STATUS_CHOICES = [
+        ('unpaid', 'Unpaid'),
+        ('paid', 'Paid'),
+        ('failed', 'Failed'),
+    ]
     
     student = models.ForeignKey(UserProfile, on_delete=models.CASCADE, related_name='orders')
     pickup_slot = models.ForeignKey(PickupTimeSlot, on_delete=models.SET_NULL, null=True, blank=True)
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
     pickup_code = models.CharField(max_length=10, blank=True, null=True)
     total_amount = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+    payment_status = models.CharField(max_length=10, choices=PAYMENT_STATUS_CHOICES, default='unpaid')
+    payment_reference = models.CharField(max_length=100, blank=True, help_text='Provider payment or intent id')
+    paid_at = models.DateTimeField(null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
@@ -163,3 +181,168 @@ class OrderItem(models.Model):
         order = self.order
         super().delete(*args, **kwargs)
         order.update_total_amount()
+
+
+class OutboxMessage(models.Model):
+    """Notification written in the same transaction as the change that caused it.
+
+    Rows are delivered by the ``api.tasks.dispatch_outbox`` Celery task.
+    A message is leased before it is sent and only marked sent afterwards,
+    so a worker that dies mid-send leaves it to be retried, never lost.
+    """
+    CHANNEL_CHOICES = [
+        ('email', 'Email'),
+        ('sms', 'SMS'),
+    ]
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        # Leased by a worker until available_at; pending again if that runs out
+        ('sending', 'Sending'),
+        ('sent', 'Sent'),
+        ('failed', 'Failed'),
+        ('suppressed', 'Suppressed'),
+    ]
+
+    channel = models.CharField(max_length=10, choices=CHANNEL_CHOICES)
+    recipient = models.CharField(max_length=254)
+    subject = models.CharField(max_length=255, blank=True)
+    template_name = models.CharField(max_length=100, blank=True)
+    body = models.TextField(blank=True)
+    context = models.JSONField(default=dict, blank=True)
+    # Pending messages sharing a key are coalesced: only the latest is sent
+    coalesce_key = models.CharField(max_length=100, blank=True, db_index=True)
+    order = models.ForeignKey(Order, on_delete=models.CASCADE, null=True, blank=True, related_name='outbox_messages')
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
+    attempts = models.PositiveIntegerField(default=0)
+    available_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['created_at']
+        indexes = [
+            models.Index(fields=['status', 'available_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.get_channel_display()} to {self.recipient} ({self.status})"
+
+
+class PaymentEvent(models.Model):
+    """Webhook event received from a payment provider.
+
+    Stored before it is acknowledged and processed asynchronously by the
+    ``api.tasks.process_payment_events`` task. The unique constraint on
+    ``(provider, event_id)`` makes redelivered events no-ops.
+    """
+    PROVIDER_CHOICES = [
+        ('stripe', 'Stripe'),
+        ('razorpay', 'Razorpay'),
+    ]
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('processed', 'Processed'),
+        ('ignored', 'Ignored'),
+        ('failed', 'Failed'),
+    ]
+
+    provider = models.CharField(max_length=10, choices=PROVIDER_CHOICES)
+    event_id = models.CharField(max_length=100)
+    event_type = models.CharField(max_length=100)
+    payload = models.JSONField()
+    order = models.ForeignKey(Order, on_delete=models.SET_NULL, null=True, blank=True, related_name='payment_events')
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
+    error = models.TextField(blank=True)
+    received_at = models.DateTimeField(auto_now_add=True)
+    processed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['received_at']
+        constraints = [
+            models.UniqueConstraint(fields=['provider', 'event_id'], name='unique_payment_event'),
+        ]
+        indexes = [
+            models.Index(fields=['status', 'received_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.get_provider_display()} {self.event_type} ({self.event_id})"
+
+
+class SalesRollup(models.Model):
+    """Order totals per month, day or hour, kept up to date as orders change status.
+
+    Orders are bucketed by when they were placed. Maintained by
+    ``api.services.sales_rollups`` and rebuilt with the
+    ``backfill_sales_rollups`` command; the admin dashboard reads only these.
+    """
+    PERIOD_CHOICES = [
+        ('month', 'Month'),
+        ('day', 'Day'),
+        ('hour', 'Hour'),
+    ]
+
+    period = models.CharField(max_length=5, choices=PERIOD_CHOICES)
+    bucket_start = models.DateTimeField()
+    completed_orders = models.IntegerField(default=0)
+    completed_revenue = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    completed_units = models.IntegerField(default=0)
+    cancelled_orders = models.IntegerField(default=0)
+    cancelled_amount = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['period', 'bucket_start']
+        constraints = [
+            models.UniqueConstraint(fields=['period', 'bucket_start'], name='unique_sales_rollup_bucket'),
+        ]
+
+    def __str__(self):
+        return f"{self.get_period_display()} from {self.bucket_start:%Y-%m-%d %H:%M}"
+
+
+class ProductSalesRollup(models.Model):
+    """Units and revenue of one product in completed orders placed on one day."""
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='sales_rollups')
+    bucket_start = models.DateTimeField()
+    units = models.IntegerField(default=0)
+    revenue = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['bucket_start']
+        constraints = [
+            models.UniqueConstraint(fields=['product', 'bucket_start'], name='unique_product_sales_rollup_bucket'),
+        ]
+        indexes = [
+            models.Index(fields=['bucket_start']),
+        ]
+
+    def __str__(self):
+        return f"{self.product.name} on {self.bucket_start:%Y-%m-%d}"
+
+
+class DemandForecast(models.Model):
+    """Expected units of a product picked up in one hour of one weekday.
+
+    Rebuilt from order history by ``api.services.forecasting``; read to
+    suggest how much stock to stage for each pickup slot.
+    """
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='demand_forecasts')
+    weekday = models.PositiveSmallIntegerField(help_text='0 is Monday')
+    hour = models.PositiveSmallIntegerField()
+    expected_units = models.FloatField()
+    computed_at = models.DateTimeField()
+
+    class Meta:
+        ordering = ['product', 'weekday', 'hour']
+        constraints = [
+            models.UniqueConstraint(fields=['product', 'weekday', 'hour'], name='unique_demand_forecast'),
+        ]
+        indexes = [
+            models.Index(fields=['weekday', 'hour']),
+        ]
+
+    def __str__(self):
+        return f"{self.product.name}: {self.expected_units:.1f} on day {self.weekday} at {self.hour}:00"
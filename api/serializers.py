@@ -1,7 +1,11 @@
 from rest_framework import serializers
-from django.contrib.auth.models import User
+from django.db import transaction
 from django.contrib.auth.hashers import make_password
 from .models import UserProfile, Product, PickupTimeSlot, Order, OrderItem
+from .services.slot_holds import reserve_slot
+from cart.models import Cart
+from cart.services import place_cart_order
+from cart.stock import OutOfStock
 
 class UserSerializer(serializers.ModelSerializer):
     password = serializers.CharField(write_only=True)
@@ -9,26 +13,13 @@ class UserSerializer(serializers.ModelSerializer):
     phone_number = serializers.CharField(write_only=True, required=False, allow_blank=True)
     
     class Meta:
-        model = User
-        fields = ('id', 'username', 'password', 'email', 'first_name', 'last_name', 'user_type', 'phone_number')
+        model = UserProfile
+        fields = ('id', 'password', 'email', 'first_name', 'last_name', 'user_type', 'phone_number')
     
     def create(self, validated_data):
-        # Extract profile data
-        user_type = validated_data.pop('user_type', 'student')
-        phone_number = validated_data.pop('phone_number', '')
-        
-        # Create user
+        # The profile fields live on the user model itself
         validated_data['password'] = make_password(validated_data['password'])
-        user = super().create(validated_data)
-        
-        # Create user profile
-        UserProfile.objects.create(
-            user=user,
-            user_type=user_type,
-            phone_number=phone_number
-        )
-        
-        return user
+        return super().create(validated_data)
 
 class UserProfileSerializer(serializers.ModelSerializer):
     username = serializers.CharField(source='user.username')
@@ -89,17 +80,23 @@ class OrderSerializer(serializers.ModelSerializer):
         read_only_fields = ('pickup_code', 'total_amount', 'created_at', 'updated_at')
     
     def create(self, validated_data):
-        # Ensure the pickup slot is available
         pickup_slot = validated_data.get('pickup_slot')
-        if pickup_slot and pickup_slot.is_full():
-            raise serializers.ValidationError("This time slot is already full.")
-        
-        # Create the order
-        order = Order.objects.create(**validated_data)
+        student = validated_data.get('student')
         
-        # Update the pickup slot's current_orders
-        if pickup_slot:
-            pickup_slot.current_orders += 1
-            pickup_slot.save()
+        with transaction.atomic():
+            # Turn the student's hold (or a free place) into a reservation
+            if pickup_slot and not reserve_slot(pickup_slot, getattr(student, 'pk', None)):
+                raise serializers.ValidationError("This time slot is already full.")
+            
+            # Create the order
+            order = Order.objects.create(**validated_data)
+            
+            # The student's cart becomes the order's items, taking their stock
+            cart = Cart.objects.filter(user=student).first() if student else None
+            if cart is not None:
+                try:
+                    place_cart_order(order, cart)
+                except OutOfStock as e:
+                    raise serializers.ValidationError(str(e))
         
         return order
@@ -0,0 +1,114 @@
+"""Sales analytics over the pre-aggregated rollups, shaped for charts.
+
+Series are read from the hourly or daily ``SalesRollup`` rows in one query
+and laid out with NumPy on a dense time axis, so empty buckets are zeros
+rather than gaps. Weeks are resampled from days (Monday to Sunday) and the
+moving average is a convolution over the resampled series. Every series
+is returned as a plain list aligned with ``labels``.
+"""
+from datetime import datetime, time, timedelta
+
+import numpy as np
+from django.conf import settings
+from django.db.models import Sum
+from django.utils import timezone
+
+from ..models import ProductSalesRollup, SalesRollup
+
+BUCKETS = ('hour', 'day', 'week')
+TOP_PRODUCT_ORDERINGS = ('revenue', 'units')
+
+
+class AnalyticsError(ValueError):
+    pass
+
+
+def _day_start(day):
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def _moving_average(values, window):
+    """Trailing mean over ``window`` buckets; None until a full window is available."""
+    if window <= 1:
+        return values.round(2).tolist()
+    if len(values) < window:
+        return [None] * len(values)
+    averaged = np.convolve(values, np.ones(window) / window, mode='valid').round(2)
+    return [None] * (window - 1) + averaged.tolist()
+
+
+def sales_series(start, end, bucket='day', window=7):
+    """Revenue, order and unit series for days ``start`` to ``end`` (inclusive)."""
+    if bucket not in BUCKETS:
+        raise AnalyticsError(f'bucket must be one of {", ".join(BUCKETS)}')
+    if start > end:
+        raise AnalyticsError('start must not be after end')
+    if bucket == 'week':
+        # Whole weeks, Monday to Sunday
+        start -= timedelta(days=start.weekday())
+        end += timedelta(days=6 - end.weekday())
+
+    days = (end - start).days + 1
+    steps = days * 24 if bucket == 'hour' else days
+    if steps > getattr(settings, 'ANALYTICS_MAX_BUCKETS', 5000):
+        raise AnalyticsError(f'Range too long for {bucket} buckets')
+
+    period = 'hour' if bucket == 'hour' else 'day'
+    rows = SalesRollup.objects.filter(
+        period=period, bucket_start__gte=_day_start(start), bucket_start__lt=_day_start(end + timedelta(days=1))
+    ).values_list('bucket_start', 'completed_revenue', 'completed_orders', 'completed_units')
+
+    series = np.zeros((3, steps))
+    origin = _day_start(start)
+    for bucket_start, revenue, orders, units in rows:
+        if period == 'hour':
+            index = int((bucket_start - origin).total_seconds()) // 3600
+        else:
+            index = (timezone.localtime(bucket_start).date() - start).days
+        if 0 <= index < steps:
+            series[:, index] = (revenue, orders, units)
+
+    if bucket == 'week':
+        series = series.reshape(3, -1, 7).sum(axis=2)
+        labels = [start + timedelta(weeks=week) for week in range(series.shape[1])]
+    elif bucket == 'day':
+        labels = [start + timedelta(days=day) for day in range(steps)]
+    else:
+        labels = [origin + timedelta(hours=hour) for hour in range(steps)]
+
+    revenue, orders, units = series
+    return {
+        'bucket': bucket,
+        'labels': [label.isoformat() for label in labels],
+        'revenue': revenue.round(2).tolist(),
+        'orders': orders.astype(int).tolist(),
+        'units': units.astype(int).tolist(),
+        'revenue_moving_average': _moving_average(revenue, window),
+        'totals': {
+            'revenue': round(float(revenue.sum()), 2),
+            'orders': int(orders.sum()),
+            'units': int(units.sum()),
+        },
+    }
+
+
+def top_products(start, end, limit=10, order_by='revenue'):
+    """The ``limit`` best-selling products for days ``start`` to ``end`` (inclusive)."""
+    if order_by not in TOP_PRODUCT_ORDERINGS:
+        raise AnalyticsError(f'order_by must be one of {", ".join(TOP_PRODUCT_ORDERINGS)}')
+    if start > end:
+        raise AnalyticsError('start must not be after end')
+
+    products = list(ProductSalesRollup.objects.filter(
+        bucket_start__gte=_day_start(start), bucket_start__lt=_day_start(end + timedelta(days=1))
+    ).values('product_id', 'product__name').annotate(
+        units=Sum('units'), revenue=Sum('revenue')
+    ).order_by(f'-{order_by}', 'product_id')[:limit])
+
+    return {
+        'order_by': order_by,
+        'product_ids': [product['product_id'] for product in products],
+        'labels': [product['product__name'] for product in products],
+        'units': [product['units'] for product in products],
+        'revenue': [round(float(product['revenue']), 2) for product in products],
+    }
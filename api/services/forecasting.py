@@ -0,0 +1,162 @@
+"""Per-product demand forecasts by weekday and hour, for staging stock.
+
+Order items of the last ``FORECAST_HISTORY_WEEKS`` full weeks are summed
+per product and hour in the database, placed at their pickup slot's start
+(or the order time when there is no slot). NumPy then lays the result out
+as a ``products x weeks x 7 x 24`` demand array and forecasts each
+weekday-hour as an exponentially weighted average over the weeks, with
+weight ``alpha * (1 - alpha) ** age``. This is simple exponential
+smoothing of each seasonal slot, counted from a product's first sale.
+"""
+import math
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Sum
+from django.db.models.functions import Coalesce, TruncHour
+from django.utils import timezone
+
+from ..models import DemandForecast, OrderItem
+
+# Forecasts below this many units are not stored
+MIN_EXPECTED_UNITS = 0.01
+
+
+def _hourly_demand(since, until):
+    """``(product_ids, local hour buckets, units)`` arrays for items picked up in the period."""
+    rows = OrderItem.objects.exclude(order__status='cancelled').alias(
+        picked_up=Coalesce('order__pickup_slot__start_time', 'order__created_at')
+    ).filter(picked_up__gte=since, picked_up__lt=until).annotate(
+        bucket=TruncHour('picked_up', tzinfo=timezone.get_current_timezone())
+    ).values('product_id', 'bucket').annotate(units=Sum('quantity')).order_by().values_list(
+        'product_id', 'bucket', 'units'
+    )
+    product_ids, buckets, units = [], [], []
+    for product_id, bucket, quantity in rows.iterator(chunk_size=5000):
+        product_ids.append(product_id)
+        # Wall-clock time, so weekday and hour are local
+        buckets.append(timezone.localtime(bucket).replace(tzinfo=None))
+        units.append(quantity)
+    return (
+        np.array(product_ids, dtype=np.int64),
+        np.array(buckets, dtype='datetime64[h]'),
+        np.array(units, dtype=np.float64),
+    )
+
+
+def demand_matrix(product_ids, buckets, units, origin, weeks):
+    """Sum units into a ``(products, weeks, 7, 24)`` array; returns it with the product ids per row."""
+    products, rows = np.unique(product_ids, return_inverse=True)
+    hours = buckets.astype(np.int64)
+    days = hours // 24
+    weekday = (days + 3) % 7  # 1970-01-01 was a Thursday
+    week = (days - np.datetime64(origin, 'D').astype(np.int64)) // 7
+    demand = np.zeros((len(products), weeks, 7, 24))
+    np.add.at(demand, (rows, week, weekday, hours % 24), units)
+    return products, demand
+
+
+def smooth(demand, alpha):
+    """Exponentially weighted average over the weeks axis, from each product's first active week."""
+    products, weeks = demand.shape[:2]
+    age = np.arange(weeks - 1, -1, -1)
+    weights = np.broadcast_to(alpha * (1 - alpha) ** age, (products, weeks)).copy()
+    active = demand.sum(axis=(2, 3)) > 0
+    first_week = np.where(active.any(axis=1), active.argmax(axis=1), weeks)
+    weights[np.arange(weeks)[None, :] < first_week[:, None]] = 0
+    totals = weights.sum(axis=1, keepdims=True)
+    np.divide(weights, totals, out=weights, where=totals > 0)
+    return np.einsum('pw,pwdh->pdh', weights, demand)
+
+
+def refresh_forecasts(now=None):
+    """Recompute and replace every stored forecast; returns a summary."""
+    started = time.perf_counter()
+    weeks = getattr(settings, 'FORECAST_HISTORY_WEEKS', 52)
+    alpha = getattr(settings, 'FORECAST_SMOOTHING', 0.3)
+    today = timezone.localdate(now)
+    # Full weeks up to the start of today, so no week is partial
+    since_day = today - timedelta(weeks=weeks)
+    since = timezone.make_aware(datetime.combine(since_day, datetime.min.time()))
+    until = timezone.make_aware(datetime.combine(today, datetime.min.time()))
+
+    product_ids, buckets, units = _hourly_demand(since, until)
+    products, demand = demand_matrix(product_ids, buckets, units, since_day, weeks)
+    forecast = smooth(demand, alpha)
+
+    computed_at = timezone.now()
+    product_rows, weekdays, hours = np.nonzero(forecast >= MIN_EXPECTED_UNITS)
+    rows = [
+        DemandForecast(
+            product_id=int(products[p]), weekday=int(d), hour=int(h),
+            expected_units=round(float(forecast[p, d, h]), 3), computed_at=computed_at,
+        )
+        for p, d, h in zip(product_rows, weekdays, hours)
+    ]
+    with transaction.atomic():
+        DemandForecast.objects.all().delete()
+        DemandForecast.objects.bulk_create(rows, batch_size=1000)
+
+    return {
+        'products': len(products),
+        'buckets': len(units),
+        'forecasts': len(rows),
+        'seconds': round(time.perf_counter() - started, 3),
+    }
+
+
+def _slot_hours(slot):
+    """``{(weekday, hour): fraction of that hour the slot covers}`` in local time."""
+    start, end = timezone.localtime(slot.start_time), timezone.localtime(slot.end_time)
+    covered = {}
+    hour = start.replace(minute=0, second=0, microsecond=0)
+    while hour < end:
+        next_hour = hour + timedelta(hours=1)
+        overlap = (min(end, next_hour) - max(start, hour)).total_seconds() / 3600
+        if overlap > 0:
+            key = (hour.weekday(), hour.hour)
+            covered[key] = covered.get(key, 0) + overlap
+        hour = next_hour
+    return covered
+
+
+def staging_plan(slots):
+    """Suggested units to stage per product for each of ``slots``, from one forecast query."""
+    margin = getattr(settings, 'FORECAST_SAFETY_MARGIN', 0.2)
+    coverage = {slot.pk: _slot_hours(slot) for slot in slots}
+    weekdays = {weekday for covered in coverage.values() for weekday, _ in covered}
+    hours = {hour for covered in coverage.values() for _, hour in covered}
+
+    forecasts = {}
+    for product_id, name, weekday, hour, expected in DemandForecast.objects.filter(
+        weekday__in=weekdays, hour__in=hours
+    ).values_list('product_id', 'product__name', 'weekday', 'hour', 'expected_units'):
+        forecasts.setdefault((weekday, hour), []).append((product_id, name, expected))
+
+    plan = []
+    for slot in slots:
+        expected = {}
+        for key, fraction in coverage[slot.pk].items():
+            for product_id, name, units in forecasts.get(key, []):
+                expected[(product_id, name)] = expected.get((product_id, name), 0) + units * fraction
+        products = [
+            {
+                'product_id': product_id,
+                'name': name,
+                'expected_units': round(units, 2),
+                'suggested_quantity': math.ceil(units * (1 + margin)),
+            }
+            for (product_id, name), units in expected.items()
+            if units * (1 + margin) >= 0.5
+        ]
+        products.sort(key=lambda product: (-product['expected_units'], product['product_id']))
+        plan.append({
+            'slot_id': slot.pk,
+            'start_time': slot.start_time,
+            'end_time': slot.end_time,
+            'products': products,
+        })
+    return plan
@@ -0,0 +1,156 @@
+"""Streaming export of orders with their items, as CSV or JSON Lines.
+
+Orders are read in keyset-paginated chunks (``pk > last_pk``, ordered by
+pk), and each chunk's items are fetched with one query, so memory stays
+bounded by the chunk size however many orders match. The output is
+produced lazily as byte strings and can be gzipped on the fly, which
+suits both ``StreamingHttpResponse`` and writing to a file.
+"""
+import csv
+import json
+import zlib
+from datetime import datetime, time, timedelta
+
+from django.utils import timezone
+
+from ..models import Order, OrderItem
+
+FORMATS = {
+    'csv': 'text/csv',
+    'jsonl': 'application/x-ndjson',
+}
+CSV_COLUMNS = [
+    'order_id', 'created_at', 'status', 'payment_status', 'student_email', 'pickup_slot_id',
+    'pickup_start', 'total_amount', 'item_id', 'product_id', 'product_name', 'quantity', 'price',
+]
+# Bytes gathered before a piece of output is handed on
+FLUSH_SIZE = 64 * 1024
+
+
+def _day(value):
+    return datetime.strptime(value, '%Y-%m-%d').date()
+
+
+def filter_orders(since=None, until=None, status=None, slot=None):
+    """Orders placed from day ``since`` to day ``until`` (inclusive), optionally by status(es) and pickup slot.
+
+    Accepts the raw strings of a query string or command line; raises
+    ``ValueError`` for malformed values.
+    """
+    orders = Order.objects.all()
+    if since:
+        orders = orders.filter(created_at__gte=timezone.make_aware(datetime.combine(_day(since), time.min)))
+    if until:
+        end = _day(until) + timedelta(days=1)
+        orders = orders.filter(created_at__lt=timezone.make_aware(datetime.combine(end, time.min)))
+    if status:
+        statuses = [value.strip() for value in status.split(',') if value.strip()]
+        unknown = set(statuses) - set(dict(Order.STATUS_CHOICES))
+        if unknown:
+            raise ValueError(f'Unknown status: {", ".join(sorted(unknown))}')
+        orders = orders.filter(status__in=statuses)
+    if slot:
+        orders = orders.filter(pickup_slot_id=int(slot))
+    return orders
+
+
+def _records(orders, chunk_size):
+    """Yield ``(order, items)`` pairs, one chunk of orders in memory at a time."""
+    orders = orders.select_related('student', 'pickup_slot').order_by('pk')
+    last_pk = 0
+    while True:
+        chunk = list(orders.filter(pk__gt=last_pk)[:chunk_size])
+        if not chunk:
+            return
+        items = {}
+        for item in OrderItem.objects.filter(order_id__in=[order.pk for order in chunk]).values(
+            'id', 'order_id', 'product_id', 'product__name', 'quantity', 'price_at_time_of_order'
+        ).order_by('order_id', 'id').iterator(chunk_size=chunk_size):
+            items.setdefault(item['order_id'], []).append(item)
+        for order in chunk:
+            yield order, items.get(order.pk, [])
+        last_pk = chunk[-1].pk
+
+
+def _order_fields(order):
+    slot = order.pickup_slot
+    return {
+        'order_id': order.pk,
+        'created_at': timezone.localtime(order.created_at).isoformat(),
+        'status': order.status,
+        'payment_status': order.payment_status,
+        'student_email': order.student.email,
+        'pickup_slot_id': order.pickup_slot_id,
+        'pickup_start': timezone.localtime(slot.start_time).isoformat() if slot else None,
+        'total_amount': str(order.total_amount),
+    }
+
+
+def _item_fields(item):
+    return {
+        'item_id': item['id'],
+        'product_id': item['product_id'],
+        'product_name': item['product__name'],
+        'quantity': item['quantity'],
+        'price': str(item['price_at_time_of_order']),
+    }
+
+
+class _Line:
+    """File-like target for ``csv.writer`` that hands back each written row."""
+
+    def write(self, value):
+        return value
+
+
+def _csv(records):
+    writer = csv.writer(_Line())
+    yield writer.writerow(CSV_COLUMNS)
+    for order, items in records:
+        fields = _order_fields(order)
+        # One row per item; an order without items still gets a row
+        for item in items or [None]:
+            row = {**fields, **(_item_fields(item) if item else {})}
+            yield writer.writerow([row.get(column, '') for column in CSV_COLUMNS])
+
+
+def _jsonl(records):
+    for order, items in records:
+        record = {**_order_fields(order), 'items': [_item_fields(item) for item in items]}
+        yield json.dumps(record) + '\n'
+
+
+def _buffered(lines):
+    """Encode text lines into byte chunks of about ``FLUSH_SIZE``."""
+    buffer, size = [], 0
+    for line in lines:
+        data = line.encode('utf-8')
+        buffer.append(data)
+        size += len(data)
+        if size >= FLUSH_SIZE:
+            yield b''.join(buffer)
+            buffer, size = [], 0
+    if buffer:
+        yield b''.join(buffer)
+
+
+def _gzipped(chunks):
+    compressor = zlib.compressobj(wbits=31)  # 31: gzip header and trailer
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def export(orders, output='csv', gzip=False, chunk_size=1000):
+    """Yield the export of ``orders`` as byte chunks."""
+    if output not in FORMATS:
+        raise ValueError(f'Unknown format: {output}')
+    lines = (_csv if output == 'csv' else _jsonl)(_records(orders, chunk_size))
+    chunks = _buffered(lines)
+    return _gzipped(chunks) if gzip else chunks
+
+
+def filename(output, gzip=False):
+    return f'orders-{timezone.localtime():%Y%m%d-%H%M%S}.{output}' + ('.gz' if gzip else '')
@@ -0,0 +1,261 @@
+"""Transactional outbox for customer notifications.
+
+Views call ``enqueue_email`` / ``enqueue_sms`` inside the transaction that
+changes the order; the message row commits (or rolls back) with it, and a
+``dispatch_outbox`` task is queued once the transaction commits. Delivery
+is at-least-once: a message is leased for ``OUTBOX_LEASE_SECONDS`` before
+it is sent, so if the worker dies the lease runs out and the periodic sweep
+picks it up again.
+
+Messages given a ``coalesce_key`` wait ``NOTIFICATION_COALESCE_WINDOW``
+seconds before they are sent. A newer message with the same key suppresses
+the pending one, and several coalescible emails for one recipient are
+folded into a single digest, whether they are swept up together or the
+first of them is dispatched by id.
+"""
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from ..metrics import registry
+from ..models import OutboxMessage
+
+logger = logging.getLogger(__name__)
+
+registry.describe('notifications_suppressed_total', 'Notifications not sent because they were coalesced')
+
+# Subjects of digests, by the template of the messages they fold
+DIGEST_SUBJECTS = {
+    'status_update': 'Updates on {count} of your orders',
+    'low_stock': '{count} products are low on stock',
+}
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def _schedule_dispatch(message_id, countdown=None):
+    from ..tasks import dispatch_outbox
+
+    try:
+        dispatch_outbox.apply_async((message_id,), countdown=countdown)
+    except Exception:
+        # The broker is unreachable; the periodic sweep will deliver it
+        logger.exception("Could not queue outbox message %s", message_id)
+
+
+def _suppress(messages_or_ids, reason, channel):
+    ids = [getattr(message, 'pk', message) for message in messages_or_ids]
+    count = OutboxMessage.objects.filter(pk__in=ids).update(
+        status='suppressed', last_error=f'Coalesced ({reason})'
+    )
+    if count:
+        registry.inc('notifications_suppressed_total', count, channel=channel, reason=reason)
+    return count
+
+
+def _enqueue(**fields):
+    countdown = None
+    if fields.get('coalesce_key'):
+        countdown = _setting('NOTIFICATION_COALESCE_WINDOW', 60)
+        fields['available_at'] = timezone.now() + timedelta(seconds=countdown)
+        # Only the latest state is worth sending; leased ('sending') rows are already on their way
+        _suppress(
+            OutboxMessage.objects.filter(
+                coalesce_key=fields['coalesce_key'], recipient=fields['recipient'],
+                channel=fields['channel'], status='pending',
+            ).values_list('pk', flat=True),
+            'superseded', fields['channel'],
+        )
+    message = OutboxMessage.objects.create(**fields)
+    transaction.on_commit(lambda: _schedule_dispatch(message.pk, countdown))
+    return message
+
+
+def enqueue_email(to_email, subject, template_name, order=None, context=None, coalesce_key=''):
+    """Queue an email rendered from ``emails/<template_name>.html`` at delivery time.
+
+    ``context`` must be JSON-serializable; ``user``, ``order`` and
+    ``order_items`` are added from ``order`` when the message is sent.
+    """
+    return _enqueue(
+        channel='email', recipient=to_email, subject=subject,
+        template_name=template_name, context=context or {}, order=order,
+        coalesce_key=coalesce_key,
+    )
+
+
+def enqueue_sms(to_number, body, order=None):
+    return _enqueue(channel='sms', recipient=to_number, body=body, order=order)
+
+
+def _deliver(messages):
+    """Send ``messages`` with the providers' batch APIs; returns one bool per message."""
+    from ..utils.email_service import send_bulk_email
+    from ..utils.notification_renderer import order_contexts
+    from ..utils.sms_service import send_bulk_sms
+
+    emails = [message for message in messages if message.channel == 'email']
+    texts = [message for message in messages if message.channel == 'sms']
+    delivered = {}
+    if emails:
+        orders = order_contexts({
+            member.order_id for message in emails
+            for member in getattr(message, 'digest_of', [message]) if member.order_id
+        })
+
+        def context(message):
+            return {**message.context, **orders.get(message.order_id, {})}
+
+        delivered.update(zip(
+            [message.pk for message in emails],
+            send_bulk_email([{
+                'to_email': message.recipient,
+                'subject': message.subject,
+                'template_name': message.template_name,
+                'context': (
+                    {'updates': [context(member) for member in message.digest_of]}
+                    if hasattr(message, 'digest_of') else context(message)
+                ),
+            } for message in emails]),
+        ))
+    if texts:
+        delivered.update(zip(
+            [message.pk for message in texts],
+            send_bulk_sms([(message.recipient, message.body) for message in texts]),
+        ))
+    return [delivered.get(message.pk, False) for message in messages]
+
+
+def _fold_digests(messages):
+    """Fold due coalescible emails to one recipient into a single digest message.
+
+    The first message of each group carries the digest (its template and
+    subject are swapped in memory) and lists every member in ``digest_of``.
+    Returns the messages to send and ``{carrier pk: folded messages}``.
+    """
+    groups = {}
+    for message in messages:
+        if message.channel == 'email' and message.coalesce_key:
+            groups.setdefault((message.recipient, message.template_name), []).append(message)
+
+    folded = {}
+    for members in groups.values():
+        if len(members) > 1:
+            carrier = members[0]
+            carrier.digest_of = members
+            subject = DIGEST_SUBJECTS.get(carrier.template_name, DIGEST_SUBJECTS['status_update'])
+            carrier.subject = subject.format(count=len(members))
+            carrier.template_name = f'{carrier.template_name}_digest'
+            folded[carrier.pk] = members[1:]
+    skipped = {message.pk for rest in folded.values() for message in rest}
+    return [message for message in messages if message.pk not in skipped], folded
+
+
+def _digest_siblings(messages, now):
+    """Pending coalescible emails that would fold into a digest with ``messages``.
+
+    A message dispatched by id is leased on its own, so its siblings for the
+    same recipient and template are pulled in with it, including those whose
+    coalescing window has not quite run out yet.
+    """
+    groups = Q()
+    for message in messages:
+        if message.channel == 'email' and message.coalesce_key:
+            groups |= Q(recipient=message.recipient, template_name=message.template_name)
+    if not groups:
+        return []
+    window = timedelta(seconds=_setting('NOTIFICATION_COALESCE_WINDOW', 60))
+    return list(
+        OutboxMessage.objects.filter(groups, channel='email')
+        .exclude(coalesce_key='')
+        .exclude(pk__in=[message.pk for message in messages])
+        .filter(
+            Q(status='pending', available_at__lte=now + window)
+            | Q(status='sending', available_at__lte=now)
+        )
+        .select_for_update(skip_locked=True)
+        .order_by('available_at')
+    )
+
+
+def _claim(message_ids=None, limit=None):
+    """Lease up to ``limit`` due messages and return them.
+
+    Leased messages are marked ``sending`` so coalescing leaves them alone;
+    one whose lease ran out (its worker died) is due again. Claiming by id
+    also leases the message's digest siblings (see ``_digest_siblings``).
+    """
+    now = timezone.now()
+    lease = timedelta(seconds=_setting('OUTBOX_LEASE_SECONDS', 300))
+    due = OutboxMessage.objects.filter(Q(status='pending') | Q(status='sending'), available_at__lte=now)
+    if message_ids is not None:
+        due = due.filter(pk__in=message_ids)
+    with transaction.atomic():
+        messages = list(
+            due.select_for_update(skip_locked=True)
+            .order_by('available_at')[:limit or _setting('OUTBOX_BATCH_SIZE', 100)]
+        )
+        if message_ids is not None:
+            messages += _digest_siblings(messages, now)
+        OutboxMessage.objects.filter(pk__in=[message.pk for message in messages]).update(
+            status='sending', available_at=now + lease
+        )
+    return messages
+
+
+def dispatch_pending(message_ids=None, limit=None):
+    """Deliver due outbox messages; returns counts of sent, retried, failed and suppressed.
+
+    Failed sends are retried with exponential backoff until
+    ``OUTBOX_MAX_ATTEMPTS`` is reached, after which they are marked failed.
+    """
+    report = {'sent': 0, 'retried': 0, 'failed': 0, 'suppressed': 0}
+    max_attempts = _setting('OUTBOX_MAX_ATTEMPTS', 5)
+    backoff = _setting('OUTBOX_RETRY_BACKOFF', 60)
+
+    messages, folded = _fold_digests(_claim(message_ids, limit))
+    try:
+        results = _deliver(messages)
+    except Exception:
+        logger.exception("Error delivering %d outbox messages", len(messages))
+        results = [False] * len(messages)
+
+    # Messages folded into a digest share its fate: suppressed once it is sent
+    for message, delivered in zip(list(messages), list(results)):
+        rest = folded.get(message.pk, [])
+        if delivered:
+            report['suppressed'] += _suppress(rest, 'digest', message.channel)
+        else:
+            messages.extend(rest)
+            results.extend([False] * len(rest))
+
+    sent = [message for message, delivered in zip(messages, results) if delivered]
+    for attempts in {message.attempts + 1 for message in sent}:
+        OutboxMessage.objects.filter(pk__in=[m.pk for m in sent if m.attempts + 1 == attempts]).update(
+            status='sent', attempts=attempts, sent_at=timezone.now(), last_error=''
+        )
+    report['sent'] = len(sent)
+
+    error = 'Provider did not accept the message'
+    for message, delivered in zip(messages, results):
+        attempts = message.attempts + 1
+        if delivered:
+            continue
+        if attempts >= max_attempts:
+            OutboxMessage.objects.filter(pk=message.pk).update(
+                status='failed', attempts=attempts, last_error=error
+            )
+            report['failed'] += 1
+        else:
+            OutboxMessage.objects.filter(pk=message.pk).update(
+                status='pending', attempts=attempts, last_error=error,
+                available_at=timezone.now() + timedelta(seconds=backoff * 2 ** (attempts - 1)),
+            )
+            report['retried'] += 1
+    return report
@@ -0,0 +1,161 @@
+"""Payment confirmation from provider webhooks.
+
+Webhook views verify the provider's signature locally (an HMAC over the raw
+body, no outbound call), store the event with ``record_event`` and answer
+at once. ``process_events`` then applies stored events to their orders.
+Events are deduplicated on ``(provider, event_id)`` and order updates are
+conditional, so redelivered or reordered events are harmless.
+"""
+import hashlib
+import hmac
+import logging
+import time
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from ..models import Order, PaymentEvent
+
+logger = logging.getLogger(__name__)
+
+STRIPE_PAID_EVENTS = {'payment_intent.succeeded'}
+STRIPE_FAILED_EVENTS = {'payment_intent.payment_failed'}
+RAZORPAY_PAID_EVENTS = {'payment.captured', 'order.paid'}
+RAZORPAY_FAILED_EVENTS = {'payment.failed'}
+
+
+class InvalidSignature(Exception):
+    pass
+
+
+def verify_stripe_signature(payload, header, secret=None, tolerance=None):
+    """Check a ``Stripe-Signature`` header (``t=...,v1=...``) against the raw body."""
+    secret = secret or settings.STRIPE_WEBHOOK_SECRET
+    tolerance = tolerance if tolerance is not None else getattr(settings, 'STRIPE_WEBHOOK_TOLERANCE', 300)
+    if not secret or not header:
+        raise InvalidSignature('Missing signature or secret')
+
+    timestamp, signatures = None, []
+    for item in header.split(','):
+        key, _, value = item.strip().partition('=')
+        if key == 't':
+            timestamp = value
+        elif key == 'v1':
+            signatures.append(value)
+    if not timestamp or not timestamp.isdigit() or not signatures:
+        raise InvalidSignature('Malformed signature header')
+    if tolerance and abs(time.time() - int(timestamp)) > tolerance:
+        raise InvalidSignature('Timestamp outside the tolerance zone')
+
+    expected = hmac.new(secret.encode(), timestamp.encode() + b'.' + payload, hashlib.sha256).hexdigest()
+    if not any(hmac.compare_digest(expected, signature) for signature in signatures):
+        raise InvalidSignature('No matching signature')
+
+
+def verify_razorpay_signature(payload, signature, secret=None):
+    """Check an ``X-Razorpay-Signature`` header against the raw body."""
+    secret = secret or settings.RAZORPAY_WEBHOOK_SECRET
+    if not secret or not signature:
+        raise InvalidSignature('Missing signature or secret')
+    expected = hmac.new(secret.encode(), payload, hashlib.sha256).hexdigest()
+    if not hmac.compare_digest(expected, signature):
+        raise InvalidSignature('No matching signature')
+
+
+def _schedule_processing(event_id):
+    from ..tasks import process_payment_events
+
+    try:
+        process_payment_events.delay(event_id)
+    except Exception:
+        # The broker is unreachable; the periodic sweep will process it
+        logger.exception("Could not queue payment event %s", event_id)
+
+
+def record_event(provider, event_id, event_type, payload):
+    """Store a verified event and queue its processing; returns None for duplicates."""
+    try:
+        with transaction.atomic():
+            event = PaymentEvent.objects.create(
+                provider=provider, event_id=event_id, event_type=event_type, payload=payload
+            )
+            transaction.on_commit(lambda: _schedule_processing(event.pk))
+    except IntegrityError:
+        return None
+    return event
+
+
+def _stripe_outcome(event):
+    intent = event.payload.get('data', {}).get('object', {})
+    order_id = (intent.get('metadata') or {}).get('order_id')
+    amount = intent.get('amount_received', intent.get('amount'))
+    return order_id, intent.get('id', ''), amount
+
+
+def _razorpay_outcome(event):
+    entities = event.payload.get('payload', {})
+    payment = entities.get('payment', {}).get('entity', {})
+    order = entities.get('order', {}).get('entity', {})
+    notes = payment.get('notes') or order.get('notes') or {}
+    order_id = notes.get('order_id') if isinstance(notes, dict) else None
+    amount = payment.get('amount', order.get('amount_paid'))
+    return order_id, payment.get('id') or order.get('id', ''), amount
+
+
+def _apply(event):
+    """Apply one event to its order; returns the resulting event status."""
+    if event.provider == 'stripe':
+        paid, failed = STRIPE_PAID_EVENTS, STRIPE_FAILED_EVENTS
+        order_id, reference, amount = _stripe_outcome(event)
+    else:
+        paid, failed = RAZORPAY_PAID_EVENTS, RAZORPAY_FAILED_EVENTS
+        order_id, reference, amount = _razorpay_outcome(event)
+
+    if event.event_type not in paid | failed:
+        return 'ignored', ''
+    order = Order.objects.filter(pk=order_id).first() if str(order_id or '').isdigit() else None
+    if order is None:
+        return 'failed', f'No order for order_id {order_id!r}'
+    event.order = order
+
+    if event.event_type in failed:
+        # A late failure never overrides a confirmed payment
+        Order.objects.filter(pk=order.pk, payment_status='unpaid').update(
+            payment_status='failed', payment_reference=reference
+        )
+        return 'processed', ''
+
+    expected = int(order.total_amount * Decimal(100))
+    if amount is not None and int(amount) != expected:
+        return 'failed', f'Paid {amount} but order total is {expected}'
+    Order.objects.filter(pk=order.pk).exclude(payment_status='paid').update(
+        payment_status='paid', payment_reference=reference, paid_at=timezone.now()
+    )
+    return 'processed', ''
+
+
+def process_events(event_ids=None, limit=100):
+    """Apply pending events, oldest first; returns a count per resulting status."""
+    pending = PaymentEvent.objects.filter(status='pending').order_by('received_at')
+    if event_ids is not None:
+        pending = pending.filter(pk__in=event_ids)
+
+    report = {'processed': 0, 'ignored': 0, 'failed': 0}
+    for event in pending[:limit]:
+        with transaction.atomic():
+            # Whoever flips the status first applies the event
+            if not PaymentEvent.objects.filter(pk=event.pk, status='pending').update(status='processed'):
+                continue
+            try:
+                with transaction.atomic():
+                    status, error = _apply(event)
+            except Exception as e:
+                logger.exception("Error processing payment event %s", event.pk)
+                status, error = 'failed', str(e)
+            PaymentEvent.objects.filter(pk=event.pk).update(
+                status=status, error=error, order=event.order, processed_at=timezone.now()
+            )
+        report[status] += 1
+    return report
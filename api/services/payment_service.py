@@ -1,13 +1,11 @@
-import stripe
-import razorpay
+import logging
+import uuid
 from decimal import Decimal
-from django.conf import settings
 
-# Initialize Stripe
-stripe.api_key = settings.STRIPE_SECRET_KEY
+from ..utils.provider_clients import get_razorpay_client, get_stripe
+from ..utils.resilience import call_provider
 
-# Initialize Razorpay
-razorpay_client = razorpay.Client(auth=(settings.RAZORPAY_KEY_ID, settings.RAZORPAY_KEY_SECRET))
+logger = logging.getLogger(__name__)
 
 def create_stripe_payment_intent(amount, currency='inr', metadata=None):
     """Create a Stripe PaymentIntent"""
@@ -15,25 +13,32 @@ def create_stripe_payment_intent(amount, currency='inr', metadata=None):
         # Convert amount to smallest currency unit (paise for INR)
         amount_in_paise = int(Decimal(amount) * 100)
         
-        intent = stripe.PaymentIntent.create(
+        # The idempotency key makes retried attempts return the same intent
+        intent = call_provider(
+            'stripe', 'PaymentIntent.create', get_stripe().PaymentIntent.create,
             amount=amount_in_paise,
             currency=currency,
-            metadata=metadata or {}
+            metadata=metadata or {},
+            idempotency_key=str(uuid.uuid4()),
+            idempotent=True
         )
         return {
             'client_secret': intent.client_secret,
             'id': intent.id
         }
     except Exception as e:
-        print(f"Error creating payment intent: {str(e)}")
+        logger.error("Error creating payment intent: %s", e)
         return None
 
 def verify_stripe_payment(payment_intent_id):
     """Verify a Stripe payment"""
     try:
-        return stripe.PaymentIntent.retrieve(payment_intent_id)
+        return call_provider(
+            'stripe', 'PaymentIntent.retrieve', get_stripe().PaymentIntent.retrieve,
+            payment_intent_id, idempotent=True
+        )
     except Exception as e:
-        print(f"Error verifying payment: {str(e)}")
+        logger.error("Error verifying payment: %s", e)
         return None
 
 def create_razorpay_order(amount, currency='INR', receipt=None, notes=None):
@@ -53,19 +58,19 @@ def create_razorpay_order(amount, currency='INR', receipt=None, notes=None):
         if notes:
             order_data['notes'] = notes
             
-        return razorpay_client.order.create(data=order_data)
+        return call_provider('razorpay', 'order.create', get_razorpay_client().order.create, data=order_data)
     except Exception as e:
-        print(f"Error creating Razorpay order: {str(e)}")
+        logger.error("Error creating Razorpay order: %s", e)
         return None
 
 def verify_razorpay_payment(order_id, payment_id, signature):
     """Verify a Razorpay payment signature"""
     try:
-        return razorpay_client.utility.verify_payment_signature({
+        return get_razorpay_client().utility.verify_payment_signature({
             'razorpay_order_id': order_id,
             'razorpay_payment_id': payment_id,
             'razorpay_signature': signature
         })
     except Exception as e:
-        print(f"Error verifying Razorpay payment: {str(e)}")
+        logger.error("Error verifying Razorpay payment: %s", e)
         return False
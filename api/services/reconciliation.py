@@ -0,0 +1,202 @@
+"""Reconciliation of orders against the payment providers' own records.
+
+The provider's payment list for the period is paged through once (one
+call per page of 100). Providers list payments newest first rather than by
+order, so they are spilled to temporary files in sorted runs of
+``chunk_size`` and merged back in order id order, then merge-joined with
+``Order`` rows streamed by primary key. Memory stays bounded by the chunk
+size however many payments the period has, and nothing is fetched per
+order. Which provider took an order's payment is read from the prefix of
+its ``payment_reference`` (``pi_`` for Stripe, ``pay_``/``order_`` for
+Razorpay).
+"""
+import heapq
+import json
+import tempfile
+from datetime import timedelta
+from decimal import Decimal
+from itertools import groupby, islice
+
+from ..models import Order
+from ..utils.provider_clients import get_razorpay_client, get_stripe
+from ..utils.resilience import call_provider
+
+PAGE_SIZE = 100
+REFERENCE_PREFIXES = {
+    'stripe': ('pi_',),
+    'razorpay': ('pay_', 'order_'),
+}
+# Payments usually land shortly after the order; look this far past the period
+SETTLEMENT_GRACE = timedelta(days=1)
+
+MISMATCH_KINDS = {
+    'paid_not_marked': 'Provider took payment but the order is not marked paid',
+    'marked_not_paid': 'Order is marked paid but the provider has no successful payment',
+    'amount_mismatch': 'Amount paid differs from the order total',
+    'unknown_order': 'Provider payment refers to an order that does not exist',
+}
+
+
+def stripe_payments(since, until):
+    """Yield ``(order_id, reference, amount, paid)`` for Stripe intents created in the period."""
+    stripe = get_stripe()
+    created = {'gte': int(since.timestamp()), 'lt': int(until.timestamp())}
+    starting_after = None
+    while True:
+        params = {'created': created, 'limit': PAGE_SIZE}
+        if starting_after:
+            params['starting_after'] = starting_after
+        page = call_provider('stripe', 'PaymentIntent.list', stripe.PaymentIntent.list, idempotent=True, **params)
+        for intent in page.data:
+            intent = intent.to_dict()
+            order_id = (intent.get('metadata') or {}).get('order_id')
+            paid = intent.get('status') == 'succeeded'
+            yield order_id, intent['id'], intent.get('amount_received') if paid else intent.get('amount'), paid
+        if not page.has_more or not page.data:
+            return
+        starting_after = page.data[-1].id
+
+
+def razorpay_payments(since, until):
+    """Yield ``(order_id, reference, amount, paid)`` for Razorpay payments created in the period."""
+    client = get_razorpay_client()
+    skip = 0
+    while True:
+        page = call_provider('razorpay', 'payment.all', client.payment.all, idempotent=True, data={
+            'from': int(since.timestamp()),
+            'to': int(until.timestamp()),
+            'count': PAGE_SIZE,
+            'skip': skip,
+        })
+        items = page.get('items', [])
+        for payment in items:
+            notes = payment.get('notes') or {}
+            order_id = notes.get('order_id') if isinstance(notes, dict) else None
+            yield order_id, payment['id'], payment.get('amount'), payment.get('status') == 'captured'
+        if len(items) < PAGE_SIZE:
+            return
+        skip += len(items)
+
+
+PAYMENT_SOURCES = {
+    'stripe': stripe_payments,
+    'razorpay': razorpay_payments,
+}
+
+
+def _order_key(order_id):
+    """Sort key putting numeric order ids in numeric order, and anything else after them."""
+    return (0, int(order_id), '') if order_id.isdigit() else (1, 0, order_id)
+
+
+def _sorted_payments(payments, chunk_size):
+    """Yield ``[order_id, reference, amount, paid]`` lists sorted by order id, ``chunk_size`` in memory at a time."""
+    runs = []
+    try:
+        while True:
+            chunk = [
+                [str(order_id or ''), reference, amount, paid]
+                for order_id, reference, amount, paid in islice(payments, chunk_size)
+            ]
+            if not chunk:
+                break
+            chunk.sort(key=lambda payment: _order_key(payment[0]))
+            run = tempfile.TemporaryFile('w+')
+            run.writelines(json.dumps(payment) + '\n' for payment in chunk)
+            run.seek(0)
+            runs.append(run)
+        yield from heapq.merge(
+            *[(json.loads(line) for line in run) for run in runs], key=lambda payment: _order_key(payment[0])
+        )
+    finally:
+        for run in runs:
+            run.close()
+
+
+def _payments_by_order(provider, since, until, chunk_size):
+    """Yield ``(order_id, (reference, amount, paid))`` in order id order, preferring a successful payment per order."""
+    payments = PAYMENT_SOURCES[provider](since, until + SETTLEMENT_GRACE)
+    for order_id, group in groupby(_sorted_payments(payments, chunk_size), key=lambda payment: payment[0]):
+        chosen = None
+        for _, reference, amount, paid in group:
+            if chosen is None or (paid and not chosen[2]):
+                chosen = (reference, amount, paid)
+        yield order_id, chosen
+
+
+def _compare(provider, order, payment):
+    """Yield mismatch rows for one order and its provider payment (or None)."""
+    expected = int(order.total_amount * Decimal(100))
+    marked = order.payment_status == 'paid'
+    ours = (order.payment_reference or '').startswith(REFERENCE_PREFIXES[provider])
+    row = {
+        'provider': provider,
+        'order_id': order.pk,
+        'payment_status': order.payment_status,
+        'payment_reference': order.payment_reference,
+        'order_amount': expected,
+    }
+    if payment is None or not payment[2]:
+        if marked and ours:
+            yield {**row, 'kind': 'marked_not_paid', 'provider_reference': payment[0] if payment else '', 'provider_amount': ''}
+        return
+
+    reference, amount, _ = payment
+    row.update(provider_reference=reference, provider_amount=amount)
+    if not marked:
+        yield {**row, 'kind': 'paid_not_marked'}
+    if amount is not None and int(amount) != expected:
+        yield {**row, 'kind': 'amount_mismatch'}
+
+
+def _outside_period(provider, payments):
+    """Mismatch rows for successful ``(order_id, payment)`` pairs whose order isn't in the period."""
+    found = Order.objects.filter(pk__in=[order_id for order_id, _ in payments if order_id.isdigit()]).only(
+        'id', 'total_amount', 'payment_status', 'payment_reference'
+    ).in_bulk()
+    for order_id, payment in payments:
+        order = found.get(int(order_id)) if order_id.isdigit() else None
+        if order is not None:
+            yield from _compare(provider, order, payment)
+            continue
+        reference, amount, _ = payment
+        yield {
+            'provider': provider, 'kind': 'unknown_order', 'order_id': order_id,
+            'payment_status': '', 'payment_reference': '', 'order_amount': '',
+            'provider_reference': reference, 'provider_amount': amount,
+        }
+
+
+def reconcile(provider, since, until, chunk_size=2000):
+    """Yield a mismatch row per discrepancy between ``provider`` and orders created in the period."""
+    payments = _payments_by_order(provider, since, until, chunk_size)
+    orders = Order.objects.filter(created_at__gte=since, created_at__lt=until).only(
+        'id', 'total_amount', 'payment_status', 'payment_reference'
+    ).order_by('pk')
+
+    # Payments in the period for orders created outside it, or for no order at all
+    leftover = []
+
+    def set_aside(order_id, payment):
+        if payment[2]:
+            leftover.append((order_id, payment))
+        if len(leftover) >= chunk_size:
+            yield from _outside_period(provider, leftover)
+            leftover.clear()
+
+    current = next(payments, None)
+    for order in orders.iterator(chunk_size=chunk_size):
+        key = _order_key(str(order.pk))
+        while current is not None and _order_key(current[0]) < key:
+            yield from set_aside(*current)
+            current = next(payments, None)
+        if current is not None and _order_key(current[0]) == key:
+            yield from _compare(provider, order, current[1])
+            current = next(payments, None)
+        else:
+            yield from _compare(provider, order, None)
+    while current is not None:
+        yield from set_aside(*current)
+        current = next(payments, None)
+    if leftover:
+        yield from _outside_period(provider, leftover)
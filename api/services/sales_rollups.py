@@ -0,0 +1,207 @@
+"""Monthly, daily and hourly sales totals for the admin dashboard and analytics API.
+
+Each ``SalesRollup`` row holds the completed and cancelled orders placed in
+one month, day or hour, and each ``ProductSalesRollup`` row one product's units
+and revenue in the completed orders of a day. The ``api.signals``
+receivers call ``record_change`` when an order's status or total changes
+and ``record_items`` when the lines of a completed order change, which
+move contributions between buckets with ``F()`` increments, so readers
+never have to aggregate ``Order`` itself. Bulk ``QuerySet.update()``
+calls bypass the signals; ``backfill`` rebuilds the rows for a period
+from the orders.
+"""
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Q, Sum
+from django.db.models.functions import TruncDay, TruncHour, TruncMonth
+from django.utils import timezone
+
+from ..models import Order, OrderItem, ProductSalesRollup, SalesRollup
+
+PERIODS = {
+    'month': TruncMonth,
+    'day': TruncDay,
+    'hour': TruncHour,
+}
+
+
+def contribution(status, total):
+    """The counters an order with ``status`` and ``total`` adds to its buckets."""
+    if status == 'completed':
+        return {'completed_orders': 1, 'completed_revenue': total}
+    if status == 'cancelled':
+        return {'cancelled_orders': 1, 'cancelled_amount': total}
+    return {}
+
+
+def bucket_start(period, moment):
+    """Start of the local month, day or hour containing ``moment``."""
+    local = timezone.localtime(moment)
+    if period == 'month':
+        return local.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+    if period == 'day':
+        return local.replace(hour=0, minute=0, second=0, microsecond=0)
+    return local.replace(minute=0, second=0, microsecond=0)
+
+
+def _bump(model, bucket, deltas):
+    changes = {field: F(field) + value for field, value in deltas.items()}
+    if model.objects.filter(**bucket).update(**changes):
+        return
+    try:
+        with transaction.atomic():
+            model.objects.create(**bucket, **deltas)
+    except IntegrityError:
+        # Another transaction created the bucket first
+        model.objects.filter(**bucket).update(**changes)
+
+
+def record_change(old, new):
+    """Move an order's contribution from its ``old`` to its ``new`` state.
+
+    Each state is ``(status, total_amount, created_at)``, or None for an
+    order that did not exist before or no longer exists.
+    """
+    deltas = {}
+    for state, sign in ((old, -1), (new, 1)):
+        if state is None or state[2] is None:
+            continue
+        status, total, created_at = state
+        for period in PERIODS:
+            bucket = deltas.setdefault((period, bucket_start(period, created_at)), {})
+            for field, value in contribution(status, total or Decimal(0)).items():
+                bucket[field] = bucket.get(field, 0) + sign * value
+
+    for (period, start), bucket in deltas.items():
+        bucket = {field: value for field, value in bucket.items() if value}
+        if bucket:
+            _bump(SalesRollup, {'period': period, 'bucket_start': start}, bucket)
+
+
+def record_items(created_at, items, sign=1):
+    """Add (or with ``sign=-1`` remove) lines of a completed order placed at ``created_at``.
+
+    ``items`` are ``(product_id, quantity, price_at_time_of_order)`` tuples.
+    """
+    units, by_product = 0, {}
+    for product_id, quantity, price in items:
+        units += sign * quantity
+        line = by_product.setdefault(product_id, {'units': 0, 'revenue': 0})
+        line['units'] += sign * quantity
+        line['revenue'] += sign * quantity * price
+    if not units and not by_product:
+        return
+
+    if units:
+        for period in PERIODS:
+            start = bucket_start(period, created_at)
+            _bump(SalesRollup, {'period': period, 'bucket_start': start}, {'completed_units': units})
+    day = bucket_start('day', created_at)
+    for product_id, line in by_product.items():
+        line = {field: value for field, value in line.items() if value}
+        if line:
+            _bump(ProductSalesRollup, {'product_id': product_id, 'bucket_start': day}, line)
+
+
+def _day_start(day):
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def _between(queryset, field, since, until):
+    if since is not None:
+        queryset = queryset.filter(**{f'{field}__gte': _day_start(since)})
+    if until is not None:
+        queryset = queryset.filter(**{f'{field}__lt': _day_start(until)})
+    return queryset
+
+
+def _whole_months(since, until):
+    """Widen day bounds to whole months, so a month row is rebuilt from all of its orders."""
+    if since is not None:
+        since = since.replace(day=1)
+    if until is not None and until.day != 1:
+        until = (until.replace(day=1) + timedelta(days=32)).replace(day=1)
+    return since, until
+
+
+def backfill(since=None, until=None):
+    """Rebuild the rollups for orders placed from day ``since`` up to day ``until`` (exclusive).
+
+    Month rows are rebuilt for every month the range touches. Without
+    bounds every bucket is rebuilt. Returns the number of rows written.
+    """
+    orders = Order.objects.filter(status__in=['completed', 'cancelled'])
+    items = OrderItem.objects.filter(order__status='completed')
+    tzinfo = timezone.get_current_timezone()
+
+    rows = []
+    stale = []
+    for period, trunc in PERIODS.items():
+        bounds = _whole_months(since, until) if period == 'month' else (since, until)
+        stale.append(_between(SalesRollup.objects.filter(period=period), 'bucket_start', *bounds))
+        period_items = _between(items, 'order__created_at', *bounds)
+        # Summed separately: joining items would repeat each order's total
+        units = dict(period_items.annotate(bucket=trunc('order__created_at', tzinfo=tzinfo)).values('bucket').annotate(
+            units=Sum('quantity')
+        ).order_by().values_list('bucket', 'units'))
+        buckets = _between(orders, 'created_at', *bounds).annotate(
+            bucket=trunc('created_at', tzinfo=tzinfo)
+        ).values('bucket').annotate(
+            completed_orders=Count('pk', filter=Q(status='completed')),
+            completed_revenue=Sum('total_amount', filter=Q(status='completed')),
+            cancelled_orders=Count('pk', filter=Q(status='cancelled')),
+            cancelled_amount=Sum('total_amount', filter=Q(status='cancelled')),
+        ).order_by('bucket')
+        for bucket in buckets:
+            rows.append(SalesRollup(
+                period=period,
+                bucket_start=bucket['bucket'],
+                completed_orders=bucket['completed_orders'],
+                completed_revenue=bucket['completed_revenue'] or 0,
+                completed_units=units.get(bucket['bucket'], 0),
+                cancelled_orders=bucket['cancelled_orders'],
+                cancelled_amount=bucket['cancelled_amount'] or 0,
+            ))
+
+    product_rows = [
+        ProductSalesRollup(product_id=line['product_id'], bucket_start=line['bucket'], units=line['units'], revenue=line['revenue'])
+        for line in _between(items, 'order__created_at', since, until).annotate(
+            bucket=TruncDay('order__created_at', tzinfo=tzinfo)
+        ).values('bucket', 'product_id').annotate(
+            units=Sum('quantity'), revenue=Sum(F('quantity') * F('price_at_time_of_order'))
+        ).order_by()
+    ]
+
+    with transaction.atomic():
+        for rollups in stale:
+            rollups.delete()
+        _between(ProductSalesRollup.objects.all(), 'bucket_start', since, until).delete()
+        SalesRollup.objects.bulk_create(rows, batch_size=1000)
+        ProductSalesRollup.objects.bulk_create(product_rows, batch_size=1000)
+    return len(rows) + len(product_rows)
+
+
+def summary(now=None):
+    """Dashboard figures, read from rollup rows only.
+
+    The all-time total sums one row per month of history; the rest reads
+    this month's row, today's hours and the last week's days.
+    """
+    now = now or timezone.now()
+    today = bucket_start('day', now)
+    days = SalesRollup.objects.filter(period='day')
+    months = SalesRollup.objects.filter(period='month')
+
+    def revenue(rows):
+        return rows.aggregate(total=Sum('completed_revenue'))['total'] or 0
+
+    return {
+        'total_revenue': revenue(months),
+        'monthly_revenue': revenue(months.filter(bucket_start=bucket_start('month', now))),
+        'today_revenue': revenue(SalesRollup.objects.filter(period='hour', bucket_start__gte=today)),
+        'daily_sales': list(days.filter(bucket_start__gte=today - timedelta(days=6)).values(
+            'bucket_start', 'completed_orders', 'completed_revenue', 'cancelled_orders'
+        )),
+    }
@@ -0,0 +1,138 @@
+"""Short-lived pickup slot holds kept in the cache instead of the database.
+
+A student who picks a slot at checkout gets a hold that expires after
+``SLOT_HOLD_TTL`` seconds. Holds count against ``PickupTimeSlot.max_orders``
+when answering availability, and are converted into a real reservation
+(``current_orders``) when the order is created.
+"""
+import time
+import uuid
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.db.models import F
+
+from ..models import PickupTimeSlot
+
+HOLDS_KEY = 'slot-holds:{}'
+LOCK_KEY = 'slot-holds:{}:lock'
+
+# How long a writer may keep the per-slot cache mutex before it is ignored
+LOCK_TIMEOUT = 5
+LOCK_ATTEMPTS = 50
+LOCK_WAIT = 0.01
+
+
+def _cache():
+    return caches[getattr(settings, 'SLOT_HOLD_CACHE', 'default')]
+
+
+def _ttl():
+    return getattr(settings, 'SLOT_HOLD_TTL', 300)
+
+
+def _live(holds, now):
+    """Drop holds whose expiry has passed."""
+    return {user_id: expires for user_id, expires in (holds or {}).items() if expires > now}
+
+
+class _SlotLock:
+    """Best-effort cache mutex so concurrent holds on one slot don't overwrite each other."""
+
+    def __init__(self, slot_id):
+        self.key = LOCK_KEY.format(slot_id)
+        self.token = None
+
+    def __enter__(self):
+        cache = _cache()
+        token = uuid.uuid4().hex
+        for _ in range(LOCK_ATTEMPTS):
+            if cache.add(self.key, token, LOCK_TIMEOUT):
+                self.token = token
+                return self
+            time.sleep(LOCK_WAIT)
+        # A stuck writer will have its lock expire; proceed rather than block checkout
+        return self
+
+    def __exit__(self, *exc):
+        # Only release a lock we took; after giving up, or once ours expired, it belongs to someone else
+        if self.token is not None and _cache().get(self.key) == self.token:
+            _cache().delete(self.key)
+        return False
+
+
+def place_hold(slot, user_id):
+    """Hold a place in ``slot`` for ``user_id``.
+
+    Returns the hold's expiry as a unix timestamp, or ``None`` if the slot
+    has no room left once other students' holds are counted.
+    """
+    ttl = _ttl()
+    cache = _cache()
+    key = HOLDS_KEY.format(slot.pk)
+    with _SlotLock(slot.pk):
+        now = time.time()
+        holds = _live(cache.get(key), now)
+        others = len(holds) - (1 if user_id in holds else 0)
+        if slot.current_orders + others >= slot.max_orders:
+            return None
+        holds[user_id] = now + ttl
+        cache.set(key, holds, ttl)
+    return holds[user_id]
+
+
+def release_hold(slot_id, user_id):
+    """Give up ``user_id``'s hold on a slot, if any."""
+    cache = _cache()
+    key = HOLDS_KEY.format(slot_id)
+    with _SlotLock(slot_id):
+        holds = _live(cache.get(key), time.time())
+        if holds.pop(user_id, None) is None:
+            return False
+        if holds:
+            cache.set(key, holds, max(1, int(max(holds.values()) - time.time())))
+        else:
+            cache.delete(key)
+    return True
+
+
+def active_hold_counts(slot_ids, exclude_user_id=None):
+    """Return ``{slot_id: live hold count}`` for ``slot_ids`` in one cache round trip."""
+    slot_ids = list(slot_ids)
+    if not slot_ids:
+        return {}
+    now = time.time()
+    found = _cache().get_many([HOLDS_KEY.format(slot_id) for slot_id in slot_ids])
+    counts = {}
+    for slot_id in slot_ids:
+        holds = _live(found.get(HOLDS_KEY.format(slot_id)), now)
+        holds.pop(exclude_user_id, None)
+        counts[slot_id] = len(holds)
+    return counts
+
+
+def available_slots(slots, user_id=None):
+    """Filter ``slots`` down to those with room once other students' holds are counted."""
+    slots = list(slots)
+    counts = active_hold_counts([slot.pk for slot in slots], exclude_user_id=user_id)
+    return [slot for slot in slots if slot.current_orders + counts[slot.pk] < slot.max_orders]
+
+
+def reserve_slot(slot, user_id):
+    """Convert ``user_id``'s hold (or a free place) into a real reservation.
+
+    The increment is a single conditional UPDATE, so concurrent checkouts
+    never push ``current_orders`` past ``max_orders`` and no row lock is taken.
+    """
+    others = active_hold_counts([slot.pk], exclude_user_id=user_id)[slot.pk]
+    reserved = PickupTimeSlot.objects.filter(
+        pk=slot.pk,
+        current_orders__lt=F('max_orders') - others,
+    ).update(current_orders=F('current_orders') + 1)
+    if not reserved:
+        return False
+    # Keep the hold until the reservation is committed so a rollback doesn't lose the place
+    transaction.on_commit(lambda: release_hold(slot.pk, user_id))
+    slot.refresh_from_db(fields=['current_orders'])
+    return True
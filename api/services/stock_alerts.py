@@ -0,0 +1,89 @@
+"""Low-stock alerts driven by changes to ``Product.quantity``.
+
+A product is low on stock when it has a ``reorder_level`` and its quantity
+has fallen to it. ``evaluate`` runs on every save that touches either
+field (see ``api.signals``), and ``evaluate_all`` after the stock taken by
+an order (``cart.services.place_cart_order``); they keep the indexed
+``Product.low_stock`` flag in step. The flag is flipped with a conditional ``UPDATE``, so
+whichever change crosses the threshold first sends the one alert, and
+nothing is sent again until stock has been replenished above the level.
+Alerts are queued in the notification outbox.
+"""
+import logging
+
+from django.conf import settings
+from django.db.models import F, Q
+
+from ..metrics import registry
+from ..models import Product, UserProfile
+from .outbox import enqueue_email
+
+logger = logging.getLogger(__name__)
+
+registry.describe('low_stock_alerts_total', 'Low-stock alerts queued, one per product crossing its reorder level')
+
+LOW = Q(reorder_level__gt=0, quantity__lte=F('reorder_level'))
+
+
+def is_low(quantity, reorder_level):
+    return reorder_level > 0 and quantity <= reorder_level
+
+
+def _recipients():
+    recipients = getattr(settings, 'LOW_STOCK_ALERT_RECIPIENTS', [])
+    if recipients:
+        return recipients
+    return list(UserProfile.objects.filter(user_type='shopkeeper', is_active=True).values_list('email', flat=True))
+
+
+def _alert(product):
+    for email in _recipients():
+        enqueue_email(
+            to_email=email,
+            subject=f"Low stock: {product.name} ({product.quantity} left)",
+            template_name='low_stock',
+            context={
+                'product_id': product.pk,
+                'name': product.name,
+                'quantity': product.quantity,
+                'reorder_level': product.reorder_level,
+            },
+            coalesce_key=f'low-stock:{product.pk}',
+        )
+    registry.inc('low_stock_alerts_total')
+    logger.info("Product %s is low on stock (%s left, reorder level %s)", product.pk, product.quantity, product.reorder_level)
+
+
+def evaluate(product):
+    """Update ``product.low_stock`` from its stored quantity; alerts when it becomes low.
+
+    Does nothing, without a query, when the loaded values already agree
+    with the flag.
+    """
+    if not isinstance(product.quantity, int):
+        # Saved with an F() expression; read back the result
+        product.refresh_from_db(fields=['quantity'])
+    if is_low(product.quantity, product.reorder_level) == product.low_stock:
+        return
+    products = Product.objects.filter(pk=product.pk)
+    if products.filter(LOW, low_stock=False).update(low_stock=True):
+        product.low_stock = True
+        _alert(product)
+    elif products.filter(low_stock=True).exclude(LOW).update(low_stock=False):
+        product.low_stock = False
+
+
+def evaluate_all(product_ids=None):
+    """Reconcile the flag for products changed in bulk (``QuerySet.update`` skips the signals)."""
+    products = Product.objects.all() if product_ids is None else Product.objects.filter(pk__in=product_ids)
+    alerted = 0
+    for product in products.filter(LOW, low_stock=False).only('id', 'name', 'quantity', 'reorder_level', 'low_stock'):
+        evaluate(product)
+        alerted += product.low_stock
+    cleared = products.filter(low_stock=True).exclude(LOW).update(low_stock=False)
+    return {'alerted': alerted, 'cleared': cleared}
+
+
+def low_stock_products():
+    """Products at or below their reorder level, lowest stock first (served by ``product_low_stock_idx``)."""
+    return Product.objects.filter(low_stock=True).order_by('quantity', 'pk')
@@ -0,0 +1,141 @@
+from django.contrib.auth.signals import user_logged_in
+from django.db.models.signals import post_delete, post_init, post_save, pre_save
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from .authentication import forget_token, forget_user, record_login
+from .models import Order, OrderItem, Product, UserProfile
+from .services.sales_rollups import record_change, record_items
+from .services.stock_alerts import evaluate as evaluate_stock
+
+ROLLUP_FIELDS = ('status', 'total_amount', 'created_at')
+ITEM_FIELDS = ('product_id', 'quantity', 'price_at_time_of_order')
+
+
+def _loaded(instance, fields):
+    """The values of ``fields`` as loaded, or None if any of them were deferred."""
+    if any(field not in instance.__dict__ for field in fields):
+        return None
+    return tuple(instance.__dict__[field] for field in fields)
+
+
+def _rollup_state(order):
+    return _loaded(order, ROLLUP_FIELDS)
+
+
+def _stored_rollup_state(order):
+    return Order.objects.filter(pk=order.pk).values_list(*ROLLUP_FIELDS).first()
+
+
+@receiver(post_init, sender=Order)
+def remember_rollup_state(sender, instance, **kwargs):
+    instance._rollup_state = _rollup_state(instance)
+
+
+@receiver(pre_save, sender=Order)
+def load_rollup_state(sender, instance, update_fields=None, **kwargs):
+    """Fetch the stored state of an order that was loaded with deferred fields."""
+    if instance._state.adding or instance._rollup_state is not None:
+        return
+    if update_fields is not None and not set(update_fields) & {'status', 'total_amount'}:
+        return
+    instance._rollup_state = _stored_rollup_state(instance)
+
+
+@receiver(post_save, sender=Order)
+def order_saved(sender, instance, created, update_fields=None, **kwargs):
+    """Keep the sales rollups in step with the order's status and total."""
+    if update_fields is not None and not set(update_fields) & {'status', 'total_amount'}:
+        return
+    old = None if created else instance._rollup_state
+    new = _rollup_state(instance) or _stored_rollup_state(instance)
+    if old != new:
+        record_change(old, new)
+        _move_items(instance, old, new)
+    instance._rollup_state = new
+
+
+def _move_items(order, old, new):
+    """Move the order's lines between product rollups when it enters or leaves ``completed``."""
+    was = old is not None and old[0] == 'completed'
+    now = new[0] == 'completed'
+    if not (was or now) or (was and now and old[2] == new[2]):
+        return
+    items = list(order.items.values_list(*ITEM_FIELDS))
+    if was:
+        record_items(old[2], items, -1)
+    if now:
+        record_items(new[2], items)
+
+
+@receiver(post_delete, sender=Order)
+def order_deleted(sender, instance, **kwargs):
+    record_change(instance._rollup_state, None)
+
+
+def _completed_at(item):
+    """``created_at`` of the item's order if that order is completed, else None."""
+    if OrderItem.order.is_cached(item):
+        order = item.order
+        return order.created_at if order.status == 'completed' else None
+    return Order.objects.filter(pk=item.order_id, status='completed').values_list('created_at', flat=True).first()
+
+
+@receiver(post_init, sender=OrderItem)
+def remember_item_state(sender, instance, **kwargs):
+    instance._rollup_state = _loaded(instance, ITEM_FIELDS)
+
+
+@receiver(pre_save, sender=OrderItem)
+def load_item_state(sender, instance, **kwargs):
+    if not instance._state.adding and instance._rollup_state is None:
+        instance._rollup_state = OrderItem.objects.filter(pk=instance.pk).values_list(*ITEM_FIELDS).first()
+
+
+@receiver(post_save, sender=OrderItem)
+def order_item_saved(sender, instance, created, **kwargs):
+    """Lines changed on an already completed order adjust its product rollups."""
+    old = None if created else instance._rollup_state
+    new = _loaded(instance, ITEM_FIELDS) or OrderItem.objects.filter(pk=instance.pk).values_list(*ITEM_FIELDS).first()
+    if old != new:
+        created_at = _completed_at(instance)
+        if created_at is not None:
+            if old is not None:
+                record_items(created_at, [old], -1)
+            record_items(created_at, [new])
+    instance._rollup_state = new
+
+
+@receiver(post_delete, sender=OrderItem)
+def order_item_deleted(sender, instance, **kwargs):
+    if instance._rollup_state is None:
+        return
+    created_at = _completed_at(instance)
+    if created_at is not None:
+        record_items(created_at, [instance._rollup_state], -1)
+
+
+@receiver(post_save, sender=Product)
+def product_stock_changed(sender, instance, update_fields=None, **kwargs):
+    """Flag (and alert on) products whose stock falls to their reorder level."""
+    if update_fields is not None and not set(update_fields) & {'quantity', 'reorder_level'}:
+        return
+    evaluate_stock(instance)
+
+
+@receiver(post_save, sender=UserProfile)
+@receiver(post_delete, sender=UserProfile)
+def user_changed(sender, instance, **kwargs):
+    """Drop the cached copy used by authentication (covers deactivation and password changes)."""
+    forget_user(instance.pk)
+
+
+@receiver(post_save, sender=Token)
+@receiver(post_delete, sender=Token)
+def token_changed(sender, instance, **kwargs):
+    forget_token(instance.key)
+
+
+# Coalesced last_login writes instead of one UPDATE per login
+user_logged_in.disconnect(dispatch_uid='update_last_login')
+user_logged_in.connect(record_login, dispatch_uid='update_last_login')
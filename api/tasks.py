@@ -0,0 +1,25 @@
+from celery import shared_task
+
+from .services.outbox import dispatch_pending
+from .services.payment_events import process_events
+
+
+@shared_task
+def dispatch_outbox(message_id=None):
+    """Deliver one outbox message, or sweep every due message when no id is given."""
+    return dispatch_pending([message_id] if message_id is not None else None)
+
+
+@shared_task
+def process_payment_events(event_id=None):
+    """Apply one stored webhook event, or every pending one when no id is given."""
+    return process_events([event_id] if event_id is not None else None)
+
+
+@shared_task
+def refresh_demand_forecast():
+    """Rebuild the per-product weekday/hour demand forecasts from order history."""
+    # Imported here so only the worker running the job loads NumPy
+    from .services.forecasting import refresh_forecasts
+
+    return refresh_forecasts()
@@ -0,0 +1,75 @@
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+
+from django.test import TestCase
+from django.utils import timezone
+
+from api.models import SalesRollup
+from api.services.analytics import AnalyticsError, sales_series
+
+# A Monday
+MONDAY = date(2026, 6, 1)
+
+
+def _rollup(period, day, revenue, orders, units, hour=0):
+    SalesRollup.objects.create(
+        period=period,
+        bucket_start=timezone.make_aware(datetime(day.year, day.month, day.day, hour)),
+        completed_revenue=Decimal(revenue),
+        completed_orders=orders,
+        completed_units=units,
+    )
+
+
+class SalesSeriesTests(TestCase):
+    def test_days_without_sales_are_zeros(self):
+        _rollup('day', MONDAY, '30.00', 2, 3)
+        _rollup('day', MONDAY + timedelta(days=3), '12.50', 1, 5)
+
+        series = sales_series(MONDAY, MONDAY + timedelta(days=4), window=1)
+
+        self.assertEqual(series['labels'], [(MONDAY + timedelta(days=day)).isoformat() for day in range(5)])
+        self.assertEqual(series['revenue'], [30.0, 0.0, 0.0, 12.5, 0.0])
+        self.assertEqual(series['orders'], [2, 0, 0, 1, 0])
+        self.assertEqual(series['units'], [3, 0, 0, 5, 0])
+        self.assertEqual(series['totals'], {'revenue': 42.5, 'orders': 3, 'units': 8})
+
+    def test_hours_are_placed_on_a_dense_axis(self):
+        _rollup('hour', MONDAY, '8.00', 1, 1, hour=10)
+        series = sales_series(MONDAY, MONDAY, bucket='hour', window=1)
+        self.assertEqual(len(series['labels']), 24)
+        self.assertEqual(series['revenue'][10], 8.0)
+        self.assertEqual(sum(series['revenue']), 8.0)
+
+    def test_weeks_are_resampled_monday_to_sunday(self):
+        _rollup('day', MONDAY, '10.00', 1, 1)
+        _rollup('day', MONDAY + timedelta(days=6), '20.00', 2, 2)
+        _rollup('day', MONDAY + timedelta(days=7), '5.00', 1, 4)
+
+        # Wednesday to the following Tuesday widens to two whole weeks
+        series = sales_series(MONDAY + timedelta(days=2), MONDAY + timedelta(days=8), bucket='week', window=1)
+
+        self.assertEqual(series['labels'], [MONDAY.isoformat(), (MONDAY + timedelta(weeks=1)).isoformat()])
+        self.assertEqual(series['revenue'], [30.0, 5.0])
+        self.assertEqual(series['orders'], [3, 1])
+        self.assertEqual(series['units'], [3, 4])
+
+    def test_moving_average_starts_at_the_first_full_window(self):
+        for day, revenue in enumerate(['3.00', '6.00', '9.00', '0.00', '1.00']):
+            if revenue != '0.00':
+                _rollup('day', MONDAY + timedelta(days=day), revenue, 1, 1)
+        end = MONDAY + timedelta(days=4)
+
+        self.assertEqual(sales_series(MONDAY, end, window=3)['revenue_moving_average'], [None, None, 6.0, 5.0, 3.33])
+        self.assertEqual(sales_series(MONDAY, end, window=5)['revenue_moving_average'], [None] * 4 + [3.8])
+        self.assertEqual(sales_series(MONDAY, end, window=6)['revenue_moving_average'], [None] * 5)
+        self.assertEqual(sales_series(MONDAY, end, window=1)['revenue_moving_average'], [3.0, 6.0, 9.0, 0.0, 1.0])
+
+    def test_invalid_ranges(self):
+        with self.assertRaises(AnalyticsError):
+            sales_series(MONDAY, MONDAY - timedelta(days=1))
+        with self.assertRaises(AnalyticsError):
+            sales_series(MONDAY, MONDAY, bucket='minute')
+        with self.settings(ANALYTICS_MAX_BUCKETS=48):
+            with self.assertRaises(AnalyticsError):
+                sales_series(MONDAY, MONDAY + timedelta(days=2), bucket='hour')
@@ -0,0 +1,98 @@
+from datetime import timedelta
+from unittest import mock
+
+from django.contrib.auth.signals import user_logged_in
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import AccessToken
+
+from api.authentication import AUTH_USER_KEY, cached_user
+from api.models import UserProfile
+
+
+class AuthenticationCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = UserProfile.objects.create_user(email='student@example.com', password='secret-123')
+        self.token = Token.objects.create(user=self.user)
+        self.client = APIClient()
+
+    def _get(self, credentials):
+        return self.client.get('/api/orders/', HTTP_AUTHORIZATION=credentials)
+
+    def _auth_queries(self, credentials):
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self._get(credentials).status_code, 200)
+        return [query['sql'] for query in queries if 'api_order' not in query['sql']]
+
+    def test_token_user_served_from_cache(self):
+        self.assertEqual(len(self._auth_queries(f'Token {self.token.key}')), 1)
+        self.assertEqual(self._auth_queries(f'Token {self.token.key}'), [])
+
+    def test_jwt_user_served_from_cache(self):
+        credentials = f'Bearer {AccessToken.for_user(self.user)}'
+        self.assertEqual(len(self._auth_queries(credentials)), 1)
+        self.assertEqual(self._auth_queries(credentials), [])
+
+    def test_password_hash_is_not_cached(self):
+        self._get(f'Token {self.token.key}')
+        entry = cache.get(AUTH_USER_KEY.format(self.user.pk))
+        self.assertEqual(entry['fields']['email'], 'student@example.com')
+        self.assertNotIn('password', entry['fields'])
+        self.assertNotIn(self.user.password, str(entry))
+
+        user = cached_user(self.user.pk)
+        self.assertEqual(user.pk, self.user.pk)
+        with self.assertNumQueries(1):
+            self.assertTrue(user.check_password('secret-123'))
+
+    def test_token_from_before_a_password_change_is_rejected(self):
+        # simplejwt's modules share this object; overriding SIMPLE_JWT would not reach them
+        with mock.patch.object(api_settings, 'CHECK_REVOKE_TOKEN', True, create=True):
+            old = f'Bearer {AccessToken.for_user(self.user)}'
+            self.assertEqual(self._get(old).status_code, 200)
+            self.user.set_password('changed-456')
+            # An update() leaves the cached entry in place
+            UserProfile.objects.filter(pk=self.user.pk).update(password=self.user.password)
+            new = f'Bearer {AccessToken.for_user(self.user)}'
+            self.assertEqual(self._get(new).status_code, 200)
+            self.assertEqual(self._get(old).status_code, 401)
+            self.assertEqual(len(self._auth_queries(new)), 0)
+
+    def test_deactivation_applies_once_committed(self):
+        credentials = f'Bearer {AccessToken.for_user(self.user)}'
+        self._get(credentials)
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.user.is_active = False
+            self.user.save()
+        # Not committed yet, so the cached entry stays
+        self.assertIsNotNone(cache.get(AUTH_USER_KEY.format(self.user.pk)))
+        for callback in callbacks:
+            callback()
+        self.assertEqual(self._get(credentials).status_code, 401)
+        self.assertEqual(self._get(f'Token {self.token.key}').status_code, 401)
+
+    def test_deleted_token_is_rejected(self):
+        credentials = f'Token {self.token.key}'
+        self._get(credentials)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.token.delete()
+        self.assertEqual(self._get(credentials).status_code, 401)
+
+    def test_last_login_writes_are_coalesced(self):
+        user_logged_in.send(sender=UserProfile, request=None, user=self.user)
+        first = UserProfile.objects.get(pk=self.user.pk).last_login
+        self.assertIsNotNone(first)
+        with self.assertNumQueries(0):
+            user_logged_in.send(sender=UserProfile, request=None, user=self.user)
+
+        self.user.last_login = timezone.now() - timedelta(hours=1)
+        user_logged_in.send(sender=UserProfile, request=None, user=self.user)
+        self.assertGreater(UserProfile.objects.get(pk=self.user.pk).last_login, first - timedelta(seconds=1))
+        self.assertGreater(self.user.last_login, timezone.now() - timedelta(minutes=1))
@@ -0,0 +1,25 @@
+from django.test import SimpleTestCase, override_settings
+
+from api.utils import fake_providers
+from api.utils.fake_providers import FakeProvider
+from api.utils.sms_service import send_bulk_sms
+
+
+class FakeProviderTests(SimpleTestCase):
+    def test_recorded_calls_are_bounded(self):
+        fake = FakeProvider('sendgrid', max_calls=3)
+        for number in range(5):
+            fake.call('mail.send', {'number': number})
+        self.assertEqual([call['payload']['number'] for call in fake.calls], [2, 3, 4])
+
+    @override_settings(
+        FAKE_PROVIDERS={'twilio': {}}, TWILIO_ACCOUNT_SID='', TWILIO_AUTH_TOKEN='', TWILIO_PHONE_NUMBER='',
+    )
+    def test_fake_sms_needs_no_credentials(self):
+        self.assertEqual(send_bulk_sms([('+911234567890', 'Your order is ready')]), [True])
+        self.assertEqual(len(fake_providers.calls('twilio', 'messages.create')), 1)
+
+    @override_settings(FAKE_PROVIDERS={}, TWILIO_ACCOUNT_SID='', TWILIO_AUTH_TOKEN='', TWILIO_PHONE_NUMBER='')
+    def test_real_sms_still_requires_credentials(self):
+        with self.assertLogs('api.utils.sms_service', 'WARNING'):
+            self.assertEqual(send_bulk_sms([('+911234567890', 'Your order is ready')]), [False])
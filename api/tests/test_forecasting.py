@@ -0,0 +1,110 @@
+from datetime import date, datetime
+from decimal import Decimal
+
+import numpy as np
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+
+from api.models import DemandForecast, Order, OrderItem, PickupTimeSlot, Product, UserProfile
+from api.services.forecasting import demand_matrix, refresh_forecasts, smooth, staging_plan
+
+# A Monday
+MONDAY = date(2026, 6, 1)
+
+
+def _at(day, hour, minute=0):
+    return timezone.make_aware(datetime(day.year, day.month, day.day, hour, minute))
+
+
+class SmoothingTests(SimpleTestCase):
+    def test_units_are_placed_by_week_weekday_and_hour(self):
+        buckets = np.array(['2026-06-03T10', '2026-06-08T09', '2026-06-03T10'], dtype='datetime64[h]')
+        products, demand = demand_matrix(
+            np.array([7, 7, 3]), buckets, np.array([2.0, 1.0, 5.0]), MONDAY, weeks=2,
+        )
+        self.assertEqual(products.tolist(), [3, 7])
+        self.assertEqual(demand.shape, (2, 2, 7, 24))
+        self.assertEqual(demand[1, 0, 2, 10], 2.0)
+        self.assertEqual(demand[1, 1, 0, 9], 1.0)
+        self.assertEqual(demand[0, 0, 2, 10], 5.0)
+        self.assertEqual(demand.sum(), 8.0)
+
+    def test_weeks_before_the_first_sale_are_ignored(self):
+        demand = np.zeros((2, 3, 7, 24))
+        demand[0, :, 0, 10] = [0, 4, 8]
+        forecast = smooth(demand, alpha=0.5)
+        # Weights 0.25 and 0.5 for the two weeks since the first sale, normalised to 1/3 and 2/3
+        self.assertAlmostEqual(forecast[0, 0, 10], 20 / 3)
+        self.assertEqual(forecast[0].sum(), forecast[0, 0, 10])
+        self.assertEqual(forecast[1].sum(), 0)
+
+    def test_steady_demand_forecasts_itself(self):
+        demand = np.zeros((1, 4, 7, 24))
+        demand[0, :, 4, 13] = 3
+        self.assertAlmostEqual(smooth(demand, alpha=0.3)[0, 4, 13], 3)
+
+
+@override_settings(FORECAST_SAFETY_MARGIN=0.2)
+class StagingPlanTests(TestCase):
+    def setUp(self):
+        self.pen = Product.objects.create(name='Pen', price='10.00', quantity=100)
+        self.eraser = Product.objects.create(name='Eraser', price='5.00', quantity=100)
+        self.slot = PickupTimeSlot.objects.create(
+            start_time=_at(MONDAY, 10), end_time=_at(MONDAY, 11, 30),
+        )
+
+    def _forecast(self, product, weekday, hour, units):
+        DemandForecast.objects.create(
+            product=product, weekday=weekday, hour=hour, expected_units=units, computed_at=timezone.now(),
+        )
+
+    def test_expected_units_are_prorated_and_rounded_up_with_margin(self):
+        self._forecast(self.pen, 0, 10, 2.0)
+        self._forecast(self.pen, 0, 11, 1.0)
+        self._forecast(self.pen, 1, 10, 50.0)
+        # 0.3 * 1.2 is under half a unit, so it isn't worth staging
+        self._forecast(self.eraser, 0, 10, 0.3)
+
+        [plan] = staging_plan([self.slot])
+
+        self.assertEqual(plan['slot_id'], self.slot.pk)
+        self.assertEqual(plan['products'], [
+            {'product_id': self.pen.pk, 'name': 'Pen', 'expected_units': 2.5, 'suggested_quantity': 3},
+        ])
+
+    def test_products_are_ordered_by_expected_units(self):
+        self._forecast(self.eraser, 0, 10, 5.0)
+        self._forecast(self.pen, 0, 10, 1.0)
+        [plan] = staging_plan([self.slot])
+        self.assertEqual([product['name'] for product in plan['products']], ['Eraser', 'Pen'])
+        self.assertEqual([product['suggested_quantity'] for product in plan['products']], [6, 2])
+
+    def test_no_history(self):
+        with self.assertNumQueries(0):
+            self.assertEqual(staging_plan([]), [])
+        self.assertEqual(staging_plan([self.slot])[0]['products'], [])
+
+        report = refresh_forecasts(now=_at(MONDAY, 12))
+        self.assertEqual((report['products'], report['buckets'], report['forecasts']), (0, 0, 0))
+        self.assertFalse(DemandForecast.objects.exists())
+
+
+@override_settings(FORECAST_HISTORY_WEEKS=2, FORECAST_SMOOTHING=0.5)
+class RefreshForecastsTests(TestCase):
+    def test_forecasts_replace_the_stored_ones(self):
+        student = UserProfile.objects.create_user(email='student@example.com', password='secret-123')
+        pen = Product.objects.create(name='Pen', price='10.00', quantity=100)
+        DemandForecast.objects.create(product=pen, weekday=6, hour=23, expected_units=9, computed_at=timezone.now())
+        for week, quantity in ((0, 2), (1, 4)):
+            slot = PickupTimeSlot.objects.create(
+                start_time=_at(date(2026, 6, 1 + 7 * week), 10), end_time=_at(date(2026, 6, 1 + 7 * week), 11),
+            )
+            order = Order.objects.create(student=student, pickup_slot=slot, total_amount=Decimal('10.00'))
+            OrderItem.objects.create(order=order, product=pen, quantity=quantity, price_at_time_of_order=Decimal('10.00'))
+
+        report = refresh_forecasts(now=_at(date(2026, 6, 15), 8))
+
+        self.assertEqual((report['products'], report['buckets'], report['forecasts']), (1, 2, 1))
+        forecast = DemandForecast.objects.get()
+        # Weights 0.25 and 0.5, normalised: (2 + 2 * 4) / 3
+        self.assertEqual((forecast.weekday, forecast.hour, forecast.expected_units), (0, 10, round(10 / 3, 3)))
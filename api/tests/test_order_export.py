@@ -0,0 +1,64 @@
+import csv
+import gzip
+import io
+import json
+from decimal import Decimal
+
+from django.test import TestCase
+
+from api.models import Order, OrderItem, Product, UserProfile
+from api.services.order_export import CSV_COLUMNS, export, filter_orders
+
+
+class OrderExportTests(TestCase):
+    def setUp(self):
+        student = UserProfile.objects.create_user(email='student@example.com', password='secret-123')
+        pen = Product.objects.create(name='Pen', price='10.00', quantity=100)
+        notebook = Product.objects.create(name='Notebook, ruled', price='40.00', quantity=100)
+        self.orders = []
+        # Five orders; the third has no items
+        for number in range(5):
+            order = Order.objects.create(student=student, total_amount=Decimal('50.00'))
+            if number != 2:
+                OrderItem.objects.create(order=order, product=pen, quantity=1, price_at_time_of_order=Decimal('10.00'))
+                OrderItem.objects.create(order=order, product=notebook, quantity=1, price_at_time_of_order=Decimal('40.00'))
+            self.orders.append(order)
+
+    def _export(self, **kwargs):
+        return b''.join(export(Order.objects.all(), **kwargs))
+
+    def test_keyset_chunks_cover_every_order_once(self):
+        # Three chunks of at most two orders, then one empty read: one orders and one items query per chunk
+        with self.assertNumQueries(7):
+            data = self._export(output='jsonl', chunk_size=2)
+        records = [json.loads(line) for line in data.decode().splitlines()]
+        self.assertEqual([record['order_id'] for record in records], [order.pk for order in self.orders])
+        self.assertEqual([len(record['items']) for record in records], [2, 2, 0, 2, 2])
+
+        # A chunk boundary on the last order
+        with self.assertNumQueries(3):
+            self.assertEqual(self._export(output='jsonl', chunk_size=5), data)
+
+    def test_csv_has_a_row_per_item(self):
+        rows = list(csv.reader(io.StringIO(self._export(output='csv', chunk_size=2).decode())))
+        self.assertEqual(rows[0], CSV_COLUMNS)
+        body = [dict(zip(CSV_COLUMNS, row)) for row in rows[1:]]
+        self.assertEqual(len(body), 9)
+        empty = [row for row in body if row['order_id'] == str(self.orders[2].pk)]
+        self.assertEqual(len(empty), 1)
+        self.assertEqual(empty[0]['item_id'], '')
+        self.assertEqual(body[1]['product_name'], 'Notebook, ruled')
+        self.assertEqual(body[1]['price'], '40.00')
+
+    def test_gzip_decompresses_to_the_plain_export(self):
+        for output in ('csv', 'jsonl'):
+            plain = self._export(output=output, chunk_size=2)
+            self.assertEqual(gzip.decompress(self._export(output=output, gzip=True, chunk_size=2)), plain)
+
+    def test_filters(self):
+        Order.objects.filter(pk=self.orders[0].pk).update(status='completed')
+        self.assertEqual(list(filter_orders(status='completed')), [self.orders[0]])
+        with self.assertRaises(ValueError):
+            filter_orders(status='lost')
+        with self.assertRaises(ValueError):
+            list(export(Order.objects.all(), output='xml'))
@@ -0,0 +1,109 @@
+from datetime import timedelta
+from unittest import mock
+
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from api.models import OutboxMessage
+from api.services import outbox
+from api.tasks import dispatch_outbox
+
+
+def _make_due(*messages):
+    OutboxMessage.objects.filter(pk__in=[message.pk for message in messages]).update(
+        available_at=timezone.now() - timedelta(seconds=1)
+    )
+
+
+@override_settings(NOTIFICATION_COALESCE_WINDOW=60, OUTBOX_MAX_ATTEMPTS=3)
+@mock.patch('api.utils.email_service.send_bulk_email', side_effect=lambda messages: [True] * len(messages))
+class OutboxTests(TestCase):
+    def _status(self, message):
+        message.refresh_from_db()
+        return message.status
+
+    def _status_update(self, order_id, recipient='student@example.com'):
+        return outbox.enqueue_email(
+            recipient, f'Order #{order_id} is now Ready', 'status_update',
+            context={'status': 'Ready'}, coalesce_key=f'order-status:{order_id}',
+        )
+
+    def test_newer_message_suppresses_pending_one(self, send):
+        first = self._status_update(1)
+        second = self._status_update(1)
+        self.assertEqual(self._status(first), 'suppressed')
+        self.assertEqual(self._status(second), 'pending')
+        self.assertGreater(second.available_at, timezone.now())
+
+    def test_leased_message_is_not_suppressed(self, send):
+        first = self._status_update(1)
+        _make_due(first)
+        claimed = outbox._claim()
+        self.assertEqual([message.pk for message in claimed], [first.pk])
+        self.assertEqual(self._status(first), 'sending')
+
+        self._status_update(1)
+        self.assertEqual(self._status(first), 'sending')
+
+    def test_expired_lease_is_claimed_again(self, send):
+        message = self._status_update(1)
+        _make_due(message)
+        outbox._claim()
+        self.assertEqual(outbox._claim(), [])
+        _make_due(message)
+        self.assertEqual([claimed.pk for claimed in outbox._claim()], [message.pk])
+
+    def test_due_emails_to_one_recipient_fold_into_a_digest(self, send):
+        first, second = self._status_update(1), self._status_update(2)
+        other = self._status_update(3, recipient='other@example.com')
+        _make_due(first, second, other)
+
+        report = outbox.dispatch_pending()
+
+        self.assertEqual(report, {'sent': 2, 'retried': 0, 'failed': 0, 'suppressed': 1})
+        sent = send.call_args.args[0]
+        self.assertEqual(len(sent), 2)
+        digest = next(message for message in sent if message['to_email'] == 'student@example.com')
+        self.assertEqual(digest['template_name'], 'status_update_digest')
+        self.assertEqual(digest['subject'], 'Updates on 2 of your orders')
+        self.assertEqual(len(digest['context']['updates']), 2)
+        self.assertEqual(
+            sorted(OutboxMessage.objects.values_list('status', flat=True)), ['sent', 'sent', 'suppressed']
+        )
+
+    def test_dispatch_by_id_folds_siblings_into_a_digest(self, send):
+        first, second = self._status_update(1), self._status_update(2)
+        other = self._status_update(3, recipient='other@example.com')
+        _make_due(first)
+
+        # As the task queued for the first message runs; the second is still in its window
+        report = dispatch_outbox(first.pk)
+
+        self.assertEqual(report, {'sent': 1, 'retried': 0, 'failed': 0, 'suppressed': 1})
+        [digest] = send.call_args.args[0]
+        self.assertEqual(digest['subject'], 'Updates on 2 of your orders')
+        self.assertEqual(self._status(second), 'suppressed')
+        self.assertEqual(self._status(other), 'pending')
+
+        # The second message's own task finds nothing left to send
+        _make_due(second)
+        self.assertEqual(dispatch_outbox(second.pk), {'sent': 0, 'retried': 0, 'failed': 0, 'suppressed': 0})
+
+    def test_dispatch_by_id_leaves_backed_off_siblings(self, send):
+        first, second = self._status_update(1), self._status_update(2)
+        _make_due(first)
+        OutboxMessage.objects.filter(pk=second.pk).update(available_at=timezone.now() + timedelta(hours=1))
+
+        dispatch_outbox(first.pk)
+
+        self.assertEqual(send.call_args.args[0][0]['template_name'], 'status_update')
+        self.assertEqual(self._status(second), 'pending')
+
+    def test_failed_send_is_retried_then_failed(self, send):
+        send.side_effect = lambda messages: [False] * len(messages)
+        message = outbox.enqueue_email('student@example.com', 'Order Confirmation #1', 'order_confirmation')
+        for expected in ('pending', 'pending', 'failed'):
+            _make_due(message)
+            outbox.dispatch_pending()
+            self.assertEqual(self._status(message), expected)
+        self.assertEqual(message.attempts, 3)
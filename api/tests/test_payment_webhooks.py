@@ -0,0 +1,118 @@
+import hashlib
+import hmac
+import json
+import time
+from decimal import Decimal
+
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+
+from api.models import Order, PaymentEvent, UserProfile
+from api.services.payment_events import (
+    InvalidSignature, process_events, verify_razorpay_signature, verify_stripe_signature,
+)
+
+STRIPE_SECRET = 'whsec_test'
+RAZORPAY_SECRET = 'rzp_webhook_test'
+
+
+def stripe_header(payload, timestamp=None, secret=STRIPE_SECRET):
+    timestamp = str(int(time.time()) if timestamp is None else timestamp)
+    signature = hmac.new(secret.encode(), timestamp.encode() + b'.' + payload, hashlib.sha256).hexdigest()
+    return f't={timestamp},v1={signature}'
+
+
+def razorpay_signature(payload, secret=RAZORPAY_SECRET):
+    return hmac.new(secret.encode(), payload, hashlib.sha256).hexdigest()
+
+
+@override_settings(STRIPE_WEBHOOK_SECRET=STRIPE_SECRET, RAZORPAY_WEBHOOK_SECRET=RAZORPAY_SECRET)
+class SignatureTests(TestCase):
+    payload = b'{"id": "evt_1"}'
+
+    def test_stripe_signature(self):
+        verify_stripe_signature(self.payload, stripe_header(self.payload))
+        for header in (
+            stripe_header(self.payload, secret='whsec_other'),
+            stripe_header(b'{"id": "evt_2"}'),
+            stripe_header(self.payload, timestamp=int(time.time()) - 3600),
+            'v1=abc',
+            '',
+        ):
+            with self.subTest(header=header), self.assertRaises(InvalidSignature):
+                verify_stripe_signature(self.payload, header)
+
+    def test_razorpay_signature(self):
+        verify_razorpay_signature(self.payload, razorpay_signature(self.payload))
+        with self.assertRaises(InvalidSignature):
+            verify_razorpay_signature(self.payload, razorpay_signature(self.payload, secret='other'))
+        with self.assertRaises(InvalidSignature):
+            verify_razorpay_signature(self.payload, '')
+
+
+@override_settings(STRIPE_WEBHOOK_SECRET=STRIPE_SECRET, RAZORPAY_WEBHOOK_SECRET=RAZORPAY_SECRET)
+class WebhookTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        student = UserProfile.objects.create_user(email='student@example.com', password='secret-123')
+        self.order = Order.objects.create(student=student, total_amount=Decimal('45.00'))
+
+    def _stripe(self, event_id, event_type='payment_intent.succeeded', amount=4500, header=None):
+        payload = json.dumps({
+            'id': event_id,
+            'type': event_type,
+            'data': {'object': {
+                'id': 'pi_123', 'amount': amount, 'amount_received': amount,
+                'metadata': {'order_id': str(self.order.pk)},
+            }},
+        }).encode()
+        return self.client.post(
+            '/api/webhooks/stripe/', payload, content_type='application/json',
+            HTTP_STRIPE_SIGNATURE=header or stripe_header(payload),
+        )
+
+    def test_bad_signature_is_rejected(self):
+        response = self._stripe('evt_1', header='t=1,v1=bad')
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(PaymentEvent.objects.exists())
+
+    def test_redelivered_event_is_stored_once(self):
+        self.assertEqual(self._stripe('evt_1').json(), {'received': True, 'duplicate': False})
+        self.assertEqual(self._stripe('evt_1').json(), {'received': True, 'duplicate': True})
+        self.assertEqual(PaymentEvent.objects.count(), 1)
+
+        self.assertEqual(process_events(), {'processed': 1, 'ignored': 0, 'failed': 0})
+        self.order.refresh_from_db()
+        self.assertEqual((self.order.payment_status, self.order.payment_reference), ('paid', 'pi_123'))
+        self.assertEqual(process_events(), {'processed': 0, 'ignored': 0, 'failed': 0})
+
+    def test_late_failure_does_not_undo_payment(self):
+        self._stripe('evt_paid')
+        self._stripe('evt_failed', event_type='payment_intent.payment_failed')
+        process_events()
+        self.order.refresh_from_db()
+        self.assertEqual(self.order.payment_status, 'paid')
+
+    def test_wrong_amount_is_not_marked_paid(self):
+        self._stripe('evt_short', amount=4000)
+        self.assertEqual(process_events(), {'processed': 0, 'ignored': 0, 'failed': 1})
+        self.order.refresh_from_db()
+        self.assertEqual(self.order.payment_status, 'unpaid')
+
+    def test_razorpay_event_deduplicated_by_event_id(self):
+        payload = json.dumps({
+            'event': 'payment.captured',
+            'payload': {'payment': {'entity': {
+                'id': 'pay_123', 'amount': 4500, 'notes': {'order_id': str(self.order.pk)},
+            }}},
+        }).encode()
+        for _ in range(2):
+            response = self.client.post(
+                '/api/webhooks/razorpay/', payload, content_type='application/json',
+                HTTP_X_RAZORPAY_SIGNATURE=razorpay_signature(payload), HTTP_X_RAZORPAY_EVENT_ID='evt_rzp_1',
+            )
+            self.assertEqual(response.status_code, 200)
+        self.assertEqual(PaymentEvent.objects.filter(provider='razorpay').count(), 1)
+        process_events()
+        self.order.refresh_from_db()
+        self.assertEqual(self.order.payment_status, 'paid')
@@ -0,0 +1,60 @@
+from datetime import timedelta
+
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from api.models import Order, UserProfile
+from api.services.reconciliation import reconcile
+from api.utils.provider_clients import get_stripe
+
+
+@override_settings(FAKE_PROVIDERS={'stripe': {}})
+class ReconciliationTests(TestCase):
+    def setUp(self):
+        self.student = UserProfile.objects.create_user(email='student@example.com', password='secret-123')
+        self.stripe = get_stripe()
+        self.since = timezone.now() - timedelta(days=1)
+        self.until = timezone.now() + timedelta(hours=1)
+
+    def _order(self, total, payment_status='unpaid', reference=''):
+        return Order.objects.create(
+            student=self.student, total_amount=total, payment_status=payment_status, payment_reference=reference,
+        )
+
+    def _intent(self, order_id, amount, settle=True, paid=None):
+        intent = self.stripe.PaymentIntent.create(amount=amount, currency='inr', metadata={'order_id': str(order_id)})
+        if settle:
+            self.stripe.PaymentIntent.settle(intent['id'], paid)
+        return intent
+
+    def _kinds(self, chunk_size):
+        rows = reconcile('stripe', self.since, self.until, chunk_size=chunk_size)
+        return sorted((str(row['order_id']), row['kind']) for row in rows)
+
+    def test_mismatches_found_across_sorted_runs(self):
+        matched = self._order(100, 'paid', 'pi_matched')
+        self._intent(matched.pk, 10000)
+        not_marked = self._order(50)
+        # A failed attempt, then the payment that went through
+        self._intent(not_marked.pk, 5000, settle=False)
+        self._intent(not_marked.pk, 5000)
+        missing = self._order(75, 'paid', 'pi_missing')
+        short = self._order(20, 'paid', 'pi_short')
+        self._intent(short.pk, 2000, paid=1500)
+        earlier = self._order(30)
+        Order.objects.filter(pk=earlier.pk).update(created_at=self.since - timedelta(days=3))
+        self._intent(earlier.pk, 3000)
+        self._intent(999999, 4000)
+        self._intent('not-an-order', 4000)
+
+        expected = sorted([
+            (str(not_marked.pk), 'paid_not_marked'),
+            (str(missing.pk), 'marked_not_paid'),
+            (str(short.pk), 'amount_mismatch'),
+            (str(earlier.pk), 'paid_not_marked'),
+            ('999999', 'unknown_order'),
+            ('not-an-order', 'unknown_order'),
+        ])
+        # Small chunks spill several runs; one chunk holds everything
+        self.assertEqual(self._kinds(chunk_size=2), expected)
+        self.assertEqual(self._kinds(chunk_size=1000), expected)
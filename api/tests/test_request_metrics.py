@@ -0,0 +1,16 @@
+from django.test import TestCase, override_settings
+
+
+class RequestLogTests(TestCase):
+    def test_every_request_is_logged_at_info(self):
+        with self.assertLogs('api.requests', 'INFO') as logs:
+            self.client.get('/api/products/')
+        [record] = logs.records
+        self.assertEqual(record.levelname, 'INFO')
+        self.assertEqual((record.endpoint, record.status), ('api/products/$', 200))
+
+    @override_settings(METRICS_SLOW_REQUEST_MS=0)
+    def test_slow_requests_are_warnings(self):
+        with self.assertLogs('api.requests', 'INFO') as logs:
+            self.client.get('/api/products/')
+        self.assertEqual(logs.records[0].levelname, 'WARNING')
@@ -0,0 +1,117 @@
+import time
+from types import SimpleNamespace
+from unittest import mock
+
+from django.test import SimpleTestCase, override_settings
+from twilio.base.exceptions import TwilioRestException
+
+from api.utils import resilience
+from api.utils.fake_providers import FakeProvider, FakeTwilioClient
+from api.utils.resilience import CLOSED, HALF_OPEN, OPEN, ProviderError, ProviderUnavailable, call_provider
+
+
+@override_settings(PROVIDER_POLICIES={'twilio': {'retries': 2, 'failure_threshold': 3, 'reset_timeout': 30}})
+class CallProviderTests(SimpleTestCase):
+    def setUp(self):
+        resilience.reset_breakers()
+        self.addCleanup(resilience.reset_breakers)
+        # A clock the test moves by hand; backoff sleeps are recorded instead of slept
+        self.now = 1000.0
+        self.sleeps = []
+        clock = SimpleNamespace(
+            monotonic=lambda: self.now, perf_counter=time.perf_counter, sleep=self.sleeps.append,
+        )
+        patcher = mock.patch.object(resilience, 'time', clock)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _fake(self, **config):
+        return FakeProvider('twilio', seed=1, **config)
+
+    def _send(self, fake, idempotent=False):
+        client = FakeTwilioClient(fake)
+        return call_provider(
+            'twilio', 'messages.create', client.messages.create,
+            body='Your order is ready', from_='+15005550006', to='+911234567890', idempotent=idempotent,
+        )
+
+    def test_rate_limited_call_is_retried_up_to_the_limit(self):
+        fake = self._fake(rate_limit=0)
+        with self.assertRaises(TwilioRestException):
+            self._send(fake)
+        self.assertEqual(len(fake.calls), 3)
+        self.assertEqual(len(self.sleeps), 2)
+        self.assertTrue(all(0 <= delay <= 2.0 for delay in self.sleeps))
+
+    def test_server_error_is_retried_only_when_idempotent(self):
+        fake = self._fake(error_rate=1.0)
+        with self.assertRaises(TwilioRestException):
+            self._send(fake)
+        self.assertEqual(len(fake.calls), 1)
+
+        resilience.reset_breakers()
+        with self.assertRaises(TwilioRestException):
+            self._send(fake, idempotent=True)
+        self.assertEqual(len(fake.calls), 4)
+
+    def test_rejected_request_is_not_retried_and_keeps_circuit_closed(self):
+        func = mock.Mock(side_effect=ProviderError('twilio', 400))
+        for _ in range(5):
+            with self.assertRaises(ProviderError):
+                call_provider('twilio', 'messages.create', func)
+        self.assertEqual(func.call_count, 5)
+        self.assertEqual(resilience.breaker('twilio').state, CLOSED)
+
+    def test_circuit_opens_after_threshold_and_short_circuits(self):
+        fake = self._fake(error_rate=1.0)
+        for _ in range(3):
+            with self.assertRaises(TwilioRestException):
+                self._send(fake)
+        self.assertEqual(resilience.breaker('twilio').state, OPEN)
+
+        with self.assertRaises(ProviderUnavailable):
+            self._send(fake)
+        self.assertEqual(len(fake.calls), 3)
+
+    def test_half_open_trial_closes_on_success(self):
+        fake = self._fake(error_rate=1.0)
+        for _ in range(3):
+            with self.assertRaises(TwilioRestException):
+                self._send(fake)
+
+        self.now += 29
+        with self.assertRaises(ProviderUnavailable):
+            self._send(fake)
+        self.now += 1
+        fake.error_rate = 0.0
+        self.assertEqual(self._send(fake).status, 'queued')
+        self.assertEqual(len(fake.calls), 4)
+        self.assertEqual(resilience.breaker('twilio').state, CLOSED)
+
+    def test_half_open_lets_one_trial_through(self):
+        circuit = resilience.breaker('twilio')
+        for _ in range(3):
+            circuit.record_failure()
+        self.now += 30
+        self.assertTrue(circuit.allow())
+        self.assertEqual(circuit.state, HALF_OPEN)
+        self.assertFalse(circuit.allow())
+        # The trial never reported back; another one is let through a timeout later
+        self.now += 30
+        self.assertTrue(circuit.allow())
+
+    def test_half_open_trial_reopens_on_failure(self):
+        fake = self._fake(error_rate=1.0)
+        for _ in range(3):
+            with self.assertRaises(TwilioRestException):
+                self._send(fake)
+
+        self.now += 30
+        with self.assertRaises(TwilioRestException):
+            self._send(fake)
+        self.assertEqual(resilience.breaker('twilio').state, OPEN)
+        self.assertEqual(len(fake.calls), 4)
+        # The cooldown starts over from the failed trial
+        self.now += 29
+        with self.assertRaises(ProviderUnavailable):
+            self._send(fake)
@@ -0,0 +1,103 @@
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+from django.test import TestCase
+from django.utils import timezone
+
+from api.models import Order, OrderItem, Product, ProductSalesRollup, SalesRollup, UserProfile
+from api.services import sales_rollups
+
+
+class SalesRollupSignalTests(TestCase):
+    def setUp(self):
+        self.student = UserProfile.objects.create_user(email='student@example.com', password='secret-123')
+        self.pen = Product.objects.create(name='Pen', price='10.00', quantity=100)
+
+    def _rollup(self, period, order):
+        start = sales_rollups.bucket_start(period, order.created_at)
+        return SalesRollup.objects.filter(period=period, bucket_start=start).values(
+            'completed_orders', 'completed_revenue', 'completed_units', 'cancelled_orders', 'cancelled_amount'
+        ).first()
+
+    def _rollups(self):
+        return {
+            (row['period'], row['bucket_start']): row
+            for row in SalesRollup.objects.values(
+                'period', 'bucket_start', 'completed_orders', 'completed_revenue', 'completed_units',
+                'cancelled_orders', 'cancelled_amount',
+            )
+            if any(row[field] for field in ('completed_orders', 'completed_units', 'cancelled_orders'))
+        }
+
+    def test_status_changes_move_the_order_between_counters(self):
+        order = Order.objects.create(student=self.student, total_amount=Decimal('30.00'))
+        OrderItem.objects.create(order=order, product=self.pen, quantity=3, price_at_time_of_order=Decimal('10.00'))
+        self.assertIsNone(self._rollup('day', order))
+
+        order.status = 'completed'
+        order.save()
+        for period in ('month', 'day', 'hour'):
+            self.assertEqual(self._rollup(period, order), {
+                'completed_orders': 1, 'completed_revenue': Decimal('30.00'), 'completed_units': 3,
+                'cancelled_orders': 0, 'cancelled_amount': Decimal('0.00'),
+            })
+        self.assertEqual(ProductSalesRollup.objects.get(product=self.pen).units, 3)
+
+        order.status = 'cancelled'
+        order.save(update_fields=['status'])
+        self.assertEqual(self._rollup('day', order), {
+            'completed_orders': 0, 'completed_revenue': Decimal('0.00'), 'completed_units': 0,
+            'cancelled_orders': 1, 'cancelled_amount': Decimal('30.00'),
+        })
+        self.assertEqual(ProductSalesRollup.objects.get(product=self.pen).units, 0)
+
+        Order.objects.get(pk=order.pk).delete()
+        self.assertEqual(self._rollup('month', order)['cancelled_orders'], 0)
+
+    def test_lines_of_a_completed_order_adjust_the_rollups(self):
+        order = Order.objects.create(student=self.student, status='completed', total_amount=Decimal('20.00'))
+        item = OrderItem.objects.create(order=order, product=self.pen, quantity=2, price_at_time_of_order=Decimal('10.00'))
+        item.quantity = 5
+        item.save()
+        self.assertEqual(self._rollup('day', order)['completed_units'], 5)
+        self.assertEqual(ProductSalesRollup.objects.get(product=self.pen).revenue, Decimal('50.00'))
+        item.delete()
+        self.assertEqual(self._rollup('hour', order)['completed_units'], 0)
+
+    def test_deferred_status_change_is_recorded(self):
+        order = Order.objects.create(student=self.student, total_amount=Decimal('12.00'))
+        deferred = Order.objects.only('id', 'status').get(pk=order.pk)
+        deferred.status = 'completed'
+        deferred.save(update_fields=['status'])
+        self.assertEqual(self._rollup('day', order)['completed_revenue'], Decimal('12.00'))
+
+    def test_backfill_matches_live_rollups(self):
+        now = timezone.now()
+        for days_ago, status, total in ((0, 'completed', '15.00'), (40, 'completed', '25.00'), (3, 'cancelled', '8.00')):
+            order = Order.objects.create(student=self.student, total_amount=Decimal(total))
+            Order.objects.filter(pk=order.pk).update(created_at=now - timedelta(days=days_ago))
+            order = Order.objects.get(pk=order.pk)
+            OrderItem.objects.create(order=order, product=self.pen, quantity=1, price_at_time_of_order=Decimal(total))
+            order.status = status
+            order.save()
+        live = self._rollups()
+
+        SalesRollup.objects.all().delete()
+        sales_rollups.backfill()
+        self.assertEqual(self._rollups(), live)
+
+        # A partial range still rebuilds the whole month it touches
+        sales_rollups.backfill(since=timezone.localdate(now), until=timezone.localdate(now) + timedelta(days=1))
+        self.assertEqual(self._rollups(), live)
+
+        summary = sales_rollups.summary(now)
+        self.assertEqual(summary['total_revenue'], Decimal('40.00'))
+        self.assertEqual(summary['today_revenue'], Decimal('15.00'))
+
+    def test_summary_reads_month_rows_for_the_total(self):
+        start = timezone.make_aware(datetime(2026, 3, 1))
+        SalesRollup.objects.create(period='month', bucket_start=start, completed_revenue=Decimal('100.00'))
+        SalesRollup.objects.create(period='month', bucket_start=start.replace(month=4), completed_revenue=Decimal('50.00'))
+        summary = sales_rollups.summary(start.replace(month=4, day=10))
+        self.assertEqual(summary['total_revenue'], Decimal('150.00'))
+        self.assertEqual(summary['monthly_revenue'], Decimal('50.00'))
@@ -0,0 +1,55 @@
+from datetime import timedelta
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import TestCase
+from django.utils import timezone
+
+from api.models import PickupTimeSlot
+from api.services import slot_holds
+
+
+class SlotHoldTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        start = timezone.now() + timedelta(days=1)
+        self.slot = PickupTimeSlot.objects.create(start_time=start, end_time=start + timedelta(hours=1), max_orders=2)
+
+    def test_holds_count_against_capacity(self):
+        self.assertIsNotNone(slot_holds.place_hold(self.slot, 1))
+        self.assertIsNotNone(slot_holds.place_hold(self.slot, 2))
+        self.assertIsNone(slot_holds.place_hold(self.slot, 3))
+        # Holding again refreshes the student's own hold
+        self.assertIsNotNone(slot_holds.place_hold(self.slot, 1))
+        self.assertEqual(slot_holds.available_slots([self.slot], user_id=3), [])
+
+    def test_release_frees_the_place(self):
+        slot_holds.place_hold(self.slot, 1)
+        slot_holds.place_hold(self.slot, 2)
+        self.assertTrue(slot_holds.release_hold(self.slot.pk, 1))
+        self.assertFalse(slot_holds.release_hold(self.slot.pk, 1))
+        self.assertEqual(slot_holds.active_hold_counts([self.slot.pk]), {self.slot.pk: 1})
+
+    def test_reserve_respects_other_holds(self):
+        slot_holds.place_hold(self.slot, 1)
+        slot_holds.place_hold(self.slot, 2)
+        self.assertFalse(slot_holds.reserve_slot(self.slot, 3))
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertTrue(slot_holds.reserve_slot(self.slot, 1))
+        self.assertEqual(self.slot.current_orders, 1)
+        self.assertEqual(slot_holds.active_hold_counts([self.slot.pk]), {self.slot.pk: 1})
+
+    @mock.patch.object(slot_holds, 'LOCK_ATTEMPTS', 2)
+    @mock.patch.object(slot_holds, 'LOCK_WAIT', 0)
+    def test_lock_left_alone_when_not_acquired(self):
+        key = slot_holds.LOCK_KEY.format(self.slot.pk)
+        cache.set(key, 'other-writer', 60)
+        with slot_holds._SlotLock(self.slot.pk) as lock:
+            self.assertIsNone(lock.token)
+        self.assertEqual(cache.get(key), 'other-writer')
+
+    def test_lock_released_by_its_owner(self):
+        key = slot_holds.LOCK_KEY.format(self.slot.pk)
+        with slot_holds._SlotLock(self.slot.pk) as lock:
+            self.assertEqual(cache.get(key), lock.token)
+        self.assertIsNone(cache.get(key))
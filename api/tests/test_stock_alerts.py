@@ -0,0 +1,70 @@
+from django.db.models import F
+from django.test import TestCase, override_settings
+
+from api.models import Order, OutboxMessage, Product, UserProfile
+from api.services.stock_alerts import evaluate_all, low_stock_products
+from cart.models import Cart, CartItem
+from cart.services import place_cart_order
+
+
+@override_settings(LOW_STOCK_ALERT_RECIPIENTS=[])
+class LowStockAlertTests(TestCase):
+    def setUp(self):
+        UserProfile.objects.create_user(email='shop@example.com', password='secret-123', user_type='shopkeeper')
+        self.product = Product.objects.create(name='Notebook', price='40.00', quantity=6, reorder_level=5)
+
+    def _alerts(self):
+        return list(OutboxMessage.objects.filter(template_name='low_stock').values_list('recipient', 'context__quantity'))
+
+    def _set_quantity(self, quantity):
+        self.product.quantity = quantity
+        self.product.save(update_fields=['quantity'])
+        self.product.refresh_from_db()
+
+    def test_alerts_once_per_crossing(self):
+        self._set_quantity(6)
+        self.assertFalse(self.product.low_stock)
+        self._set_quantity(5)
+        self.assertTrue(self.product.low_stock)
+        self.assertEqual(self._alerts(), [('shop@example.com', 5)])
+
+        self._set_quantity(3)
+        self.assertEqual(len(self._alerts()), 1)
+
+        self._set_quantity(20)
+        self.assertFalse(self.product.low_stock)
+        self._set_quantity(2)
+        self.assertEqual(len(self._alerts()), 2)
+        self.assertEqual(list(low_stock_products()), [self.product])
+
+    def test_disabled_without_reorder_level(self):
+        self.product.reorder_level = 0
+        self.product.quantity = 0
+        self.product.save()
+        self.product.refresh_from_db()
+        self.assertFalse(self.product.low_stock)
+        self.assertEqual(self._alerts(), [])
+
+    def test_f_expression_save(self):
+        self.product.quantity = F('quantity') - 2
+        self.product.save(update_fields=['quantity'])
+        self.assertEqual(self.product.quantity, 4)
+        self.assertTrue(Product.objects.get(pk=self.product.pk).low_stock)
+
+    @override_settings(LOW_STOCK_ALERT_RECIPIENTS=['stock@example.com'])
+    def test_bulk_updates_reconciled(self):
+        Product.objects.filter(pk=self.product.pk).update(quantity=1)
+        self.assertEqual(evaluate_all(), {'alerted': 1, 'cleared': 0})
+        self.assertEqual(self._alerts(), [('stock@example.com', 1)])
+        Product.objects.filter(pk=self.product.pk).update(quantity=50)
+        self.assertEqual(evaluate_all(), {'alerted': 0, 'cleared': 1})
+
+    def test_order_deduction_raises_alert(self):
+        student = UserProfile.objects.create_user(email='student@example.com', password='secret-123')
+        cart = Cart.objects.create(user=student)
+        CartItem.objects.create(cart=cart, product=self.product, quantity=2)
+        place_cart_order(Order.objects.create(student=student), cart)
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.quantity, 4)
+        self.assertTrue(self.product.low_stock)
+        self.assertEqual(self._alerts(), [('shop@example.com', 4)])
@@ -25,4 +25,12 @@ urlpatterns = [
     path('time-slots/available/', views.AvailableTimeSlotsView.as_view(), name='available-time-slots'),
     path('orders/shopkeeper/', ShopkeeperOrderView.as_view(), name='shopkeeper-orders'),
     path('orders/<int:pk>/status/', views.UpdateOrderStatusView.as_view(), name='update-order-status'),
+    
+    # Sales analytics (staff only)
+    path('analytics/sales/', views.SalesAnalyticsView.as_view(), name='sales-analytics'),
+    path('analytics/top-products/', views.TopProductsView.as_view(), name='top-products'),
+    
+    # Payment provider webhooks
+    path('webhooks/stripe/', views.StripeWebhookView.as_view(), name='stripe-webhook'),
+    path('webhooks/razorpay/', views.RazorpayWebhookView.as_view(), name='razorpay-webhook'),
 ]
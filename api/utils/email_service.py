@@ -1,29 +1,91 @@
-import os
+import logging
 from django.conf import settings
-from sendgrid import SendGridAPIClient
-from sendgrid.helpers.mail import Mail
-from django.template.loader import render_to_string
-from django.utils.html import strip_tags
+
+from .notification_renderer import render, render_many
+from .provider_clients import get_sendgrid_client
+from .resilience import ProviderError, call_provider
+
+logger = logging.getLogger(__name__)
+
+# SendGrid accepts up to 1000 personalizations per request
+MAX_PERSONALIZATIONS = 1000
+
+def _send(client, mail):
+    def post():
+        status = client.send(mail)
+        if status == 429 or status >= 500:
+            raise ProviderError('sendgrid', status)
+        return status == 202
+    return call_provider('sendgrid', 'mail.send', post)
 
 def send_email(to_email, subject, template_name, context=None):
     if context is None:
         context = {}
-    
-    # Render HTML template
-    html_content = render_to_string(f'emails/{template_name}.html', context)
-    text_content = strip_tags(html_content)
-    
+
+    from sendgrid.helpers.mail import Mail
+
+    html_content, text_content = render(template_name, context)
+
     message = Mail(
         from_email=settings.DEFAULT_FROM_EMAIL,
         to_emails=to_email,
         subject=subject,
+        plain_text_content=text_content,
         html_content=html_content
     )
-    
+
     try:
-        sg = SendGridAPIClient(settings.SENDGRID_API_KEY)
-        response = sg.send(message)
-        return response.status_code == 202
+        return _send(get_sendgrid_client(), message)
     except Exception as e:
-        print(f"Error sending email: {str(e)}")
+        logger.error("Error sending email: %s", e)
         return False
+
+def send_bulk_email(messages):
+    """Send many emails, one SendGrid request per distinct subject and body.
+
+    ``messages`` is a list of ``{'to_email', 'subject', 'template_name',
+    'context'}`` dicts whose data is already loaded; each template is
+    compiled once for the whole batch. Recipients of identical content
+    share a request, each in their own personalization so they never see
+    one another.
+    Returns a list of booleans in the same order as ``messages``.
+    """
+    from sendgrid.helpers.mail import Mail, Personalization, To
+
+    results = [False] * len(messages)
+    by_template = {}
+    for index, message in enumerate(messages):
+        by_template.setdefault(message['template_name'], []).append(index)
+
+    groups = {}
+    for template_name, indexes in by_template.items():
+        try:
+            rendered = render_many(template_name, [messages[index].get('context') or {} for index in indexes])
+        except Exception as e:
+            logger.error("Error rendering %s for %d emails: %s", template_name, len(indexes), e)
+            continue
+        for index, content in zip(indexes, rendered):
+            groups.setdefault((messages[index]['subject'],) + content, []).append(index)
+
+    client = get_sendgrid_client()
+    for (subject, html_content, text_content), indexes in groups.items():
+        for start in range(0, len(indexes), MAX_PERSONALIZATIONS):
+            chunk = indexes[start:start + MAX_PERSONALIZATIONS]
+            mail = Mail(
+                from_email=settings.DEFAULT_FROM_EMAIL,
+                subject=subject,
+                plain_text_content=text_content,
+                html_content=html_content
+            )
+            for index in chunk:
+                personalization = Personalization()
+                personalization.add_to(To(messages[index]['to_email']))
+                mail.add_personalization(personalization)
+            try:
+                accepted = _send(client, mail)
+            except Exception as e:
+                logger.error("Error sending %d emails: %s", len(chunk), e)
+                accepted = False
+            for index in chunk:
+                results[index] = accepted
+    return results
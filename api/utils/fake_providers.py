@@ -0,0 +1,322 @@
+"""Local stand-ins for SendGrid, Twilio, Stripe and Razorpay.
+
+Enabled per provider through the ``FAKE_PROVIDERS`` setting, e.g.::
+
+    FAKE_PROVIDERS = {
+        'sendgrid': {'latency_ms': 150, 'jitter_ms': 50, 'error_rate': 0.01, 'rate_limit': 100},
+        'stripe': {'latency_ms': 300},
+    }
+
+Each fake sleeps for the configured latency, fails a fraction of calls
+with the provider's own error type, answers ``429`` once more than
+``rate_limit`` calls arrive in a second, and records its latest
+``max_calls`` calls so tests and benchmarks can assert on what was sent.
+Nothing leaves the machine.
+"""
+import hashlib
+import hmac
+import itertools
+import random
+import threading
+import time
+from collections import deque
+from types import SimpleNamespace
+
+from django.conf import settings
+from django.core.signals import setting_changed
+
+_lock = threading.Lock()
+_fakes = {}
+_ids = itertools.count(1)
+
+
+class FakeProvider:
+    """Latency, error and rate-limit model shared by one provider's fake clients."""
+
+    def __init__(self, name, latency_ms=0, jitter_ms=0, error_rate=0.0, rate_limit=None, seed=None, max_calls=10000):
+        self.name = name
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.rate_limit = rate_limit
+        self.random = random.Random(seed)
+        # Only the latest calls, so a long load test doesn't grow without bound
+        self.calls = deque(maxlen=max_calls)
+        self._lock = threading.Lock()
+        self._window = (0, 0)  # (second, calls in it)
+
+    def call(self, operation, payload):
+        """Simulate one API call; returns ``'ok'``, ``'rate_limited'`` or ``'error'``."""
+        with self._lock:
+            second = int(time.monotonic())
+            window, count = self._window
+            count = count + 1 if window == second else 1
+            self._window = (second, count)
+            if self.rate_limit is not None and count > self.rate_limit:
+                outcome = 'rate_limited'
+            elif self.random.random() < self.error_rate:
+                outcome = 'error'
+            else:
+                outcome = 'ok'
+            latency = max(0, self.latency_ms + self.random.uniform(-self.jitter_ms, self.jitter_ms))
+            self.calls.append({
+                'operation': operation,
+                'payload': payload,
+                'outcome': outcome,
+                'at': time.time(),
+            })
+        if latency:
+            time.sleep(latency / 1000)
+        return outcome
+
+
+def get_fake(name):
+    """Return the ``FakeProvider`` for ``name``, or None when the real API is used."""
+    config = getattr(settings, 'FAKE_PROVIDERS', {}).get(name)
+    if config is None:
+        return None
+    fake = _fakes.get(name)
+    if fake is None:
+        with _lock:
+            fake = _fakes.get(name)
+            if fake is None:
+                fake = _fakes[name] = FakeProvider(name, **config)
+    return fake
+
+
+def calls(name, operation=None):
+    """Calls recorded by a provider's fake, optionally only for ``operation``."""
+    fake = _fakes.get(name)
+    if fake is None:
+        return []
+    with fake._lock:
+        return [call for call in fake.calls if operation is None or call['operation'] == operation]
+
+
+def reset(**kwargs):
+    """Forget every fake and its recorded calls."""
+    with _lock:
+        _fakes.clear()
+
+
+setting_changed.connect(reset)
+
+
+def _fake_id(prefix):
+    return f'{prefix}_fake_{next(_ids)}'
+
+
+class FakeSendGridClient:
+    def __init__(self, fake):
+        self.fake = fake
+
+    def send(self, mail):
+        outcome = self.fake.call('mail.send', mail.get())
+        return {'ok': 202, 'rate_limited': 429, 'error': 500}[outcome]
+
+
+class _FakeTwilioMessages:
+    def __init__(self, fake):
+        self.fake = fake
+
+    def create(self, body, from_, to, **kwargs):
+        from twilio.base.exceptions import TwilioRestException
+
+        outcome = self.fake.call('messages.create', {'body': body, 'from': from_, 'to': to})
+        if outcome != 'ok':
+            status = 429 if outcome == 'rate_limited' else 500
+            raise TwilioRestException(status, '/2010-04-01/Accounts/Messages.json', f'Fake Twilio {outcome}', method='POST')
+        return SimpleNamespace(sid=_fake_id('SM'), status='queued', to=to, body=body)
+
+
+class FakeTwilioClient:
+    def __init__(self, fake):
+        self.messages = _FakeTwilioMessages(fake)
+
+
+class _FakePaymentIntents:
+    def __init__(self, fake):
+        self.fake = fake
+        self.intents = {}
+        self.idempotent = {}
+
+    def _check(self, operation, payload):
+        import stripe
+
+        outcome = self.fake.call(operation, payload)
+        if outcome == 'rate_limited':
+            raise stripe.RateLimitError('Fake Stripe rate limit', http_status=429)
+        if outcome == 'error':
+            raise stripe.APIError('Fake Stripe error', http_status=500)
+
+    def create(self, idempotency_key=None, **params):
+        import stripe
+
+        if idempotency_key in self.idempotent:
+            return self.idempotent[idempotency_key]
+        self._check('PaymentIntent.create', params)
+        intent_id = _fake_id('pi')
+        intent = stripe.PaymentIntent.construct_from({
+            'id': intent_id,
+            'object': 'payment_intent',
+            'client_secret': f'{intent_id}_secret',
+            'status': 'requires_payment_method',
+            'created': int(time.time()),
+            **params,
+        }, 'sk_fake')
+        self.intents[intent_id] = intent
+        if idempotency_key is not None:
+            self.idempotent[idempotency_key] = intent
+        return intent
+
+    def retrieve(self, intent_id, **params):
+        import stripe
+
+        self._check('PaymentIntent.retrieve', {'id': intent_id})
+        if intent_id not in self.intents:
+            raise stripe.InvalidRequestError(f'No such payment_intent: {intent_id}', 'id', http_status=404)
+        return self.intents[intent_id]
+
+    def list(self, created=None, limit=10, starting_after=None, **params):
+        import stripe
+
+        self._check('PaymentIntent.list', {'created': created, 'limit': limit, 'starting_after': starting_after})
+        created = created or {}
+        # Newest first, like the real API
+        intents = [
+            intent for intent in sorted(self.intents.values(), key=lambda intent: (-intent['created'], intent['id']))
+            if created.get('gte', 0) <= intent['created'] < created.get('lt', float('inf'))
+        ]
+        if starting_after is not None:
+            ids = [intent['id'] for intent in intents]
+            intents = intents[ids.index(starting_after) + 1:] if starting_after in ids else []
+        return stripe.ListObject.construct_from({
+            'object': 'list',
+            'data': intents[:limit],
+            'has_more': len(intents) > limit,
+        }, 'sk_fake')
+
+    def settle(self, intent_id, amount=None):
+        """Simulate the customer paying ``intent_id`` (optionally a different amount)."""
+        intent = self.intents[intent_id]
+        intent['status'] = 'succeeded'
+        intent['amount_received'] = intent['amount'] if amount is None else amount
+        return intent
+
+
+class FakeStripe:
+    """Stands in for the ``stripe`` module's ``PaymentIntent`` API."""
+
+    def __init__(self, fake):
+        self.PaymentIntent = _FakePaymentIntents(fake)
+
+
+class _FakeRazorpayOrders:
+    def __init__(self, fake):
+        self.fake = fake
+        self.orders = {}
+
+    def create(self, data, **kwargs):
+        from razorpay.errors import BadRequestError, ServerError
+
+        outcome = self.fake.call('order.create', data)
+        if outcome == 'rate_limited':
+            raise BadRequestError('Too many requests')
+        if outcome == 'error':
+            raise ServerError('Fake Razorpay error')
+        order_id = _fake_id('order')
+        order = self.orders[order_id] = {
+            'id': order_id,
+            'entity': 'order',
+            'amount': data['amount'],
+            'amount_paid': 0,
+            'amount_due': data['amount'],
+            'currency': data.get('currency', 'INR'),
+            'receipt': data.get('receipt'),
+            'notes': data.get('notes', []),
+            'status': 'created',
+            'created_at': int(time.time()),
+        }
+        return order
+
+
+class _FakeRazorpayPayments:
+    def __init__(self, fake, orders):
+        self.fake = fake
+        self.orders = orders
+        self.payments = []
+
+    def all(self, data=None, **kwargs):
+        from razorpay.errors import BadRequestError, ServerError
+
+        data = data or {}
+        outcome = self.fake.call('payment.all', data)
+        if outcome == 'rate_limited':
+            raise BadRequestError('Too many requests')
+        if outcome == 'error':
+            raise ServerError('Fake Razorpay error')
+        payments = [
+            payment for payment in reversed(self.payments)
+            if data.get('from', 0) <= payment['created_at'] <= data.get('to', float('inf'))
+        ]
+        skip, count = data.get('skip', 0), data.get('count', 10)
+        items = payments[skip:skip + count]
+        return {'entity': 'collection', 'count': len(items), 'items': items}
+
+    def capture(self, order_id, amount=None):
+        """Simulate a captured payment against fake Razorpay order ``order_id``."""
+        order = self.orders[order_id]
+        payment = {
+            'id': _fake_id('pay'),
+            'entity': 'payment',
+            'amount': order['amount'] if amount is None else amount,
+            'currency': order['currency'],
+            'status': 'captured',
+            'order_id': order_id,
+            'notes': order['notes'],
+            'created_at': int(time.time()),
+        }
+        self.payments.append(payment)
+        return payment
+
+
+class _FakeRazorpayUtility:
+    def __init__(self, fake):
+        self.fake = fake
+
+    def verify_payment_signature(self, parameters):
+        from razorpay.errors import SignatureVerificationError
+
+        # Checked locally like the real SDK does, so it adds no latency and isn't recorded
+        message = f"{parameters['razorpay_order_id']}|{parameters['razorpay_payment_id']}"
+        expected = hmac.new(settings.RAZORPAY_KEY_SECRET.encode(), message.encode(), hashlib.sha256).hexdigest()
+        if not hmac.compare_digest(expected, parameters['razorpay_signature']):
+            raise SignatureVerificationError('Razorpay Signature Verification Failed')
+        return True
+
+
+class FakeRazorpayClient:
+    def __init__(self, fake):
+        self.order = _FakeRazorpayOrders(fake)
+        self.payment = _FakeRazorpayPayments(fake, self.order.orders)
+        self.utility = _FakeRazorpayUtility(fake)
+
+
+FAKE_CLIENTS = {
+    'sendgrid': FakeSendGridClient,
+    'twilio': FakeTwilioClient,
+    'stripe': FakeStripe,
+    'razorpay': FakeRazorpayClient,
+}
+
+
+def fake_client(name):
+    """Return a fake client for ``name`` when ``FAKE_PROVIDERS`` enables it, else None."""
+    fake = get_fake(name)
+    if fake is None:
+        return None
+    with _lock:
+        client = getattr(fake, 'client', None)
+        if client is None:
+            client = fake.client = FAKE_CLIENTS[name](fake)
+    return client
@@ -0,0 +1,113 @@
+"""Rendering of notification emails to HTML and plain text.
+
+Compiled templates are cached per process, so rendering a batch costs one
+template lookup however many messages it holds. The plain-text part comes
+from ``emails/<name>.txt`` when that template exists, otherwise from a
+single pass of an HTML parser over the rendered HTML.
+"""
+from functools import lru_cache
+from html.parser import HTMLParser
+
+from django.core.signals import setting_changed
+from django.template import TemplateDoesNotExist
+from django.template.loader import get_template
+
+from ..models import Order
+
+# Tags whose start or end begins a new line in the text version
+BLOCK_TAGS = {
+    'address', 'blockquote', 'br', 'div', 'footer', 'h1', 'h2', 'h3', 'h4',
+    'h5', 'h6', 'header', 'hr', 'li', 'ol', 'p', 'table', 'tr', 'ul',
+}
+SKIPPED_TAGS = {'head', 'script', 'style', 'title'}
+
+
+@lru_cache(maxsize=None)
+def _template(name):
+    try:
+        return get_template(name)
+    except TemplateDoesNotExist:
+        if name.endswith('.txt'):
+            return None
+        raise
+
+
+def clear_template_cache(**kwargs):
+    _template.cache_clear()
+
+
+setting_changed.connect(clear_template_cache)
+
+
+class _TextExtractor(HTMLParser):
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.lines = ['']
+        self.skipping = 0
+
+    def _break(self):
+        if self.lines[-1].strip():
+            self.lines.append('')
+
+    def handle_starttag(self, tag, attrs):
+        if tag in SKIPPED_TAGS:
+            self.skipping += 1
+        elif tag in BLOCK_TAGS:
+            self._break()
+        elif tag in ('td', 'th'):
+            self.lines[-1] += ' '
+
+    def handle_endtag(self, tag):
+        if tag in SKIPPED_TAGS:
+            self.skipping = max(0, self.skipping - 1)
+        elif tag in BLOCK_TAGS:
+            self._break()
+
+    def handle_data(self, data):
+        if not self.skipping:
+            self.lines[-1] += data
+
+    def text(self):
+        return '\n'.join(' '.join(line.split()) for line in self.lines if line.strip())
+
+
+def html_to_text(html):
+    """Plain-text version of ``html`` with one line per block element."""
+    parser = _TextExtractor()
+    parser.feed(html)
+    parser.close()
+    return parser.text()
+
+
+def render(template_name, context):
+    """Return ``(html, text)`` for ``emails/<template_name>``."""
+    return render_many(template_name, [context])[0]
+
+
+def render_many(template_name, contexts):
+    """Render one ``(html, text)`` pair per context with the same compiled templates."""
+    html_template = _template(f'emails/{template_name}.html')
+    text_template = _template(f'emails/{template_name}.txt')
+    rendered = []
+    for context in contexts:
+        html = html_template.render(context)
+        text = text_template.render(context) if text_template is not None else html_to_text(html)
+        rendered.append((html, text))
+    return rendered
+
+
+def order_contexts(order_ids):
+    """Return ``{order_id: context}`` with the student and items loaded up front.
+
+    Orders, their students, items and products are fetched in two queries,
+    so rendering never touches the database.
+    """
+    orders = Order.objects.filter(pk__in=order_ids).select_related('student').prefetch_related('items__product')
+    return {
+        order.pk: {
+            'user': order.student,
+            'order': order,
+            'order_items': list(order.items.all()),
+        }
+        for order in orders
+    }
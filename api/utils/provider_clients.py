@@ -0,0 +1,142 @@
+"""Process-wide clients for the email, SMS and payment providers.
+
+Each provider gets one ``requests.Session`` with a keep-alive connection
+pool, so consecutive sends reuse the same TLS connection instead of
+handshaking per message. Clients are rebuilt after a fork, since pooled
+sockets must not be shared between worker processes. Providers listed in
+``FAKE_PROVIDERS`` get the local stand-ins from ``fake_providers`` instead.
+"""
+import os
+import threading
+
+import requests
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+
+from .fake_providers import fake_client
+
+SENDGRID_SEND_URL = 'https://api.sendgrid.com/v3/mail/send'
+
+_lock = threading.Lock()
+_clients = {}
+
+
+def timeout(provider=None):
+    """``(connect, read)`` timeout for ``provider``'s requests.
+
+    ``PROVIDER_POLICIES[provider]`` may override the global
+    ``PROVIDER_CONNECT_TIMEOUT`` / ``PROVIDER_READ_TIMEOUT``.
+    """
+    overrides = getattr(settings, 'PROVIDER_POLICIES', {}).get(provider, {})
+    return (
+        overrides.get('connect_timeout', getattr(settings, 'PROVIDER_CONNECT_TIMEOUT', 3.05)),
+        overrides.get('read_timeout', getattr(settings, 'PROVIDER_READ_TIMEOUT', 10)),
+    )
+
+
+class _TimeoutAdapter(HTTPAdapter):
+    """Pooled adapter that applies a default timeout to requests sent without one."""
+
+    def __init__(self, timeout, **kwargs):
+        self.timeout = timeout
+        super().__init__(**kwargs)
+
+    def send(self, request, **kwargs):
+        if kwargs.get('timeout') is None:
+            kwargs['timeout'] = self.timeout
+        return super().send(request, **kwargs)
+
+
+def _pooled(session, provider=None):
+    pool_size = getattr(settings, 'PROVIDER_POOL_SIZE', 10)
+    adapter = _TimeoutAdapter(timeout(provider), pool_connections=1, pool_maxsize=pool_size)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+
+def _client(name, factory):
+    key = (name, os.getpid())
+    client = _clients.get(key)
+    if client is None:
+        with _lock:
+            client = _clients.get(key)
+            if client is None:
+                client = _clients[key] = factory()
+    return client
+
+
+class SendGridClient:
+    """Minimal SendGrid v3 client posting ``Mail`` payloads over a pooled session."""
+
+    def __init__(self, api_key):
+        self.session = _pooled(requests.Session(), 'sendgrid')
+        self.session.headers.update({
+            'Authorization': f'Bearer {api_key}',
+            'Content-Type': 'application/json',
+        })
+
+    def send(self, mail):
+        """Send a ``sendgrid.helpers.mail.Mail``; returns the HTTP status code."""
+        response = self.session.post(SENDGRID_SEND_URL, json=mail.get(), timeout=timeout('sendgrid'))
+        return response.status_code
+
+
+def get_sendgrid_client():
+    return fake_client('sendgrid') or _client('sendgrid', lambda: SendGridClient(settings.SENDGRID_API_KEY))
+
+
+def get_twilio_client():
+    fake = fake_client('twilio')
+    if fake is not None:
+        return fake
+
+    from twilio.http.http_client import TwilioHttpClient
+    from twilio.rest import Client
+
+    def factory():
+        # Twilio only takes a single number; the pooled adapter applies the (connect, read) pair
+        http_client = TwilioHttpClient(pool_connections=True)
+        _pooled(http_client.session, 'twilio')
+        return Client(settings.TWILIO_ACCOUNT_SID, settings.TWILIO_AUTH_TOKEN, http_client=http_client)
+
+    return _client('twilio', factory)
+
+
+def get_stripe():
+    """The configured ``stripe`` module, used as ``get_stripe().PaymentIntent``."""
+    fake = fake_client('stripe')
+    if fake is not None:
+        return fake
+
+    import stripe
+
+    def configure():
+        stripe.api_key = settings.STRIPE_SECRET_KEY
+        # Retries are handled by api.utils.resilience
+        stripe.max_network_retries = 0
+        stripe.default_http_client = stripe.RequestsClient(
+            timeout=timeout('stripe'), session=_pooled(requests.Session(), 'stripe')
+        )
+        return stripe
+
+    return _client('stripe', configure)
+
+
+def get_razorpay_client():
+    fake = fake_client('razorpay')
+    if fake is not None:
+        return fake
+
+    import razorpay
+
+    return _client('razorpay', lambda: razorpay.Client(
+        session=_pooled(requests.Session(), 'razorpay'),
+        auth=(settings.RAZORPAY_KEY_ID, settings.RAZORPAY_KEY_SECRET),
+    ))
+
+
+def reset_clients():
+    """Drop every cached client, e.g. after the provider credentials change."""
+    with _lock:
+        _clients.clear()
@@ -0,0 +1,191 @@
+"""Retries, backoff and circuit breaking for calls to external providers.
+
+Every outbound provider call goes through ``call_provider``, which
+
+* fails fast with ``ProviderUnavailable`` while the provider's circuit is open,
+* retries transient failures with full-jitter exponential backoff, and
+* records latency, outcomes and breaker state in ``api.metrics.registry``.
+
+Per-provider limits come from ``PROVIDER_POLICIES`` (see ``policy``).
+Breakers are per process: a worker that sees a provider failing stops
+calling it for ``reset_timeout`` seconds, then lets one trial call through.
+"""
+import random
+import threading
+import time
+
+import requests
+from django.conf import settings
+
+from ..metrics import registry
+
+DEFAULT_POLICY = {
+    'retries': 2,
+    'backoff': 0.2,  # seconds before the first retry, doubled each time
+    'max_backoff': 2.0,
+    'failure_threshold': 5,  # consecutive failures that open the circuit
+    'reset_timeout': 30,  # seconds the circuit stays open
+}
+
+# Statuses that mean the request was not processed and may be resent
+RETRYABLE_STATUSES = {429, 503}
+# Statuses that may have been processed; only retried for idempotent calls
+UNCERTAIN_STATUSES = {500, 502, 504}
+
+CLOSED, HALF_OPEN, OPEN = 'closed', 'half_open', 'open'
+STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+registry.describe('provider_call_seconds', 'Latency of outbound provider calls, per attempt')
+registry.describe('provider_calls_total', 'Outbound provider call attempts by outcome')
+registry.describe('provider_circuit_state', 'Circuit breaker state: 0 closed, 1 half-open, 2 open')
+
+
+class ProviderError(Exception):
+    """A provider answered with an error status."""
+
+    def __init__(self, provider, status, message=''):
+        super().__init__(message or f'{provider} returned HTTP {status}')
+        self.provider = provider
+        self.status = status
+
+
+class ProviderUnavailable(ProviderError):
+    """The provider's circuit is open; the call was not attempted."""
+
+    def __init__(self, provider):
+        super().__init__(provider, None, f'{provider} circuit is open')
+
+
+def policy(provider):
+    """``DEFAULT_POLICY`` overlaid with ``PROVIDER_POLICIES[provider]``."""
+    return {**DEFAULT_POLICY, **getattr(settings, 'PROVIDER_POLICIES', {}).get(provider, {})}
+
+
+def status_of(exc):
+    """HTTP status carried by a provider SDK exception, if any."""
+    for attribute in ('status', 'http_status', 'status_code'):
+        status = getattr(exc, attribute, None)
+        if isinstance(status, int):
+            return status
+    response = getattr(exc, 'response', None)
+    status = getattr(response, 'status_code', None)
+    if isinstance(status, int):
+        return status
+    # Razorpay raises typed errors without a status
+    return {'ServerError': 500, 'GatewayError': 502}.get(type(exc).__name__)
+
+
+def is_transient(exc, idempotent=False):
+    """Whether ``exc`` is worth retrying."""
+    if isinstance(exc, ProviderUnavailable):
+        return False
+    if isinstance(exc, (requests.ConnectionError, requests.ConnectTimeout)):
+        return True
+    if isinstance(exc, requests.Timeout):
+        return idempotent
+    status = status_of(exc)
+    return status in RETRYABLE_STATUSES or (idempotent and status in UNCERTAIN_STATUSES)
+
+
+def _counts_against_provider(exc):
+    status = status_of(exc)
+    return isinstance(exc, requests.RequestException) or status is None or status == 429 or status >= 500
+
+
+class CircuitBreaker:
+    """Consecutive-failure breaker: closed -> open -> half-open -> closed."""
+
+    def __init__(self, provider, failure_threshold, reset_timeout):
+        self.provider = provider
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._lock = threading.Lock()
+
+    def _set_state(self, state):
+        self.state = state
+        registry.set_gauge('provider_circuit_state', STATE_VALUES[state], provider=self.provider)
+
+    def allow(self):
+        with self._lock:
+            now = time.monotonic()
+            # A half-open trial that never reported back is given up on after another timeout
+            if self.state != CLOSED and now - self.opened_at >= self.reset_timeout:
+                # Let one trial call through
+                self.opened_at = now
+                self._set_state(HALF_OPEN)
+                return True
+            return self.state == CLOSED
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            if self.state != CLOSED:
+                self._set_state(CLOSED)
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == HALF_OPEN or self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+                self._set_state(OPEN)
+
+
+_breakers = {}
+_breakers_lock = threading.Lock()
+
+
+def breaker(provider):
+    with _breakers_lock:
+        if provider not in _breakers:
+            config = policy(provider)
+            _breakers[provider] = CircuitBreaker(provider, config['failure_threshold'], config['reset_timeout'])
+        return _breakers[provider]
+
+
+def reset_breakers():
+    with _breakers_lock:
+        _breakers.clear()
+
+
+def call_provider(provider, operation, func, *args, idempotent=False, **kwargs):
+    """Call ``func(*args, **kwargs)`` under ``provider``'s retry policy and breaker.
+
+    Non-idempotent calls are only retried when the provider certainly did
+    not act on the request (connection failures, 429 and 503).
+    """
+    config = policy(provider)
+    circuit = breaker(provider)
+    attempt = 0
+    while True:
+        if not circuit.allow():
+            registry.inc('provider_calls_total', provider=provider, operation=operation, outcome='short_circuited')
+            raise ProviderUnavailable(provider)
+
+        start = time.perf_counter()
+        try:
+            result = func(*args, **kwargs)
+        except Exception as exc:
+            registry.observe('provider_call_seconds', time.perf_counter() - start, provider=provider, operation=operation)
+            if _counts_against_provider(exc):
+                circuit.record_failure()
+            else:
+                # The provider is healthy; the request itself was rejected
+                circuit.record_success()
+            retry = attempt < config['retries'] and is_transient(exc, idempotent)
+            registry.inc(
+                'provider_calls_total', provider=provider, operation=operation,
+                outcome='retried' if retry else 'failed',
+            )
+            if not retry:
+                raise
+            attempt += 1
+            time.sleep(random.uniform(0, min(config['max_backoff'], config['backoff'] * 2 ** (attempt - 1))))
+            continue
+
+        registry.observe('provider_call_seconds', time.perf_counter() - start, provider=provider, operation=operation)
+        registry.inc('provider_calls_total', provider=provider, operation=operation, outcome='ok')
+        circuit.record_success()
+        return result
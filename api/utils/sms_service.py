@@ -1,23 +1,51 @@
-from twilio.rest import Client
+import logging
 from django.conf import settings
-from twilio.base.exceptions import TwilioRestException
 
-def send_sms(to_number, message):
+from .fake_providers import get_fake
+from .provider_clients import get_twilio_client
+from .resilience import call_provider
+
+logger = logging.getLogger(__name__)
+
+def _configured():
+    if get_fake('twilio') is not None:
+        # The fake client needs no credentials
+        return True
     if not all([settings.TWILIO_ACCOUNT_SID, settings.TWILIO_AUTH_TOKEN, settings.TWILIO_PHONE_NUMBER]):
-        print("Twilio credentials not configured")
+        logger.warning("Twilio credentials not configured")
         return False
-    
+    return True
+
+def _send(client, to_number, message):
+    from twilio.base.exceptions import TwilioRestException
+
     try:
-        client = Client(settings.TWILIO_ACCOUNT_SID, settings.TWILIO_AUTH_TOKEN)
-        message = client.messages.create(
+        message = call_provider(
+            'twilio', 'messages.create', client.messages.create,
             body=message,
             from_=settings.TWILIO_PHONE_NUMBER,
             to=to_number
         )
         return message.sid is not None
     except TwilioRestException as e:
-        print(f"Error sending SMS: {str(e)}")
+        logger.error("Error sending SMS: %s", e)
         return False
     except Exception as e:
-        print(f"Unexpected error: {str(e)}")
+        logger.error("Unexpected error: %s", e)
         return False
+
+def send_sms(to_number, message):
+    if not _configured():
+        return False
+    return _send(get_twilio_client(), to_number, message)
+
+def send_bulk_sms(messages):
+    """Send ``(to_number, message)`` pairs over one pooled Twilio connection.
+
+    Twilio's Messages API takes one recipient per request, so the saving
+    is in reusing the connection. Returns a list of booleans in order.
+    """
+    if not _configured():
+        return [False] * len(messages)
+    client = get_twilio_client()
+    return [_send(client, to_number, message) for to_number, message in messages]
@@ -11,13 +11,24 @@ from rest_framework import status
 from django.contrib.auth import authenticate, login, logout
 from django.contrib.auth.models import User
 from django.utils import timezone
+from datetime import datetime, timedelta, timezone as dt_timezone
+import hashlib
+import json
 from django.shortcuts import get_object_or_404
-from django.db import models
+from django.http import StreamingHttpResponse
+from django.db import models, transaction
 from .models import UserProfile, Product, PickupTimeSlot, Order, OrderItem
 from .serializers import (
     UserSerializer, UserProfileSerializer, ProductSerializer, 
     PickupTimeSlotSerializer, OrderSerializer, OrderItemSerializer
 )
+from .services.slot_holds import place_hold, release_hold, available_slots
+from .services.outbox import enqueue_email, enqueue_sms
+from .services.stock_alerts import low_stock_products
+from .services import order_export
+from .services.payment_events import (
+    InvalidSignature, record_event, verify_razorpay_signature, verify_stripe_signature
+)
 
 class RegisterView(APIView):
     permission_classes = [permissions.AllowAny]
@@ -224,9 +235,15 @@ class ProductViewSet(viewsets.ModelViewSet):
     
     def get_permissions(self):
         # Only require authentication for write operations
-        if self.action in ['create', 'update', 'partial_update', 'destroy']:
+        if self.action in ['create', 'update', 'partial_update', 'destroy', 'low_stock']:
             return [permissions.IsAdminUser()]
         return [permissions.AllowAny()]
+    
+    @action(detail=False, methods=['get'], url_path='low-stock')
+    def low_stock(self, request):
+        """Products at or below their reorder level, lowest stock first."""
+        products = low_stock_products().values('id', 'name', 'category', 'quantity', 'reorder_level', 'is_available')
+        return Response(list(products))
 
 class PickupTimeSlotViewSet(viewsets.ModelViewSet):
     queryset = PickupTimeSlot.objects.filter(is_available=True)
@@ -240,11 +257,46 @@ class PickupTimeSlotViewSet(viewsets.ModelViewSet):
     
     @action(detail=False, methods=['get'])
     def available(self, request):
-        """Get available time slots that are not full."""
+        """Get available time slots that are not full, counting other students' holds."""
         queryset = self.get_queryset()
-        available_slots = [slot for slot in queryset if not slot.is_full()]
-        serializer = self.get_serializer(available_slots, many=True)
+        slots = available_slots(queryset, user_id=request.user.id)
+        serializer = self.get_serializer(slots, many=True)
         return Response(serializer.data)
+    
+    @action(detail=False, methods=['get'], permission_classes=[permissions.IsAdminUser])
+    def staging(self, request):
+        """Suggested stock to stage for each pickup slot of a day (``?date=YYYY-MM-DD``, default today)."""
+        from .services.forecasting import staging_plan
+        
+        try:
+            day = request.query_params.get('date')
+            day = datetime.strptime(day, '%Y-%m-%d').date() if day else timezone.localdate()
+        except ValueError:
+            return Response({'error': 'date must be YYYY-MM-DD'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        start = timezone.make_aware(datetime.combine(day, datetime.min.time()))
+        slots = PickupTimeSlot.objects.filter(start_time__gte=start, start_time__lt=start + timedelta(days=1))
+        return Response({'date': day, 'slots': staging_plan(list(slots))})
+    
+    @action(detail=True, methods=['post', 'delete'])
+    def hold(self, request, pk=None):
+        """Hold a place in this slot while the student checks out."""
+        slot = self.get_object()
+        
+        if request.method == 'DELETE':
+            release_hold(slot.pk, request.user.id)
+            return Response(status=status.HTTP_204_NO_CONTENT)
+        
+        expires_at = place_hold(slot, request.user.id)
+        if expires_at is None:
+            return Response(
+                {'error': 'This time slot is already full.'},
+                status=status.HTTP_409_CONFLICT
+            )
+        return Response({
+            'slot': slot.pk,
+            'expires_at': datetime.fromtimestamp(expires_at, tz=dt_timezone.utc),
+        }, status=status.HTTP_201_CREATED)
 
 class OrderViewSet(viewsets.ModelViewSet):
     queryset = Order.objects.all()
@@ -258,40 +310,28 @@ class OrderViewSet(viewsets.ModelViewSet):
         return Order.objects.filter(student=self.request.user)
     
     def perform_create(self, serializer):
-        # Set the student to the current user
-        order = serializer.save(student=self.request.user)
-        
-        # Send order confirmation email
-        self._send_order_confirmation(order)
-        
-        # Send order confirmation SMS if phone number exists
-        try:
-            profile = order.student.userprofile
-            if profile.phone_number:
-                from .utils.sms_service import send_sms
+        # Notifications are queued in the outbox and sent after the order commits
+        with transaction.atomic():
+            order = serializer.save(student=self.request.user)
+            
+            # Send order confirmation email
+            self._send_order_confirmation(order)
+            
+            # Send order confirmation SMS if phone number exists
+            if order.student.phone_number:
                 message = (f"Your order #{order.id} has been received. "
                          f"Total: ₹{order.total_amount}. "
                          f"Pickup code: {order.pickup_code}")
-                send_sms(profile.phone_number, message)
-        except Exception as e:
-            print(f"Error sending SMS: {str(e)}")
+                enqueue_sms(order.student.phone_number, message, order=order)
     
     def _send_order_confirmation(self, order):
-        """Send order confirmation email to the customer."""
-        from .utils.email_service import send_email
-        
-        context = {
-            'user': order.student,
-            'order': order,
-            'order_items': order.items.all(),
-            'order_date': order.created_at.strftime("%B %d, %Y"),
-        }
-        
-        send_email(
+        """Queue the order confirmation email to the customer."""
+        enqueue_email(
             to_email=order.student.email,
             subject=f"Order Confirmation #{order.id}",
             template_name='order_confirmation',
-            context=context
+            order=order,
+            context={'order_date': order.created_at.strftime("%B %d, %Y")}
         )
     
     @action(detail=True, methods=['post'])
@@ -305,33 +345,28 @@ class OrderViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        order.status = new_status
-        order.save()
-        
-        # Send status update email
-        if new_status in ['ready_for_pickup', 'completed']:
-            self._send_status_update_email(order, new_status)
+        with transaction.atomic():
+            order.status = new_status
+            order.save()
+            
+            # Send status update email
+            if new_status in ['ready_for_pickup', 'completed']:
+                self._send_status_update_email(order, new_status)
         
         return Response({'status': 'Status updated'})
     
     def _send_status_update_email(self, order, status):
-        """Send status update email to the customer."""
-        from .utils.email_service import send_email
-        
+        """Queue the status update email to the customer."""
         status_display = dict(Order.STATUS_CHOICES).get(status, status)
         
-        context = {
-            'user': order.student,
-            'order': order,
-            'status': status_display,
-            'order_items': order.items.all(),
-        }
-        
-        send_email(
+        enqueue_email(
             to_email=order.student.email,
             subject=f"Order #{order.id} is now {status_display}",
             template_name='status_update',
-            context=context
+            order=order,
+            context={'status': status_display},
+            # Quick successive changes collapse into the latest one
+            coalesce_key=f'order-status:{order.id}'
         )
     
     @action(detail=True, methods=['post'])
@@ -403,6 +438,28 @@ class OrderViewSet(viewsets.ModelViewSet):
         items = order.items.all()
         serializer = OrderItemSerializer(items, many=True)
         return Response(serializer.data)
+    
+    @action(detail=False, methods=['get'], permission_classes=[permissions.IsAdminUser])
+    def export(self, request):
+        """Stream orders and their items as CSV or JSONL (``?output=jsonl``), optionally gzipped.
+        
+        Filters: ``since``/``until`` (YYYY-MM-DD, inclusive), ``status``
+        (comma-separated) and ``slot`` (pickup slot id).
+        """
+        params = request.query_params
+        output = params.get('output', 'csv')
+        gzip = params.get('gzip') in ('1', 'true', 'True')
+        try:
+            orders = order_export.filter_orders(
+                params.get('since'), params.get('until'), params.get('status'), params.get('slot')
+            )
+            chunks = order_export.export(orders, output, gzip=gzip)
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        
+        response = StreamingHttpResponse(chunks, content_type='application/gzip' if gzip else order_export.FORMATS[output])
+        response['Content-Disposition'] = f'attachment; filename="{order_export.filename(output, gzip)}"'
+        return response
 
 class AvailableTimeSlotsView(APIView):
     """View to list all available pickup time slots."""
@@ -417,9 +474,87 @@ class AvailableTimeSlotsView(APIView):
             current_orders__gte=models.F('max_orders')
         ).order_by('start_time')
         
+        # Places held by other students in checkout count as taken
+        time_slots = available_slots(time_slots, user_id=request.user.id)
+        
         serializer = PickupTimeSlotSerializer(time_slots, many=True)
         return Response(serializer.data)
 
+def _analytics_range(request):
+    """``start``/``end`` query parameters (YYYY-MM-DD, inclusive); the last 30 days by default."""
+    end = request.query_params.get('end')
+    end = datetime.strptime(end, '%Y-%m-%d').date() if end else timezone.localdate()
+    start = request.query_params.get('start')
+    start = datetime.strptime(start, '%Y-%m-%d').date() if start else end - timedelta(days=29)
+    return start, end
+
+class SalesAnalyticsView(APIView):
+    """Revenue, orders and units per hour, day or week, read from the sales rollups."""
+    permission_classes = [permissions.IsAdminUser]
+    
+    def get(self, request):
+        # NumPy is only loaded by the workers that serve analytics
+        from .services.analytics import AnalyticsError, sales_series
+        
+        try:
+            start, end = _analytics_range(request)
+            window = int(request.query_params.get('window', 7))
+            data = sales_series(start, end, request.query_params.get('bucket', 'day'), window)
+        except (AnalyticsError, ValueError) as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(data)
+
+class TopProductsView(APIView):
+    """Best-selling products for a date range, read from the product sales rollups."""
+    permission_classes = [permissions.IsAdminUser]
+    
+    def get(self, request):
+        from .services.analytics import AnalyticsError, top_products
+        
+        try:
+            start, end = _analytics_range(request)
+            limit = min(max(int(request.query_params.get('limit', 10)), 1), 100)
+            data = top_products(start, end, limit, request.query_params.get('order_by', 'revenue'))
+        except (AnalyticsError, ValueError) as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(data)
+
+class StripeWebhookView(APIView):
+    """Receive signed Stripe events; they are stored and processed asynchronously."""
+    authentication_classes = []
+    permission_classes = [permissions.AllowAny]
+    
+    def post(self, request):
+        payload = request.body
+        try:
+            verify_stripe_signature(payload, request.headers.get('Stripe-Signature', ''))
+            event = json.loads(payload)
+            event_id, event_type = event['id'], event['type']
+        except (InvalidSignature, ValueError, KeyError, TypeError):
+            return Response({'error': 'Invalid webhook'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        created = record_event('stripe', event_id, event_type, event)
+        return Response({'received': True, 'duplicate': created is None})
+
+class RazorpayWebhookView(APIView):
+    """Receive signed Razorpay events; they are stored and processed asynchronously."""
+    authentication_classes = []
+    permission_classes = [permissions.AllowAny]
+    
+    def post(self, request):
+        payload = request.body
+        try:
+            verify_razorpay_signature(payload, request.headers.get('X-Razorpay-Signature', ''))
+            event = json.loads(payload)
+            event_type = event['event']
+        except (InvalidSignature, ValueError, KeyError, TypeError):
+            return Response({'error': 'Invalid webhook'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        # Razorpay sends the event id as a header; fall back to the body's digest
+        event_id = request.headers.get('X-Razorpay-Event-Id') or hashlib.sha256(payload).hexdigest()
+        created = record_event('razorpay', event_id, event_type, event)
+        return Response({'received': True, 'duplicate': created is None})
+
 class UpdateOrderStatusView(APIView):
     """View to update the status of an order."""
     permission_classes = [permissions.IsAuthenticated]
@@ -452,8 +587,12 @@ class UpdateOrderStatusView(APIView):
         })
 
 
-class OrderItemViewSet(viewsets.ModelViewSet):
-    """ViewSet for OrderItem model."""
+class OrderItemViewSet(viewsets.ReadOnlyModelViewSet):
+    """Read-only ViewSet for OrderItem model.
+
+    Items are created from the student's cart when the order is placed,
+    which is also where their stock is taken.
+    """
     queryset = OrderItem.objects.all()
     serializer_class = OrderItemSerializer
     permission_classes = [permissions.IsAuthenticated]
@@ -464,12 +603,6 @@ class OrderItemViewSet(viewsets.ModelViewSet):
         if hasattr(user, 'userprofile') and user.userprofile.user_type == 'shopkeeper':
             return OrderItem.objects.all()
         return OrderItem.objects.filter(order__student=user)
-    
-    def perform_create(self, serializer):
-        # Ensure the order belongs to the current user
-        order_id = self.request.data.get('order')
-        order = get_object_or_404(Order, id=order_id, student=self.request.user)
-        serializer.save(order=order)
 
 
 class ShopkeeperOrderView(generics.ListAPIView):
@@ -1,4 +1,9 @@
 from django.contrib import admin
+from django.db import models
+from django.db.models import F, Sum
+from django.db.models.functions import Coalesce
+
+from api.pagination import LargeTableAdminMixin
 from .models import Cart, CartItem
 
 class CartItemInline(admin.TabularInline):
@@ -7,17 +12,53 @@ class CartItemInline(admin.TabularInline):
     readonly_fields = ('total_price',)
     fields = ('product', 'quantity', 'total_price')
 
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('product')
+
+    def formfield_for_foreignkey(self, db_field, request, **kwargs):
+        formfield = super().formfield_for_foreignkey(db_field, request, **kwargs)
+        if db_field.name == 'product':
+            # Load the product choices once for all rows instead of once per row
+            choices = getattr(request, '_cart_product_choices', None)
+            if choices is None:
+                choices = request._cart_product_choices = list(formfield.choices)
+            formfield.choices = choices
+        return formfield
+
 @admin.register(Cart)
-class CartAdmin(admin.ModelAdmin):
+class CartAdmin(LargeTableAdminMixin, admin.ModelAdmin):
     list_display = ('user', 'total_items', 'subtotal', 'created_at', 'updated_at')
     list_filter = ('created_at', 'updated_at')
-    search_fields = ('user__email', 'user__username')
+    search_fields = ('user__email', 'user__first_name', 'user__last_name')
+    list_select_related = ('user',)
     inlines = [CartItemInline]
     readonly_fields = ('created_at', 'updated_at')
 
+    def get_queryset(self, request):
+        # Totals come from one grouped query instead of the per-cart properties
+        return super().get_queryset(request).annotate(
+            total_quantity=Coalesce(Sum('items__quantity'), 0),
+            subtotal_amount=Coalesce(
+                Sum(F('items__quantity') * F('items__product__price')),
+                0,
+                output_field=models.DecimalField(max_digits=12, decimal_places=2),
+            ),
+        )
+
+    def total_items(self, obj):
+        return obj.total_quantity
+    total_items.short_description = 'Total items'
+    total_items.admin_order_field = 'total_quantity'
+
+    def subtotal(self, obj):
+        return obj.subtotal_amount
+    subtotal.short_description = 'Subtotal'
+    subtotal.admin_order_field = 'subtotal_amount'
+
 @admin.register(CartItem)
-class CartItemAdmin(admin.ModelAdmin):
+class CartItemAdmin(LargeTableAdminMixin, admin.ModelAdmin):
     list_display = ('__str__', 'cart', 'product', 'quantity', 'total_price', 'added_at')
     list_filter = ('added_at',)
     search_fields = ('product__name', 'cart__user__email')
+    list_select_related = ('cart__user', 'product')
     readonly_fields = ('total_price', 'added_at')
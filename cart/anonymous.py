@@ -0,0 +1,102 @@
+"""Carts for visitors who haven't logged in, kept in a signed cookie.
+
+Anonymous carts never touch the database: lines are stored as
+``{product_id: quantity}`` in a signed cookie and merged into the user's
+``Cart`` when they log in (see ``services.merge_anonymous_cart``).
+"""
+import json
+
+from django.conf import settings
+from django.core.signing import BadSignature
+
+from api.models import Product
+from .models import CartItem
+
+COOKIE_NAME = 'cart'
+COOKIE_SALT = 'cart.anonymous'
+
+
+def _max_age():
+    return getattr(settings, 'ANONYMOUS_CART_MAX_AGE', 60 * 60 * 24 * 14)
+
+
+class AnonymousCart:
+    """A cookie-backed cart exposing the same totals as ``Cart``."""
+
+    def __init__(self, lines=None):
+        self.lines = {int(product_id): int(quantity) for product_id, quantity in (lines or {}).items()}
+        self.modified = False
+        self._items = None
+
+    @classmethod
+    def from_request(cls, request):
+        try:
+            raw = request.get_signed_cookie(COOKIE_NAME, salt=COOKIE_SALT, max_age=_max_age())
+            return cls(json.loads(raw))
+        except (KeyError, BadSignature, ValueError, TypeError, AttributeError):
+            return cls()
+
+    def __bool__(self):
+        return bool(self.lines)
+
+    def _changed(self):
+        self.modified = True
+        self._items = None
+
+    def get(self, product_id):
+        return self.lines.get(int(product_id), 0)
+
+    def set(self, product_id, quantity):
+        self.lines[int(product_id)] = int(quantity)
+        self._changed()
+
+    def remove(self, product_id):
+        if self.lines.pop(int(product_id), None) is not None:
+            self._changed()
+            return True
+        return False
+
+    def clear(self):
+        if self.lines:
+            self.lines = {}
+            self._changed()
+
+    def items(self):
+        """Return unsaved ``CartItem`` lines for rendering, loading products in one query.
+
+        Each line's ``id`` is its product id, which is how the cart views
+        address anonymous lines.
+        """
+        if self._items is None:
+            products = Product.objects.filter(pk__in=self.lines, is_available=True).in_bulk()
+            self._items = [
+                CartItem(id=product_id, product=products[product_id], quantity=quantity)
+                for product_id, quantity in self.lines.items()
+                if product_id in products
+            ]
+        return self._items
+
+    @property
+    def total_items(self):
+        return sum(item.quantity for item in self.items())
+
+    @property
+    def subtotal(self):
+        return sum(item.total_price for item in self.items())
+
+    def save(self, response):
+        """Write the cookie back if the cart changed during the request."""
+        if not self.modified:
+            return
+        if self.lines:
+            response.set_signed_cookie(
+                COOKIE_NAME,
+                json.dumps(self.lines),
+                salt=COOKIE_SALT,
+                max_age=_max_age(),
+                httponly=True,
+                secure=settings.SESSION_COOKIE_SECURE,
+                samesite='Lax',
+            )
+        else:
+            response.delete_cookie(COOKIE_NAME, samesite='Lax')
@@ -0,0 +1,25 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+
+from cart.reaper import reap_abandoned_carts
+
+
+class Command(BaseCommand):
+    help = 'Clears carts idle past CART_ABANDONED_AFTER and expires any stock they still hold'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--idle-minutes', type=int, help='Override CART_ABANDONED_AFTER')
+        parser.add_argument('--chunk-size', type=int, help='Override CART_REAPER_CHUNK_SIZE')
+
+    def handle(self, *args, **options):
+        idle_for = timedelta(minutes=options['idle_minutes']) if options['idle_minutes'] is not None else None
+        report = reap_abandoned_carts(idle_for=idle_for, chunk_size=options['chunk_size'])
+
+        self.stdout.write(
+            f"Cleared {report['lines']} lines ({report['units_cleared']} units) from {report['carts']} carts"
+        )
+        for product_id, units in report['cleared_by_product'].items():
+            self.stdout.write(f"  product #{product_id}: {units}")
+        self.stdout.write(f"Expired {report['holds_expired']} stock holds that were still active")
+        self.stdout.write(self.style.SUCCESS(f"Purged {report['holds_purged']} expired stock holds"))
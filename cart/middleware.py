@@ -0,0 +1,14 @@
+from .anonymous import AnonymousCart
+
+
+class AnonymousCartMiddleware:
+    """Attach the cookie-backed anonymous cart to the request and persist changes."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        request.anonymous_cart = AnonymousCart.from_request(request)
+        response = self.get_response(request)
+        request.anonymous_cart.save(response)
+        return response
@@ -0,0 +1,29 @@
+# Generated by Django 4.2.30 on 2026-10-19 14:10
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0002_product_quantity'),
+        ('cart', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StockHold',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('quantity', models.PositiveIntegerField()),
+                ('expires_at', models.DateTimeField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('cart', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stock_holds', to='cart.cart')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stock_holds', to='api.product')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['product', 'expires_at'], name='cart_stockh_product_3c9bab_idx'), models.Index(fields=['cart', 'product', 'expires_at'], name='cart_stockh_cart_id_d7ec75_idx')],
+            },
+        ),
+    ]
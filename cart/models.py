@@ -1,6 +1,8 @@
 from django.db import models
+from django.db.models import Sum, F
 from django.conf import settings
 from django.core.validators import MinValueValidator
+from django.utils import timezone
 
 class Cart(models.Model):
     user = models.OneToOneField(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='cart')
@@ -10,13 +12,39 @@ class Cart(models.Model):
     def __str__(self):
         return f"Cart for {self.user.email}"
 
+    def totals(self):
+        """Return item count and subtotal from one aggregate query, memoized on the instance."""
+        if getattr(self, '_totals', None) is None:
+            self._totals = self.items.totals()
+        return self._totals
+
+    def refresh_from_db(self, *args, **kwargs):
+        # Items may have changed since the totals were computed
+        self._totals = None
+        super().refresh_from_db(*args, **kwargs)
+
     @property
     def total_items(self):
-        return sum(item.quantity for item in self.items.all())
+        return self.totals()['total_items']
 
     @property
     def subtotal(self):
-        return sum(item.total_price for item in self.items.all())
+        return self.totals()['subtotal']
+
+class CartItemQuerySet(models.QuerySet):
+    def totals(self):
+        """Return item count and subtotal of these lines in one aggregate query."""
+        totals = self.aggregate(
+            total_items=Sum('quantity'),
+            subtotal=Sum(
+                F('quantity') * F('product__price'),
+                output_field=models.DecimalField(max_digits=12, decimal_places=2),
+            ),
+        )
+        return {
+            'total_items': totals['total_items'] or 0,
+            'subtotal': totals['subtotal'] or 0,
+        }
 
 class CartItem(models.Model):
     cart = models.ForeignKey(Cart, related_name='items', on_delete=models.CASCADE)
@@ -24,6 +52,8 @@ class CartItem(models.Model):
     quantity = models.PositiveIntegerField(default=1, validators=[MinValueValidator(1)])
     added_at = models.DateTimeField(auto_now_add=True)
 
+    objects = CartItemQuerySet.as_manager()
+
     class Meta:
         ordering = ['-added_at']
         unique_together = ['cart', 'product']
@@ -34,3 +64,31 @@ class CartItem(models.Model):
     @property
     def total_price(self):
         return self.product.price * self.quantity
+
+class StockHoldQuerySet(models.QuerySet):
+    def active(self, now=None):
+        return self.filter(expires_at__gt=now or timezone.now())
+
+class StockHold(models.Model):
+    """Append-only record of stock held by a cart until ``expires_at``.
+
+    Available stock is ``Product.quantity`` minus the quantity of active
+    holds. Changing a line inserts a new hold and expires the old one
+    rather than updating a shared counter, so carts never contend on a row.
+    """
+    product = models.ForeignKey('api.Product', related_name='stock_holds', on_delete=models.CASCADE)
+    cart = models.ForeignKey(Cart, related_name='stock_holds', on_delete=models.CASCADE)
+    quantity = models.PositiveIntegerField()
+    expires_at = models.DateTimeField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    objects = StockHoldQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['product', 'expires_at']),
+            models.Index(fields=['cart', 'product', 'expires_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.quantity} x product #{self.product_id} held by cart #{self.cart_id}"
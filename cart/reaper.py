@@ -0,0 +1,79 @@
+"""Clearing of carts nobody has touched for a while.
+
+Run periodically by the ``cart.tasks.reap_abandoned_carts`` beat task, or
+on demand with ``manage.py reap_abandoned_carts``.
+"""
+from collections import Counter
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Exists, Max, OuterRef, Sum
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .models import Cart, CartItem, StockHold
+from .services import deferred_summary_invalidation
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def reap_abandoned_carts(idle_for=None, chunk_size=None, now=None):
+    """Clear carts idle for longer than ``idle_for`` and release the stock they hold.
+
+    Carts are handled ``chunk_size`` at a time with set-based statements: one
+    UPDATE expires their active holds and one DELETE removes their lines.
+    Expired ledger rows older than ``STOCK_HOLD_RETENTION`` are then purged
+    in chunks. Returns a report of the lines and units cleared, per product.
+
+    Holds lapse after ``STOCK_HOLD_TTL``, usually long before a cart counts
+    as abandoned, so what the report measures is the cleared lines rather
+    than released holds; ``holds_expired`` counts the few still active.
+    """
+    now = now or timezone.now()
+    if idle_for is None:
+        idle_for = timedelta(seconds=_setting('CART_ABANDONED_AFTER', 6 * 60 * 60))
+    chunk_size = chunk_size or _setting('CART_REAPER_CHUNK_SIZE', 500)
+    cutoff = now - idle_for
+
+    report = {'carts': 0, 'lines': 0, 'units_cleared': 0, 'holds_expired': 0, 'holds_purged': 0}
+    cleared = Counter()
+
+    # A cart's last activity is its most recent stock hold, or its creation
+    idle = (
+        Cart.objects.annotate(last_activity=Coalesce(Max('stock_holds__created_at'), 'updated_at'))
+        .filter(Exists(CartItem.objects.filter(cart=OuterRef('pk'))), last_activity__lt=cutoff)
+        .order_by('pk')
+    )
+    last_pk = 0
+    while True:
+        chunk = list(idle.filter(pk__gt=last_pk).values_list('pk', 'user_id')[:chunk_size])
+        if not chunk:
+            break
+        last_pk = chunk[-1][0]
+        cart_ids = [cart_id for cart_id, _ in chunk]
+
+        with transaction.atomic(), deferred_summary_invalidation(*[user_id for _, user_id in chunk]):
+            report['holds_expired'] += StockHold.objects.active(now).filter(cart_id__in=cart_ids).update(expires_at=now)
+
+            lines = CartItem.objects.filter(cart_id__in=cart_ids)
+            cleared.update(dict(
+                lines.values('product_id').annotate(units=Sum('quantity')).values_list('product_id', 'units')
+            ))
+            report['lines'] += lines.delete()[0]
+        report['carts'] += len(chunk)
+
+    # The ledger is append-only; drop rows that expired long enough ago
+    retention = timedelta(seconds=_setting('STOCK_HOLD_RETENTION', 24 * 60 * 60))
+    expired = StockHold.objects.filter(expires_at__lt=now - retention)
+    while True:
+        hold_ids = list(expired.values_list('pk', flat=True)[:chunk_size])
+        if not hold_ids:
+            break
+        report['holds_purged'] += StockHold.objects.filter(pk__in=hold_ids).delete()[0]
+
+    report['units_cleared'] = sum(cleared.values())
+    report['cleared_by_product'] = {str(product_id): units for product_id, units in cleared.items()}
+    return report
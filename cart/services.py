@@ -0,0 +1,310 @@
+"""Cart summaries and bulk cart operations shared by the cart views."""
+import threading
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from api.models import OrderItem, Product
+from api.services.stock_alerts import evaluate_all as evaluate_low_stock
+from .models import Cart, CartItem
+from .stock import available_quantities, release_holds, set_holds, take_stock
+
+CART_SUMMARY_KEY = 'cart-summary:{}'
+
+BATCH_OPERATIONS = ('add', 'update', 'remove')
+
+_deferred = threading.local()
+
+
+def _ttl():
+    return getattr(settings, 'CART_SUMMARY_TTL', 300)
+
+
+def get_cart_summary(user_id):
+    """Return ``{'total_items', 'subtotal'}`` for a user, from the cache when possible.
+
+    A miss costs one aggregate query over the user's cart lines and never
+    creates a cart, so users without one simply get an empty summary.
+    """
+    key = CART_SUMMARY_KEY.format(user_id)
+    summary = cache.get(key)
+    if summary is None:
+        totals = CartItem.objects.filter(cart__user_id=user_id).totals()
+        summary = {
+            'total_items': totals['total_items'],
+            'subtotal': float(totals['subtotal']),
+        }
+        cache.set(key, summary, _ttl())
+    return summary
+
+
+def invalidate_cart_summary(*user_ids):
+    """Drop cached summaries after cart items change, once the change is committed.
+
+    Deleting inside the transaction would let a concurrent read re-cache
+    the old totals until the TTL runs out.
+    """
+    keys = [CART_SUMMARY_KEY.format(user_id) for user_id in user_ids]
+    if keys:
+        transaction.on_commit(lambda: cache.delete_many(keys))
+
+
+def summary_invalidation_deferred():
+    return getattr(_deferred, 'active', False)
+
+
+@contextmanager
+def deferred_summary_invalidation(*user_ids):
+    """Skip per-line invalidation during bulk cart writes and invalidate once at the end."""
+    _deferred.active = True
+    try:
+        yield
+    finally:
+        _deferred.active = False
+        invalidate_cart_summary(*user_ids)
+
+
+def upsert_cart_lines(cart, quantities):
+    """Write ``{product_id: quantity}`` as ``cart``'s lines with one upsert.
+
+    Inserting and updating in the same statement means a line created
+    concurrently (two first adds of one product) is updated rather than
+    tripping the ``(cart, product)`` unique constraint. ``bulk_create`` sends
+    no ``post_save``, so the cached summary is invalidated here instead.
+    """
+    if not quantities:
+        return
+    CartItem.objects.bulk_create(
+        [CartItem(cart=cart, product_id=product_id, quantity=quantity) for product_id, quantity in quantities.items()],
+        update_conflicts=True,
+        unique_fields=['cart', 'product'],
+        update_fields=['quantity'],
+    )
+    if not summary_invalidation_deferred():
+        invalidate_cart_summary(cart.user_id)
+
+
+def merge_anonymous_cart(user, anonymous_cart):
+    """Fold a cookie cart into ``user``'s ``Cart`` with one bulk upsert.
+
+    Quantities are added to any existing lines, capped at the stock still
+    available to the cart, and held in the stock ledger before the lines
+    are written.
+    """
+    if not anonymous_cart:
+        return
+    cart, created = Cart.objects.get_or_create(user=user)
+    products = Product.objects.filter(pk__in=anonymous_cart.lines, is_available=True)
+    available = available_quantities(products, cart=cart)
+    existing = dict(
+        cart.items.filter(product_id__in=available).values_list('product_id', 'quantity')
+    )
+    merged = {
+        product_id: max(existing.get(product_id, 0), min(existing.get(product_id, 0) + quantity, available[product_id]))
+        for product_id, quantity in anonymous_cart.lines.items()
+        if product_id in available
+    }
+    merged = {
+        product_id: quantity for product_id, quantity in merged.items()
+        if quantity and quantity != existing.get(product_id, 0)
+    }
+    if merged:
+        rejected, _ = set_holds(cart, merged)
+        upsert_cart_lines(cart, {
+            product_id: quantity for product_id, quantity in merged.items() if product_id not in rejected
+        })
+    invalidate_cart_summary(user.pk)
+    anonymous_cart.clear()
+
+
+def place_cart_order(order, cart):
+    """Move ``cart``'s lines into ``order`` and take their stock.
+
+    Must run inside the transaction that creates the order: stock on hand is
+    decremented with ``take_stock``, which leaves other carts' holds alone
+    and whose ``OutOfStock`` rolls the order back. The cart is then emptied and its holds released, since the stock
+    they reserved now belongs to the order. Returns the created items.
+    """
+    lines = list(cart.items.select_related('product'))
+    if not lines:
+        return []
+    take_stock(lines, cart=cart)
+    # The deduction is a QuerySet.update(), which the post_save alert hook doesn't see
+    evaluate_low_stock([line.product_id for line in lines])
+    items = OrderItem.objects.bulk_create([
+        OrderItem(order=order, product=line.product, quantity=line.quantity, price_at_time_of_order=line.product.price)
+        for line in lines
+    ])
+    order.total_amount = sum(item.subtotal() for item in items)
+    order.save(update_fields=['total_amount'])
+    with deferred_summary_invalidation(cart.user_id):
+        cart.items.all().delete()
+    release_holds(cart)
+    return items
+
+
+def _as_int(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _operation_target(operation, item_products=None):
+    """Resolve the product an operation refers to, by product id or cart line id.
+
+    Without ``item_products`` line ids are product ids, as in anonymous carts.
+    """
+    if operation.get('op') == 'add' or operation.get('product_id') is not None:
+        return _as_int(operation.get('product_id'))
+    item_id = _as_int(operation.get('item_id'))
+    return item_id if item_products is None else item_products.get(item_id)
+
+
+def _plan_operations(operations, targets, products, quantities, available):
+    """Validate operations in order against stock, updating ``quantities`` in place.
+
+    ``available`` is the most each of the cart's lines may hold. Returns one
+    result dict per operation.
+    """
+    results = []
+    for operation, target in zip(operations, targets):
+        op = operation.get('op')
+        result = {'op': op, 'product_id': target, 'success': False}
+        results.append(result)
+        product = products.get(target)
+        if op not in BATCH_OPERATIONS:
+            result['error'] = 'Unknown operation'
+            continue
+        if product is None:
+            result['error'] = 'Product not found' if op == 'add' else 'Item not found'
+            continue
+        if op != 'add' and not quantities.get(product.id):
+            result['error'] = 'Item not found'
+            continue
+
+        if op == 'remove':
+            new_quantity = 0
+        else:
+            quantity = _as_int(operation.get('quantity', 1))
+            if quantity is None:
+                result['error'] = 'Invalid quantity'
+                continue
+            if quantity < 1:
+                result['error'] = 'Quantity must be at least 1'
+                continue
+            if op == 'add' and not product.is_available:
+                result['error'] = 'This product is currently unavailable'
+                continue
+            new_quantity = quantities.get(product.id, 0) + quantity if op == 'add' else quantity
+
+        if new_quantity > available[product.id]:
+            result['error'] = f'Only {available[product.id]} items available in stock'
+            result['available_quantity'] = available[product.id]
+            continue
+
+        quantities[product.id] = new_quantity
+        result.update(success=True, quantity=new_quantity)
+    return results
+
+
+def _totals(quantities, products):
+    subtotal = sum(
+        products[product_id].price * quantity
+        for product_id, quantity in quantities.items()
+        if quantity and product_id in products
+    )
+    return {
+        'total_items': sum(quantities.values()),
+        'subtotal': float(subtotal),
+    }
+
+
+def apply_cart_operations(user, operations):
+    """Apply a list of add/update/remove operations to ``user``'s cart.
+
+    Operations are validated against the cart and stock in memory, the
+    resulting stock holds are placed in one pass, and the lines are then
+    written in one transaction with a single upsert and one delete, so the
+    number of queries does not grow with the number of operations. Returns
+    the per-operation results and the resulting cart totals.
+    """
+    with deferred_summary_invalidation(user.pk):
+        if any(operation.get('op') == 'add' for operation in operations):
+            cart, created = Cart.objects.get_or_create(user=user)
+        else:
+            cart = Cart.objects.filter(user=user).first()
+        lines = list(cart.items.all()) if cart else []
+        original = {line.product_id: line.quantity for line in lines}
+        quantities = dict(original)
+
+        targets = [
+            _operation_target(operation, {line.id: line.product_id for line in lines})
+            for operation in operations
+        ]
+        # One query for every product the cart holds or the operations touch
+        products = Product.objects.in_bulk(
+            set(original) | {target for target in targets if target is not None}
+        )
+        available = available_quantities(products.values(), cart=cart)
+        results = _plan_operations(operations, targets, products, quantities, available)
+
+        changed = {
+            product_id: quantity for product_id, quantity in quantities.items()
+            if quantity != original.get(product_id, 0)
+        }
+        if changed:
+            # Stock is held before the lines are written, outside the transaction
+            rejected, available = set_holds(cart, changed)
+            for result in results:
+                if result['success'] and result['product_id'] in rejected:
+                    result.update(
+                        success=False,
+                        error=f"Only {available[result['product_id']]} items available in stock",
+                        available_quantity=available[result['product_id']],
+                    )
+                    del result['quantity']
+            for product_id in rejected:
+                quantities[product_id] = original.get(product_id, 0)
+                del changed[product_id]
+
+        item_ids = {line.product_id: line.id for line in lines}
+        if changed:
+            with transaction.atomic():
+                upsert_cart_lines(cart, {
+                    product_id: quantity for product_id, quantity in changed.items() if quantity > 0
+                })
+                removed = [product_id for product_id, quantity in changed.items() if quantity == 0]
+                if removed:
+                    cart.items.filter(product_id__in=removed).delete()
+            # New lines only get ids once written
+            item_ids.update(cart.items.values_list('product_id', 'id'))
+
+    for result in results:
+        if result['success']:
+            result['item_id'] = item_ids.get(result['product_id'])
+    return results, _totals(quantities, products)
+
+
+def apply_anonymous_cart_operations(anonymous_cart, operations):
+    """Apply batch operations to a cookie cart; its lines are addressed by product id."""
+    quantities = dict(anonymous_cart.lines)
+    targets = [_operation_target(operation) for operation in operations]
+    products = Product.objects.in_bulk(
+        set(quantities) | {target for target in targets if target is not None}
+    )
+    results = _plan_operations(
+        operations, targets, products, quantities, available_quantities(products.values())
+    )
+    for product_id, quantity in quantities.items():
+        if quantity != anonymous_cart.get(product_id):
+            if quantity:
+                anonymous_cart.set(product_id, quantity)
+            else:
+                anonymous_cart.remove(product_id)
+    for result in results:
+        if result['success']:
+            result['item_id'] = result['product_id']
+    return results, _totals({pid: q for pid, q in quantities.items() if q}, products)
@@ -0,0 +1,37 @@
+from django.contrib.auth.signals import user_logged_in
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from api.models import Product
+from .models import Cart, CartItem
+from .services import invalidate_cart_summary, merge_anonymous_cart, summary_invalidation_deferred
+
+
+@receiver([post_save, post_delete], sender=CartItem)
+def cart_item_changed(sender, instance, **kwargs):
+    """Invalidate the owner's cached cart summary when a line changes."""
+    if summary_invalidation_deferred():
+        return
+    if CartItem.cart.is_cached(instance):
+        user_id = instance.cart.user_id
+    else:
+        user_id = Cart.objects.filter(pk=instance.cart_id).values_list('user_id', flat=True).first()
+    if user_id is not None:
+        invalidate_cart_summary(user_id)
+
+
+@receiver(post_save, sender=Product)
+def product_changed(sender, instance, update_fields=None, **kwargs):
+    """A price change alters the subtotal of every cart holding the product."""
+    if update_fields is not None and 'price' not in update_fields:
+        return
+    user_ids = CartItem.objects.filter(product=instance).values_list('cart__user_id', flat=True)
+    invalidate_cart_summary(*user_ids)
+
+
+@receiver(user_logged_in)
+def merge_cart_on_login(sender, request, user, **kwargs):
+    """Move anything the visitor added before logging in into their cart."""
+    anonymous_cart = getattr(request, 'anonymous_cart', None)
+    if anonymous_cart:
+        merge_anonymous_cart(user, anonymous_cart)
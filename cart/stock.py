@@ -0,0 +1,143 @@
+"""Stock held by carts, tracked in the ``StockHold`` ledger.
+
+``Product.quantity`` is the stock on hand. Cart changes don't touch it;
+it is only decremented, by ``take_stock``, when a cart becomes an order.
+What a cart may still take, when holding or when ordering, is the stock
+on hand minus every other cart's active holds. A growing hold is inserted
+and committed *before* it is checked, so two carts racing for the last
+item see each other's row and at worst both retry; neither waits on a lock and stock is never oversold.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import F, Q, Subquery, Sum
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from api.models import Product
+from .models import StockHold
+
+
+class OutOfStock(Exception):
+    """Raised by ``take_stock`` when less of a product is available than ordered."""
+
+    def __init__(self, product, available):
+        self.product = product
+        self.available = available
+        super().__init__(f'Only {available} of {product.name} left in stock')
+
+
+def _ttl():
+    return timedelta(seconds=getattr(settings, 'STOCK_HOLD_TTL', 30 * 60))
+
+
+def held_quantities(product_ids, exclude_cart=None, now=None):
+    """Return ``{product_id: quantity held by active holds}`` in one grouped query."""
+    holds = StockHold.objects.active(now).filter(product_id__in=product_ids)
+    if exclude_cart is not None:
+        holds = holds.exclude(cart=exclude_cart)
+    held = dict(holds.values('product_id').annotate(held=Sum('quantity')).values_list('product_id', 'held'))
+    return {product_id: held.get(product_id, 0) for product_id in product_ids}
+
+
+def available_quantities(products, cart=None, now=None):
+    """Return ``{product_id: stock still available to cart}`` for loaded ``products``.
+
+    The cart's own holds are not subtracted, so the result is the most the
+    cart's line for each product may hold.
+    """
+    products = list(products)
+    held = held_quantities([product.id for product in products], exclude_cart=cart, now=now)
+    return {product.id: max(0, product.quantity - held[product.id]) for product in products}
+
+
+def set_holds(cart, quantities):
+    """Make ``cart``'s active holds equal ``{product_id: quantity}``.
+
+    Returns ``(rejected, available)``: the product ids whose increase did not
+    fit in the remaining stock (their previous hold is kept) and the stock
+    left available to the cart per product. Must run outside a transaction
+    so that new holds are visible to concurrent carts before they are checked.
+    """
+    now = timezone.now()
+    expires_at = now + _ttl()
+    product_ids = list(quantities)
+
+    previous_ids = {}
+    previous = {product_id: 0 for product_id in product_ids}
+    for hold_id, product_id, quantity in (
+        StockHold.objects.active(now)
+        .filter(cart=cart, product_id__in=product_ids)
+        .values_list('pk', 'product_id', 'quantity')
+    ):
+        previous_ids.setdefault(product_id, []).append(hold_id)
+        previous[product_id] += quantity
+
+    changed = {
+        product_id: quantity for product_id, quantity in quantities.items()
+        if quantity != previous[product_id]
+    }
+    growing = [product_id for product_id, quantity in changed.items() if quantity > previous[product_id]]
+
+    StockHold.objects.bulk_create([
+        StockHold(cart=cart, product_id=product_id, quantity=quantity, expires_at=expires_at)
+        for product_id, quantity in changed.items() if quantity > 0
+    ])
+
+    rejected = set()
+    available = {}
+    if product_ids:
+        on_hand = dict(Product.objects.filter(pk__in=product_ids).values_list('pk', 'quantity'))
+        # Every active hold, including the ones just written
+        held = held_quantities(product_ids, now=now)
+        for product_id in product_ids:
+            new = quantities[product_id] if product_id in changed and quantities[product_id] > 0 else 0
+            others = held[product_id] - previous[product_id] - new
+            available[product_id] = max(0, on_hand.get(product_id, 0) - others)
+            if product_id in growing and quantities[product_id] > available[product_id]:
+                rejected.add(product_id)
+
+    # Retire superseded holds, or the new ones that didn't fit
+    retired = Q(cart=cart, product_id__in=rejected, expires_at=expires_at)
+    for product_id in changed:
+        if product_id not in rejected:
+            retired |= Q(pk__in=previous_ids.get(product_id, []))
+    StockHold.objects.filter(retired).update(expires_at=now)
+
+    return rejected, available
+
+
+def release_holds(cart, product_ids=None):
+    """Expire ``cart``'s active holds, optionally only for ``product_ids``."""
+    holds = StockHold.objects.active().filter(cart=cart)
+    if product_ids is not None:
+        holds = holds.filter(product_id__in=product_ids)
+    return holds.update(expires_at=timezone.now())
+
+
+def take_stock(lines, cart=None):
+    """Deduct each line's quantity from its product's stock on hand.
+
+    ``lines`` are cart lines (or anything with ``product`` and ``quantity``)
+    and ``cart`` is the cart they come from. Stock held by any other cart is
+    off limits, so a cart whose own holds lapsed can't buy units another
+    cart still holds. Each product gets one conditional ``UPDATE``, in
+    product order so concurrent orders don't deadlock, and ``OutOfStock``
+    is raised for the first one without enough left. Run it in the order's
+    transaction so a failure rolls back the deductions already made.
+    """
+    now = timezone.now()
+    for line in sorted(lines, key=lambda line: line.product.pk):
+        holds = StockHold.objects.active(now).filter(product_id=line.product.pk)
+        if cart is not None:
+            holds = holds.exclude(cart=cart)
+        held = Coalesce(
+            Subquery(holds.values('product_id').annotate(held=Sum('quantity')).values('held')),
+            0,
+        )
+        taken = Product.objects.filter(pk=line.product.pk, quantity__gte=held + line.quantity).update(
+            quantity=F('quantity') - line.quantity
+        )
+        if not taken:
+            products = Product.objects.filter(pk=line.product.pk)
+            raise OutOfStock(line.product, available_quantities(products, cart=cart, now=now).get(line.product.pk, 0))
@@ -0,0 +1,9 @@
+from celery import shared_task
+
+from .reaper import reap_abandoned_carts as _reap_abandoned_carts
+
+
+@shared_task
+def reap_abandoned_carts():
+    """Periodic beat task; see ``cart.reaper``."""
+    return _reap_abandoned_carts()
@@ -1,3 +1,313 @@
+import json
+from datetime import timedelta
+from decimal import Decimal
+from unittest import mock
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.signing import get_cookie_signer
 from django.test import TestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from api.models import Order, Product, UserProfile
+from .anonymous import COOKIE_NAME, COOKIE_SALT
+from .models import Cart, CartItem
+from .reaper import reap_abandoned_carts
+from .services import CART_SUMMARY_KEY, get_cart_summary
+from .stock import OutOfStock, available_quantities, held_quantities, release_holds, set_holds, take_stock
+
+
+class CartTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = UserProfile.objects.create_user(email='student@example.com', password='secret-123')
+        self.pen = Product.objects.create(name='Pen', price='10.00', quantity=5)
+        self.notebook = Product.objects.create(name='Notebook', price='40.00', quantity=3)
+
+
+class CartSummaryTests(CartTestCase):
+    def test_summary_is_cached(self):
+        cart = Cart.objects.create(user=self.user)
+        CartItem.objects.create(cart=cart, product=self.pen, quantity=2)
+        self.assertEqual(get_cart_summary(self.user.pk), {'total_items': 2, 'subtotal': 20.0})
+        with self.assertNumQueries(0):
+            get_cart_summary(self.user.pk)
+
+    def test_summary_of_user_without_cart(self):
+        self.assertEqual(get_cart_summary(self.user.pk), {'total_items': 0, 'subtotal': 0.0})
+        self.assertFalse(Cart.objects.filter(user=self.user).exists())
+
+    def test_invalidated_when_the_change_commits(self):
+        cart = Cart.objects.create(user=self.user)
+        get_cart_summary(self.user.pk)
+        key = CART_SUMMARY_KEY.format(self.user.pk)
+        with self.captureOnCommitCallbacks() as callbacks:
+            CartItem.objects.create(cart=cart, product=self.notebook, quantity=1)
+        # Still cached until the transaction commits
+        self.assertIsNotNone(cache.get(key))
+        for callback in callbacks:
+            callback()
+        self.assertIsNone(cache.get(key))
+        self.assertEqual(get_cart_summary(self.user.pk), {'total_items': 1, 'subtotal': 40.0})
+
+    def test_price_change_invalidates(self):
+        cart = Cart.objects.create(user=self.user)
+        CartItem.objects.create(cart=cart, product=self.pen, quantity=3)
+        get_cart_summary(self.user.pk)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.pen.price = '12.00'
+            self.pen.save()
+        self.assertEqual(get_cart_summary(self.user.pk)['subtotal'], 36.0)
+
+
+class StockHoldTests(CartTestCase):
+    def setUp(self):
+        super().setUp()
+        self.cart = Cart.objects.create(user=self.user)
+        other = UserProfile.objects.create_user(email='other@example.com', password='secret-123')
+        self.other_cart = Cart.objects.create(user=other)
+
+    def test_holds_reduce_what_other_carts_may_take(self):
+        rejected, available = set_holds(self.cart, {self.pen.pk: 4})
+        self.assertEqual(rejected, set())
+        self.assertEqual(available_quantities([self.pen], cart=self.other_cart), {self.pen.pk: 1})
+        rejected, available = set_holds(self.other_cart, {self.pen.pk: 2})
+        self.assertEqual(rejected, {self.pen.pk})
+        self.assertEqual(available[self.pen.pk], 1)
+        # Stock on hand is untouched by holds
+        self.pen.refresh_from_db()
+        self.assertEqual(self.pen.quantity, 5)
+
+    def test_rejected_increase_keeps_previous_hold(self):
+        set_holds(self.cart, {self.pen.pk: 2})
+        set_holds(self.other_cart, {self.pen.pk: 3})
+        rejected, _ = set_holds(self.cart, {self.pen.pk: 3})
+        self.assertEqual(rejected, {self.pen.pk})
+        self.assertEqual(held_quantities([self.pen.pk], exclude_cart=self.other_cart), {self.pen.pk: 2})
+
+    def test_release_and_expiry_free_stock(self):
+        set_holds(self.cart, {self.pen.pk: 5, self.notebook.pk: 1})
+        release_holds(self.cart, [self.pen.pk])
+        self.assertEqual(held_quantities([self.pen.pk, self.notebook.pk]), {self.pen.pk: 0, self.notebook.pk: 1})
+        later = timezone.now() + timedelta(seconds=settings.STOCK_HOLD_TTL + 1)
+        self.assertEqual(held_quantities([self.notebook.pk], now=later), {self.notebook.pk: 0})
+
+
+class OrderPlacementTests(CartTestCase):
+    def setUp(self):
+        super().setUp()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.cart = Cart.objects.create(user=self.user)
+        for product, quantity in ((self.pen, 2), (self.notebook, 3)):
+            CartItem.objects.create(cart=self.cart, product=product, quantity=quantity)
+        set_holds(self.cart, {self.pen.pk: 2, self.notebook.pk: 3})
+
+    def test_order_takes_stock_and_empties_cart(self):
+        response = self.client.post('/api/orders/', {}, format='json')
+        self.assertEqual(response.status_code, 201, response.content)
+        order = Order.objects.get(pk=response.json()['id'])
+        self.assertEqual(
+            sorted(order.items.values_list('product_id', 'quantity')),
+            sorted([(self.pen.pk, 2), (self.notebook.pk, 3)]),
+        )
+        self.assertEqual(order.total_amount, Decimal('140.00'))
+        self.assertEqual(Product.objects.get(pk=self.pen.pk).quantity, 3)
+        self.assertEqual(Product.objects.get(pk=self.notebook.pk).quantity, 0)
+        self.assertFalse(self.cart.items.exists())
+        self.assertEqual(held_quantities([self.pen.pk, self.notebook.pk]), {self.pen.pk: 0, self.notebook.pk: 0})
+
+    def test_order_rejected_when_stock_ran_out(self):
+        # Sold elsewhere after the holds lapsed
+        Product.objects.filter(pk=self.notebook.pk).update(quantity=2)
+        response = self.client.post('/api/orders/', {}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('Only 2 of Notebook left in stock', str(response.json()))
+        self.assertFalse(Order.objects.exists())
+        # Nothing was deducted and the cart is intact
+        self.assertEqual(Product.objects.get(pk=self.pen.pk).quantity, 5)
+        self.assertEqual(self.cart.items.count(), 2)
+
+    def test_take_stock_never_goes_negative(self):
+        lines = list(self.cart.items.select_related('product'))
+        take_stock(lines, cart=self.cart)
+        with self.assertRaises(OutOfStock):
+            take_stock(lines, cart=self.cart)
+        self.assertEqual(Product.objects.get(pk=self.notebook.pk).quantity, 0)
+
+    def test_order_cannot_take_stock_held_by_another_cart(self):
+        # This cart's holds lapsed and another cart now holds most of the pens
+        release_holds(self.cart)
+        other = UserProfile.objects.create_user(email='other@example.com', password='secret-123')
+        other_cart = Cart.objects.create(user=other)
+        self.assertEqual(set_holds(other_cart, {self.pen.pk: 4})[0], set())
+
+        response = self.client.post('/api/orders/', {}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('Only 1 of Pen left in stock', str(response.json()))
+        self.assertEqual(Product.objects.get(pk=self.pen.pk).quantity, 5)
+
+        # The holding cart can still check out what it holds
+        lines = [CartItem(cart=other_cart, product=self.pen, quantity=4)]
+        take_stock(lines, cart=other_cart)
+        self.assertEqual(Product.objects.get(pk=self.pen.pk).quantity, 1)
+
+
+class ReaperTests(CartTestCase):
+    def test_reports_lines_and_units_cleared(self):
+        idle = Cart.objects.create(user=self.user)
+        CartItem.objects.create(cart=idle, product=self.pen, quantity=2)
+        CartItem.objects.create(cart=idle, product=self.notebook, quantity=1)
+        Cart.objects.filter(pk=idle.pk).update(updated_at=timezone.now() - timedelta(days=1))
+        active_user = UserProfile.objects.create_user(email='active@example.com', password='secret-123')
+        active = Cart.objects.create(user=active_user)
+        CartItem.objects.create(cart=active, product=self.pen, quantity=1)
+        set_holds(active, {self.pen.pk: 1})
+
+        report = reap_abandoned_carts(idle_for=timedelta(hours=6))
+
+        self.assertEqual(report['carts'], 1)
+        self.assertEqual(report['lines'], 2)
+        self.assertEqual(report['units_cleared'], 3)
+        self.assertEqual(report['cleared_by_product'], {str(self.pen.pk): 2, str(self.notebook.pk): 1})
+        self.assertEqual(report['holds_expired'], 0)
+        self.assertFalse(idle.items.exists())
+        self.assertEqual(active.items.count(), 1)
+
+
+class BatchUpdateCartTests(CartTestCase):
+    def setUp(self):
+        super().setUp()
+        self.client.force_login(self.user)
+
+    def _batch(self, operations):
+        return self.client.post('/cart/batch/', json.dumps({'operations': operations}), content_type='application/json')
+
+    def _lines(self):
+        return dict(CartItem.objects.filter(cart__user=self.user).values_list('product_id', 'quantity'))
+
+    def test_operations_apply_in_order(self):
+        response = self._batch([
+            {'op': 'add', 'product_id': self.pen.pk, 'quantity': 2},
+            {'op': 'add', 'product_id': self.notebook.pk},
+            {'op': 'add', 'product_id': self.pen.pk},
+        ])
+        data = response.json()
+        self.assertTrue(data['success'])
+        self.assertEqual([result['quantity'] for result in data['results']], [2, 1, 3])
+        self.assertEqual((data['total_items'], data['subtotal']), (4, 70.0))
+        self.assertEqual(self._lines(), {self.pen.pk: 3, self.notebook.pk: 1})
+        self.assertEqual(held_quantities([self.pen.pk]), {self.pen.pk: 3})
+
+        notebook_line = data['results'][1]['item_id']
+        data = self._batch([
+            {'op': 'update', 'item_id': notebook_line, 'quantity': 2},
+            {'op': 'remove', 'product_id': self.pen.pk},
+        ]).json()
+        self.assertTrue(data['success'])
+        self.assertEqual(self._lines(), {self.notebook.pk: 2})
+        self.assertEqual(held_quantities([self.pen.pk, self.notebook.pk]), {self.pen.pk: 0, self.notebook.pk: 2})
+
+    def test_failed_operations_leave_the_rest(self):
+        data = self._batch([
+            {'op': 'add', 'product_id': self.pen.pk, 'quantity': 6},
+            {'op': 'add', 'product_id': self.notebook.pk, 'quantity': 1},
+            {'op': 'update', 'item_id': 999999, 'quantity': 1},
+            {'op': 'add', 'product_id': self.notebook.pk, 'quantity': 0},
+            {'op': 'explode', 'product_id': self.pen.pk},
+        ]).json()
+        self.assertFalse(data['success'])
+        self.assertEqual([result['success'] for result in data['results']], [False, True, False, False, False])
+        self.assertEqual(data['results'][0]['error'], 'Only 5 items available in stock')
+        self.assertEqual(data['results'][2]['error'], 'Item not found')
+        self.assertEqual(data['results'][3]['error'], 'Quantity must be at least 1')
+        self.assertEqual(data['results'][4]['error'], 'Unknown operation')
+        self.assertEqual(self._lines(), {self.notebook.pk: 1})
+
+    def test_other_carts_holds_limit_the_batch(self):
+        other = UserProfile.objects.create_user(email='other@example.com', password='secret-123')
+        set_holds(Cart.objects.create(user=other), {self.pen.pk: 4})
+        data = self._batch([{'op': 'add', 'product_id': self.pen.pk, 'quantity': 2}]).json()
+        self.assertEqual(data['results'][0]['available_quantity'], 1)
+        self.assertEqual(self._lines(), {})
+
+    def test_invalid_requests(self):
+        self.assertEqual(self._batch({'op': 'add'}).status_code, 400)
+        with self.settings(CART_BATCH_MAX_OPERATIONS=2):
+            self.assertEqual(self._batch([{'op': 'add', 'product_id': self.pen.pk}] * 3).status_code, 400)
+
+    def test_anonymous_cart(self):
+        self.client.logout()
+        data = self._batch([
+            {'op': 'add', 'product_id': self.pen.pk, 'quantity': 2},
+            {'op': 'update', 'item_id': self.pen.pk, 'quantity': 4},
+        ]).json()
+        self.assertTrue(data['success'])
+        self.assertEqual((data['total_items'], data['subtotal']), (4, 40.0))
+        self.assertFalse(CartItem.objects.exists())
+        self.assertEqual(self.client.get('/cart/summary/').json(), {'total_items': 4, 'subtotal': 40.0})
+
+
+class LoginMergeTests(CartTestCase):
+    def setUp(self):
+        super().setUp()
+        self.eraser = Product.objects.create(name='Eraser', price='5.00', quantity=2)
+        self.cart = Cart.objects.create(user=self.user)
+        CartItem.objects.create(cart=self.cart, product=self.pen, quantity=1)
+        set_holds(self.cart, {self.pen.pk: 1})
+        other = UserProfile.objects.create_user(email='other@example.com', password='secret-123')
+        self.other_cart = Cart.objects.create(user=other)
+        set_holds(self.other_cart, {self.notebook.pk: 2})
+
+    def _login(self, lines):
+        self.client.cookies[COOKIE_NAME] = get_cookie_signer(salt=COOKIE_NAME + COOKIE_SALT).sign(json.dumps(lines))
+        return self.client.post(
+            '/api/auth/login/', {'username': 'student@example.com', 'password': 'secret-123'},
+            content_type='application/json',
+        )
+
+    def test_login_merges_cookie_cart(self):
+        response = self._login({self.pen.pk: 2, self.notebook.pk: 3})
+        self.assertEqual(response.status_code, 200, response.content)
+        # Added to the existing pen line; the notebooks are capped at what the other cart leaves
+        self.assertEqual(
+            dict(self.cart.items.values_list('product_id', 'quantity')),
+            {self.pen.pk: 3, self.notebook.pk: 1},
+        )
+        self.assertEqual(
+            held_quantities([self.pen.pk, self.notebook.pk], exclude_cart=self.other_cart),
+            {self.pen.pk: 3, self.notebook.pk: 1},
+        )
+        self.assertEqual(response.cookies[COOKIE_NAME].value, '')
+        self.assertEqual(response.cookies[COOKIE_NAME]['max-age'], 0)
+
+    def test_lines_rejected_by_holds_are_dropped(self):
+        # Another cart takes the erasers between the cap and the hold
+        def racing_set_holds(cart, quantities):
+            set_holds(self.other_cart, {self.notebook.pk: 2, self.eraser.pk: 2})
+            return set_holds(cart, quantities)
+
+        with mock.patch('cart.services.set_holds', side_effect=racing_set_holds):
+            response = self._login({self.eraser.pk: 1, self.pen.pk: 1})
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual(dict(self.cart.items.values_list('product_id', 'quantity')), {self.pen.pk: 2})
+        self.assertEqual(held_quantities([self.eraser.pk], exclude_cart=self.other_cart), {self.eraser.pk: 0})
+        self.assertEqual(response.cookies[COOKIE_NAME]['max-age'], 0)
+
+
+class ConcurrentAddTests(CartTestCase):
+    def test_concurrent_first_adds_upsert_the_line(self):
+        self.client.force_login(self.user)
+
+        # The other request writes the line after this one looked for it
+        def racing_set_holds(cart, quantities):
+            CartItem.objects.get_or_create(cart=cart, product_id=self.pen.pk, defaults={'quantity': 1})
+            return set_holds(cart, quantities)
 
-# Create your tests here.
+        with mock.patch('cart.views.set_holds', side_effect=racing_set_holds):
+            response = self.client.post(f'/cart/add/{self.pen.pk}/')
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual(dict(CartItem.objects.values_list('product_id', 'quantity')), {self.pen.pk: 1})
+        self.assertEqual(held_quantities([self.pen.pk]), {self.pen.pk: 1})
+        self.assertEqual(get_cart_summary(self.user.pk), {'total_items': 1, 'subtotal': 10.0})
@@ -1,100 +1,96 @@
 from django.shortcuts import get_object_or_404, render, redirect
-from django.contrib.auth.decorators import login_required
 from django.http import JsonResponse
 from django.views.decorators.http import require_POST
+from django.db import transaction
 from .models import Cart, CartItem
+from .services import get_cart_summary, apply_cart_operations, apply_anonymous_cart_operations, upsert_cart_lines
+from .stock import set_holds, release_holds, available_quantities
+from django.conf import settings
 from api.models import Product
 import json
+import logging
+
+logger = logging.getLogger(__name__)
 
-@login_required
 def view_cart(request):
-    cart, created = Cart.objects.get_or_create(user=request.user)
-    return render(request, 'cart.html', {'cart': cart})
+    if not request.user.is_authenticated:
+        cart = request.anonymous_cart
+        return render(request, 'cart.html', {'cart': cart, 'cart_items': cart.items()})
+    
+    # Reads never create a cart; that happens on the first add
+    cart = Cart.objects.filter(user=request.user).first()
+    cart_items = list(cart.items.select_related('product')) if cart else []
+    return render(request, 'cart.html', {'cart': cart, 'cart_items': cart_items})
 
-@login_required
 @require_POST
 def add_to_cart(request, product_id):
-    print(f"[DEBUG] Adding product {product_id} to cart for user {request.user.id}")
+    if not request.user.is_authenticated:
+        return _add_to_anonymous_cart(request, product_id)
+    
+    logger.debug("Adding product %s to cart for user %s", product_id, request.user.id)
     
     try:
-        # Get the product with select_for_update to lock the row
-        try:
-            with transaction.atomic():
-                product = Product.objects.select_for_update().get(id=product_id)
-                print(f"[DEBUG] Found product: {product.name}, Available quantity: {getattr(product, 'quantity', 0)}")
-                
-                # Check if product is available and has stock
-                if not product.is_available:
-                    return JsonResponse(
-                        {'success': False, 'error': 'This product is currently unavailable'}, 
-                        status=400
-                    )
-                
-                available_quantity = getattr(product, 'quantity', 0)
-                if available_quantity <= 0:
-                    return JsonResponse(
-                        {'success': False, 'error': 'This product is out of stock'}, 
-                        status=400
-                    )
-                
-                # Get or create cart
-                cart, created = Cart.objects.get_or_create(user=request.user)
-                if created:
-                    print("[DEBUG] Created new cart")
-                
-                # Get or create cart item
-                cart_item, created = CartItem.objects.get_or_create(
-                    cart=cart,
-                    product=product,
-                    defaults={'quantity': 1}
-                )
-                
-                if not created:
-                    # Check if adding one more would exceed available quantity
-                    if cart_item.quantity >= available_quantity:
-                        return JsonResponse({
-                            'success': False, 
-                            'error': f'Only {available_quantity} items available in stock',
-                            'available_quantity': available_quantity
-                        }, status=400)
-                    
-                    cart_item.quantity += 1
-                    cart_item.save()
-                
-                # Update product quantity (if quantity field exists)
-                if hasattr(product, 'quantity'):
-                    product.quantity = max(0, product.quantity - 1)
-                    product.save()
-                
-                # Refresh cart to get updated values
-                cart.refresh_from_db()
-                
-                print(f"[DEBUG] Cart updated. Total items: {cart.total_items}, Subtotal: {cart.subtotal}")
-                
-                return JsonResponse({
-                    'success': True,
-                    'total_items': cart.total_items,
-                    'subtotal': float(cart.subtotal),
-                    'available_quantity': product.quantity if hasattr(product, 'quantity') else None
-                })
-                
-        except Product.DoesNotExist:
-            print(f"[ERROR] Product {product_id} not found")
+        product = Product.objects.filter(id=product_id).first()
+        if product is None:
+            logger.warning("Product %s not found", product_id)
             return JsonResponse(
                 {'success': False, 'error': 'Product not found'}, 
                 status=404
             )
+        
+        # Check if product is available
+        if not product.is_available:
+            return JsonResponse(
+                {'success': False, 'error': 'This product is currently unavailable'}, 
+                status=400
+            )
+        
+        # Get or create cart
+        cart, created = Cart.objects.get_or_create(user=request.user)
+        if created:
+            logger.debug("Created new cart for user %s", request.user.id)
+        
+        cart_item = CartItem.objects.filter(cart=cart, product=product).first()
+        quantity = (cart_item.quantity if cart_item else 0) + 1
+        
+        # Hold the stock first; no row lock is taken on the product
+        rejected, available = set_holds(cart, {product.id: quantity})
+        available_quantity = available[product.id]
+        if product.id in rejected:
+            if available_quantity <= 0:
+                return JsonResponse(
+                    {'success': False, 'error': 'This product is out of stock'}, 
+                    status=400
+                )
+            return JsonResponse({
+                'success': False, 
+                'error': f'Only {available_quantity} items available in stock',
+                'available_quantity': available_quantity
+            }, status=400)
+        
+        if cart_item:
+            cart_item.quantity = quantity
+            cart_item.save(update_fields=['quantity'])
+        else:
+            # An upsert, in case a concurrent first add of this product wrote the line already
+            upsert_cart_lines(cart, {product.id: quantity})
+        
+        logger.debug("Cart updated. Total items: %s, Subtotal: %s", cart.total_items, cart.subtotal)
+        
+        return JsonResponse({
+            'success': True,
+            'total_items': cart.total_items,
+            'subtotal': float(cart.subtotal),
+            'available_quantity': available_quantity - quantity
+        })
             
     except Exception as e:
-        print(f"[ERROR] Error in add_to_cart: {str(e)}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("Error in add_to_cart")
         return JsonResponse(
             {'success': False, 'error': str(e)}, 
             status=500
         )
 
-@login_required
 @require_POST
 def update_cart_item(request, item_id):
     try:
@@ -104,104 +100,192 @@ def update_cart_item(request, item_id):
         if new_quantity < 1:
             return JsonResponse({'success': False, 'error': 'Quantity must be at least 1'}, status=400)
         
-        with transaction.atomic():
-            # Get the cart item with product details
-            cart_item = get_object_or_404(
-                CartItem.objects.select_related('product'), 
-                id=item_id, 
-                cart__user=request.user
-            )
-            
-            # Check available quantity if product has quantity tracking
-            if hasattr(cart_item.product, 'quantity'):
-                # Calculate the difference in quantity
-                quantity_difference = new_quantity - cart_item.quantity
-                available_quantity = cart_item.product.quantity
-                
-                # If increasing quantity, check if enough stock is available
-                if quantity_difference > 0 and available_quantity < quantity_difference:
-                    return JsonResponse({
-                        'success': False, 
-                        'error': f'Only {available_quantity} items available in stock',
-                        'available_quantity': available_quantity
-                    }, status=400)
-                
-                # Update the product quantity
-                cart_item.product.quantity = max(0, cart_item.product.quantity - quantity_difference)
-                cart_item.product.save()
-            
-            # Update the cart item quantity
-            cart_item.quantity = new_quantity
-            cart_item.save()
-            
-            # Refresh the cart to get updated values
-            cart_item.cart.refresh_from_db()
-            
+        if not request.user.is_authenticated:
+            return _update_anonymous_cart_item(request, item_id, new_quantity)
+        
+        # Get the cart item with product details
+        cart_item = get_object_or_404(
+            CartItem.objects.select_related('product', 'cart'), 
+            id=item_id, 
+            cart__user=request.user
+        )
+        
+        # Resize the stock hold; shrinking always fits
+        rejected, available = set_holds(cart_item.cart, {cart_item.product_id: new_quantity})
+        available_quantity = available[cart_item.product_id]
+        if cart_item.product_id in rejected:
             return JsonResponse({
-                'success': True,
-                'total_items': cart_item.cart.total_items,
-                'subtotal': float(cart_item.cart.subtotal),
-                'item_total': float(cart_item.total_price),
-                'available_quantity': cart_item.product.quantity if hasattr(cart_item.product, 'quantity') else None
-            })
+                'success': False, 
+                'error': f'Only {available_quantity} items available in stock',
+                'available_quantity': available_quantity
+            }, status=400)
+        
+        # Update the cart item quantity
+        cart_item.quantity = new_quantity
+        cart_item.save(update_fields=['quantity'])
+        
+        return JsonResponse({
+            'success': True,
+            'total_items': cart_item.cart.total_items,
+            'subtotal': float(cart_item.cart.subtotal),
+            'item_total': float(cart_item.total_price),
+            'available_quantity': available_quantity - new_quantity
+        })
             
     except (ValueError, json.JSONDecodeError) as e:
         return JsonResponse({'success': False, 'error': 'Invalid data'}, status=400)
     except Exception as e:
-        print(f"[ERROR] Error in update_cart_item: {str(e)}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("Error in update_cart_item")
         return JsonResponse(
             {'success': False, 'error': 'An error occurred while updating the cart'}, 
             status=500
         )
 
-@login_required
 @require_POST
 def remove_from_cart(request, item_id):
+    if not request.user.is_authenticated:
+        return _remove_from_anonymous_cart(request, item_id)
+    
     try:
+        # Get the cart item with its cart
+        cart_item = get_object_or_404(
+            CartItem.objects.select_related('cart'), 
+            id=item_id, 
+            cart__user=request.user
+        )
+        cart = cart_item.cart
+        
         with transaction.atomic():
-            # Get the cart item with product details
-            cart_item = get_object_or_404(
-                CartItem.objects.select_related('product'), 
-                id=item_id, 
-                cart__user=request.user
-            )
-            
-            # Restore the product quantity if the product has quantity tracking
-            if hasattr(cart_item.product, 'quantity'):
-                cart_item.product.quantity += cart_item.quantity
-                cart_item.product.save()
-            
-            # Get cart reference before deleting the item
-            cart = cart_item.cart
-            
-            # Delete the cart item
             cart_item.delete()
-            
-            # Refresh the cart to get updated values
-            cart.refresh_from_db()
-            
-            return JsonResponse({
-                'success': True,
-                'total_items': cart.total_items,
-                'subtotal': float(cart.subtotal)
-            })
+            # Give the held stock back
+            release_holds(cart, [cart_item.product_id])
+        
+        return JsonResponse({
+            'success': True,
+            'total_items': cart.total_items,
+            'subtotal': float(cart.subtotal)
+        })
             
     except Exception as e:
-        print(f"[ERROR] Error in remove_from_cart: {str(e)}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("Error in remove_from_cart")
         return JsonResponse(
             {'success': False, 'error': 'An error occurred while removing the item from cart'}, 
             status=500
         )
 
+@require_POST
+def batch_update_cart(request):
+    """Apply a list of add/update/remove operations in one request.
+    
+    Body: {"operations": [{"op": "add", "product_id": 1, "quantity": 2},
+                          {"op": "update", "item_id": 5, "quantity": 3},
+                          {"op": "remove", "item_id": 7}]}
+    """
+    try:
+        data = json.loads(request.body)
+        operations = data.get('operations')
+        if not isinstance(operations, list) or not all(isinstance(op, dict) for op in operations):
+            return JsonResponse({'success': False, 'error': 'operations must be a list'}, status=400)
+        
+        max_operations = getattr(settings, 'CART_BATCH_MAX_OPERATIONS', 50)
+        if len(operations) > max_operations:
+            return JsonResponse(
+                {'success': False, 'error': f'At most {max_operations} operations per request'},
+                status=400
+            )
+        
+        if request.user.is_authenticated:
+            results, totals = apply_cart_operations(request.user, operations)
+        else:
+            results, totals = apply_anonymous_cart_operations(request.anonymous_cart, operations)
+        
+        return JsonResponse({
+            'success': all(result['success'] for result in results),
+            'results': results,
+            'total_items': totals['total_items'],
+            'subtotal': totals['subtotal'],
+        })
+    
+    except (ValueError, AttributeError, json.JSONDecodeError):
+        return JsonResponse({'success': False, 'error': 'Invalid data'}, status=400)
+    except Exception as e:
+        logger.exception("Error in batch_update_cart")
+        return JsonResponse(
+            {'success': False, 'error': 'An error occurred while updating the cart'}, 
+            status=500
+        )
+
 def cart_summary(request):
     if request.user.is_authenticated:
-        cart, created = Cart.objects.get_or_create(user=request.user)
+        return JsonResponse(get_cart_summary(request.user.pk))
+    cart = request.anonymous_cart
+    if not cart:
+        return JsonResponse({'total_items': 0, 'subtotal': 0})
+    return JsonResponse({'total_items': cart.total_items, 'subtotal': float(cart.subtotal)})
+
+
+# Anonymous carts live in a signed cookie (see anonymous.py) and address
+# their lines by product id. Stock is checked but only held once the cart
+# is merged at login.
+
+def _add_to_anonymous_cart(request, product_id):
+    cart = request.anonymous_cart
+    product = Product.objects.filter(id=product_id).only('id', 'is_available', 'quantity').first()
+    if product is None:
+        return JsonResponse({'success': False, 'error': 'Product not found'}, status=404)
+    if not product.is_available:
+        return JsonResponse(
+            {'success': False, 'error': 'This product is currently unavailable'},
+            status=400
+        )
+    available_quantity = available_quantities([product])[product.id]
+    if cart.get(product.id) >= available_quantity:
         return JsonResponse({
-            'total_items': cart.total_items,
-            'subtotal': float(cart.subtotal) if cart.subtotal else 0
-        })
-    return JsonResponse({'total_items': 0, 'subtotal': 0})
+            'success': False,
+            'error': f'Only {available_quantity} items available in stock',
+            'available_quantity': available_quantity
+        }, status=400)
+    
+    cart.set(product.id, cart.get(product.id) + 1)
+    return JsonResponse({
+        'success': True,
+        'total_items': cart.total_items,
+        'subtotal': float(cart.subtotal),
+        'available_quantity': available_quantity - cart.get(product.id)
+    })
+
+def _update_anonymous_cart_item(request, product_id, new_quantity):
+    cart = request.anonymous_cart
+    if not cart.get(product_id):
+        return JsonResponse({'success': False, 'error': 'Item not found'}, status=404)
+    product = Product.objects.filter(id=product_id).only('id', 'quantity').first()
+    if product is None:
+        cart.remove(product_id)
+        return JsonResponse({'success': False, 'error': 'Product not found'}, status=404)
+    available_quantity = available_quantities([product])[product.id]
+    if new_quantity > available_quantity:
+        return JsonResponse({
+            'success': False,
+            'error': f'Only {available_quantity} items available in stock',
+            'available_quantity': available_quantity
+        }, status=400)
+    
+    cart.set(product.id, new_quantity)
+    item = next((item for item in cart.items() if item.id == product.id), None)
+    return JsonResponse({
+        'success': True,
+        'total_items': cart.total_items,
+        'subtotal': float(cart.subtotal),
+        'item_total': float(item.total_price) if item else 0,
+        'available_quantity': available_quantity - new_quantity
+    })
+
+def _remove_from_anonymous_cart(request, product_id):
+    cart = request.anonymous_cart
+    if not cart.remove(product_id):
+        return JsonResponse({'success': False, 'error': 'Item not found'}, status=404)
+    return JsonResponse({
+        'success': True,
+        'total_items': cart.total_items,
+        'subtotal': float(cart.subtotal)
+    })
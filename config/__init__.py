@@ -2,4 +2,7 @@
 This file is required to make Python treat the directory as a package.
 """
 
-# This file intentionally left blank
\ No newline at end of file
+# Load the Celery app whenever Django starts so shared_task uses it
+from .celery import app as celery_app
+
+__all__ = ('celery_app',)
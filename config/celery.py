@@ -0,0 +1,17 @@
+"""
+Celery application for the project.
+
+Workers and beat are started with ``celery -A config worker`` and
+``celery -A config beat``. Periodic tasks are listed in
+``CELERY_BEAT_SCHEDULE`` and stored by ``django_celery_beat``.
+"""
+
+import os
+
+from celery import Celery
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
+
+app = Celery('config')
+app.config_from_object('django.conf:settings', namespace='CELERY')
+app.autodiscover_tasks()
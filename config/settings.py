@@ -27,6 +27,7 @@ INSTALLED_APPS = [
     
     # Third-party apps
     'rest_framework',
+    'rest_framework.authtoken',
     'corsheaders',
     'rest_framework_simplejwt',
     'drf_yasg',
@@ -40,6 +41,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'api.middleware.RequestMetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -47,6 +49,7 @@ MIDDLEWARE = [
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'cart.middleware.AnonymousCartMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
     # 'axes.middleware.AxesMiddleware',  # Temporarily disabled due to UserProfile model conflict
@@ -103,7 +106,7 @@ AUTH_PASSWORD_VALIDATORS = [
 
 # Internationalization
 LANGUAGE_CODE = 'en-us'
-TIME_ZONE = 'Asia/Kolkata'
+TIME_ZONE = 'UTC'
 USE_I18N = True
 USE_L10N = True
 USE_TZ = True
@@ -126,7 +129,8 @@ AUTH_USER_MODEL = 'api.UserProfile'
 # REST Framework settings
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'api.authentication.CachedJWTAuthentication',
+        'api.authentication.CachedTokenAuthentication',
         'rest_framework.authentication.SessionAuthentication',
     ),
     'DEFAULT_PERMISSION_CLASSES': [
@@ -151,7 +155,8 @@ SIMPLE_JWT = {
     'REFRESH_TOKEN_LIFETIME': timedelta(days=1),
     'ROTATE_REFRESH_TOKENS': True,
     'BLACKLIST_AFTER_ROTATION': True,
-    'UPDATE_LAST_LOGIN': True,
+    # last_login is written by api.authentication.record_login, at most every LAST_LOGIN_UPDATE_INTERVAL
+    'UPDATE_LAST_LOGIN': False,
     'ALGORITHM': 'HS256',
     'SIGNING_KEY': SECRET_KEY,
     'AUTH_HEADER_TYPES': ('Bearer',),
@@ -203,37 +208,12 @@ if DEBUG:
         'x-csrftoken',
         'x-requested-with',
     ]
-    
-    # Middleware settings
-    MIDDLEWARE = [
-        'corsheaders.middleware.CorsMiddleware',
-        'django.middleware.security.SecurityMiddleware',
-        'whitenoise.middleware.WhiteNoiseMiddleware',
-        'django.contrib.sessions.middleware.SessionMiddleware',
-        'django.middleware.common.CommonMiddleware',
-        'django.middleware.csrf.CsrfViewMiddleware',
-        'django.contrib.auth.middleware.AuthenticationMiddleware',
-        'django.contrib.messages.middleware.MessageMiddleware',
-        'django.middleware.clickjacking.XFrameOptionsMiddleware',
-    ]
 else:
     # Production settings would go here
     CORS_ALLOWED_ORIGINS = [
         'http://localhost:8000',
         'http://127.0.0.1:8000',
     ]
-    
-    MIDDLEWARE = [
-        'django.middleware.security.SecurityMiddleware',
-        'whitenoise.middleware.WhiteNoiseMiddleware',
-        'django.contrib.sessions.middleware.SessionMiddleware',
-        'corsheaders.middleware.CorsMiddleware',
-        'django.middleware.common.CommonMiddleware',
-        'django.middleware.csrf.CsrfViewMiddleware',
-        'django.contrib.auth.middleware.AuthenticationMiddleware',
-        'django.contrib.messages.middleware.MessageMiddleware',
-        'django.middleware.clickjacking.XFrameOptionsMiddleware',
-    ]
 
 # CORS headers that should be exposed to the browser
 CORS_EXPOSE_HEADERS = [
@@ -276,12 +256,35 @@ EMAIL_USE_TLS = os.getenv('EMAIL_USE_TLS', 'True') == 'True'
 EMAIL_HOST_USER = os.getenv('EMAIL_HOST_USER', 'apikey')
 EMAIL_HOST_PASSWORD = os.getenv('SENDGRID_API_KEY', '')
 DEFAULT_FROM_EMAIL = os.getenv('DEFAULT_FROM_EMAIL', 'noreply@example.com')
+SENDGRID_API_KEY = os.getenv('SENDGRID_API_KEY', '')
 
 # Twilio settings
 TWILIO_ACCOUNT_SID = os.getenv('TWILIO_ACCOUNT_SID', '')
 TWILIO_AUTH_TOKEN = os.getenv('TWILIO_AUTH_TOKEN', '')
 TWILIO_PHONE_NUMBER = os.getenv('TWILIO_PHONE_NUMBER', '')
 
+# Shared HTTP clients for the email/SMS providers (api.utils.provider_clients)
+PROVIDER_CONNECT_TIMEOUT = float(os.getenv('PROVIDER_CONNECT_TIMEOUT', 3.05))  # seconds
+PROVIDER_READ_TIMEOUT = float(os.getenv('PROVIDER_READ_TIMEOUT', 10))  # seconds
+PROVIDER_POOL_SIZE = 10  # keep-alive connections per provider host
+# Per-provider overrides of the timeouts and of api.utils.resilience.DEFAULT_POLICY
+# (retries, backoff, max_backoff, failure_threshold, reset_timeout)
+PROVIDER_POLICIES = {
+    'stripe': {'read_timeout': 20, 'retries': 3},
+    'razorpay': {'read_timeout': 20},
+}
+
+# Local stand-ins for the providers (api.utils.fake_providers), for offline load tests.
+# Per provider: latency_ms, jitter_ms, error_rate, rate_limit (calls/second), seed, max_calls (recorded)
+FAKE_PROVIDERS = {}
+if os.getenv('FAKE_PROVIDERS', 'False') == 'True':
+    FAKE_PROVIDERS = {
+        'sendgrid': {'latency_ms': 150, 'jitter_ms': 50, 'error_rate': 0.01, 'rate_limit': 100},
+        'twilio': {'latency_ms': 250, 'jitter_ms': 100, 'error_rate': 0.01, 'rate_limit': 30},
+        'stripe': {'latency_ms': 300, 'jitter_ms': 100, 'error_rate': 0.005, 'rate_limit': 100},
+        'razorpay': {'latency_ms': 350, 'jitter_ms': 150, 'error_rate': 0.005, 'rate_limit': 50},
+    }
+
 # Stripe settings
 STRIPE_SECRET_KEY = os.getenv('STRIPE_SECRET_KEY', '')
 STRIPE_PUBLISHABLE_KEY = os.getenv('STRIPE_PUBLISHABLE_KEY', '')
@@ -290,13 +293,124 @@ STRIPE_PUBLISHABLE_KEY = os.getenv('STRIPE_PUBLISHABLE_KEY', '')
 RAZORPAY_KEY_ID = os.getenv('RAZORPAY_KEY_ID', '')
 RAZORPAY_KEY_SECRET = os.getenv('RAZORPAY_KEY_SECRET', '')
 
+# Payment webhook signing secrets (api.services.payment_events)
+STRIPE_WEBHOOK_SECRET = os.getenv('STRIPE_WEBHOOK_SECRET', '')
+STRIPE_WEBHOOK_TOLERANCE = 300  # seconds a signed Stripe event stays valid
+RAZORPAY_WEBHOOK_SECRET = os.getenv('RAZORPAY_WEBHOOK_SECRET', '')
+
 # Celery settings
-CELERY_BROKER_URL = os.getenv('REDIS_URL', 'redis://localhost:6379/0')
+# Eager mode runs tasks in-process instead of on a worker (local development without Redis)
+CELERY_TASK_ALWAYS_EAGER = os.getenv('CELERY_TASK_ALWAYS_EAGER', 'False') == 'True'
+CELERY_TASK_EAGER_PROPAGATES = True
+CELERY_BROKER_URL = 'memory://' if CELERY_TASK_ALWAYS_EAGER else os.getenv('REDIS_URL', 'redis://localhost:6379/0')
 CELERY_RESULT_BACKEND = 'django-db'
 CELERY_ACCEPT_CONTENT = ['json']
 CELERY_TASK_SERIALIZER = 'json'
 CELERY_RESULT_SERIALIZER = 'json'
 CELERY_TIMEZONE = TIME_ZONE
+CELERY_BEAT_SCHEDULER = 'django_celery_beat.schedulers:DatabaseScheduler'
+CELERY_BEAT_SCHEDULE = {
+    'reap-abandoned-carts': {
+        'task': 'cart.tasks.reap_abandoned_carts',
+        'schedule': timedelta(minutes=15),
+    },
+    'dispatch-outbox': {
+        'task': 'api.tasks.dispatch_outbox',
+        'schedule': timedelta(minutes=1),
+    },
+    'process-payment-events': {
+        'task': 'api.tasks.process_payment_events',
+        'schedule': timedelta(minutes=5),
+    },
+    'refresh-demand-forecast': {
+        'task': 'api.tasks.refresh_demand_forecast',
+        'schedule': timedelta(days=1),
+    },
+}
+
+# Cache settings
+# Redis in production; a local-memory (or file, via CACHE_DIR) stand-in for development
+if os.getenv('REDIS_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.getenv('REDIS_URL'),
+        }
+    }
+elif os.getenv('CACHE_DIR'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': os.getenv('CACHE_DIR'),
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'quick-pickup',
+        }
+    }
+
+# Pickup slot holds taken at checkout
+SLOT_HOLD_CACHE = 'default'
+SLOT_HOLD_TTL = int(os.getenv('SLOT_HOLD_TTL', 300))  # seconds
+
+# Cached cart summaries, invalidated when cart items change
+CART_SUMMARY_TTL = 300  # seconds
+
+# Carts for visitors who haven't logged in, kept in a signed cookie
+ANONYMOUS_CART_MAX_AGE = 60 * 60 * 24 * 14  # 2 weeks
+
+# Largest number of operations accepted by the batch cart endpoint
+CART_BATCH_MAX_OPERATIONS = 50
+
+# How long a cart's stock hold lasts after its last change
+STOCK_HOLD_TTL = int(os.getenv('STOCK_HOLD_TTL', 30 * 60))  # seconds
+
+# Abandoned cart reaper (cart.tasks.reap_abandoned_carts)
+CART_ABANDONED_AFTER = int(os.getenv('CART_ABANDONED_AFTER', 6 * 60 * 60))  # seconds idle
+CART_REAPER_CHUNK_SIZE = 500
+STOCK_HOLD_RETENTION = 24 * 60 * 60  # seconds to keep expired holds in the ledger
+
+# Notification outbox (api.services.outbox)
+OUTBOX_BATCH_SIZE = 100
+OUTBOX_LEASE_SECONDS = 300  # a claimed message is retried if not sent by then
+OUTBOX_MAX_ATTEMPTS = 5
+OUTBOX_RETRY_BACKOFF = 60  # seconds, doubled on each attempt
+# Order status emails wait this long so rapid changes send only the latest (or a digest)
+NOTIFICATION_COALESCE_WINDOW = 0 if CELERY_TASK_ALWAYS_EAGER else int(os.getenv('NOTIFICATION_COALESCE_WINDOW', 60))  # seconds
+
+# Request metrics (api.middleware.RequestMetricsMiddleware), served at /admin/metrics/
+METRICS_SLOW_REQUEST_MS = int(os.getenv('METRICS_SLOW_REQUEST_MS', 500))  # logged as warnings
+METRICS_REQUEST_LOG_LEVEL = os.getenv('METRICS_REQUEST_LOG_LEVEL', 'INFO')  # every other request
+METRICS_EXCLUDED_ROUTES = ['admin/metrics/']
+
+# Authenticated users cached by api.authentication, dropped when a user or token changes
+AUTH_USER_CACHE_TTL = int(os.getenv('AUTH_USER_CACHE_TTL', 60))  # seconds
+LAST_LOGIN_UPDATE_INTERVAL = 15 * 60  # seconds; logins closer together than this keep the stored last_login
+
+# Low-stock alerts (api.services.stock_alerts); shopkeepers are emailed when this is empty
+LOW_STOCK_ALERT_RECIPIENTS = [email for email in os.getenv('LOW_STOCK_ALERT_RECIPIENTS', '').split(',') if email]
+
+# Demand forecasts for stock staging (api.services.forecasting)
+FORECAST_HISTORY_WEEKS = 52
+FORECAST_SMOOTHING = 0.3  # weight of the most recent week; older weeks decay by (1 - this)
+FORECAST_SAFETY_MARGIN = 0.2  # staged on top of the expected units
+
+# Admin changelists for large tables (api.pagination.EstimatedCountPaginator)
+ADMIN_EXACT_COUNT_THRESHOLD = 10000  # below this many estimated rows, count exactly
+ADMIN_COUNT_CACHE_TTL = 60  # seconds; cached exact counts on databases without planner estimates
+
+# Longest series the analytics API returns (api.services.analytics)
+ANALYTICS_MAX_BUCKETS = 5000
+
+# Startup budget checked by `manage.py benchmark_startup` (median of fresh processes)
+STARTUP_BUDGET_MS = {
+    'check': int(os.getenv('STARTUP_CHECK_BUDGET_MS', 3000)),  # manage.py check, wall time
+    'wsgi': int(os.getenv('STARTUP_WSGI_BUDGET_MS', 1500)),  # importing config.wsgi
+    'imports': int(os.getenv('STARTUP_IMPORT_BUDGET_MS', 1000)),  # -X importtime total for the WSGI boot
+}
 
 # Sentry settings
 if os.getenv('SENTRY_DSN'):
@@ -337,6 +451,16 @@ LOGGING = {
             'level': os.getenv('DJANGO_LOG_LEVEL', 'INFO'),
             'propagate': True,
         },
+        'api': {
+            'handlers': ['console', 'file'],
+            'level': os.getenv('APP_LOG_LEVEL', 'INFO'),
+            'propagate': False,
+        },
+        'cart': {
+            'handlers': ['console', 'file'],
+            'level': os.getenv('APP_LOG_LEVEL', 'INFO'),
+            'propagate': False,
+        },
     },
 }
 
@@ -349,68 +473,6 @@ AXES_FAILURE_LIMIT = 5
 AXES_COOLOFF_TIME = 1  # 1 hour
 AXES_RESET_ON_SUCCESS = True
 
-ROOT_URLCONF = 'config.urls'
-
-TEMPLATES = [
-    {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
-        'DIRS': [os.path.join(BASE_DIR, 'templates')],
-        'APP_DIRS': True,
-        'OPTIONS': {
-            'context_processors': [
-                'django.template.context_processors.debug',
-                'django.template.context_processors.request',
-                'django.contrib.auth.context_processors.auth',
-                'django.contrib.messages.context_processors.messages',
-            ],
-        },
-    },
-]
-
-WSGI_APPLICATION = 'config.wsgi.application'
-
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
-    }
-}
-
-AUTH_PASSWORD_VALIDATORS = [
-    {
-        'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
-    },
-    {
-        'NAME': 'django.contrib.auth.password_validation.MinimumLengthValidator',
-    },
-    {
-        'NAME': 'django.contrib.auth.password_validation.CommonPasswordValidator',
-    },
-    {
-        'NAME': 'django.contrib.auth.password_validation.NumericPasswordValidator',
-    },
-]
-
-LANGUAGE_CODE = 'en-us'
-TIME_ZONE = 'UTC'
-USE_I18N = True
-USE_TZ = True
-
-# Static files (CSS, JavaScript, Images)
-# https://docs.djangoproject.com/en/4.1/howto/static-files/
-
-STATIC_URL = '/static/'
-STATICFILES_DIRS = [
-    os.path.join(BASE_DIR, 'static'),
-]
-STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
-
-# Media files (Uploaded files)
-MEDIA_URL = '/media/'
-MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
-
-DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
-
 # CORS Settings
 CORS_ALLOW_ALL_ORIGINS = True
 CORS_ALLOW_CREDENTIALS = True
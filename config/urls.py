@@ -19,7 +19,7 @@ from django.conf import settings
 from django.conf.urls.static import static
 from django.views.generic import TemplateView, RedirectView
 from django.contrib.admin.views.decorators import staff_member_required
-from api.admin_views import admin_dashboard
+from api.admin_views import admin_dashboard, metrics
 from django.views.generic.base import TemplateView
 from django.contrib.staticfiles.views import serve
 from django.views.decorators.cache import never_cache
@@ -35,6 +35,7 @@ urlpatterns = [
     
     # Admin site
     path('admin/dashboard/', staff_member_required(admin_dashboard), name='admin-dashboard'),
+    path('admin/metrics/', metrics, name='admin-metrics'),
     path('admin/', admin.site.urls),
     
     # API endpoints